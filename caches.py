@@ -0,0 +1,111 @@
+# Noitu/caches.py
+# Cache trong bộ nhớ dùng chung (kakasi, Wiktionary...).
+import asyncio
+import sys
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class LRUCache:
+    """Cache LRU giới hạn theo số mục và (tùy chọn) số byte ước lượng; mục có thể kèm hạn dùng.
+    Có đếm hit/miss/eviction/hết hạn."""
+
+    def __init__(self, max_entries: int, max_bytes: int | None = None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or (lambda key, value: sys.getsizeof(key) + sys.getsizeof(value))
+        self._entries: OrderedDict = OrderedDict() # key -> (value, expires_at epoch | None, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        value, expires_at, _ = entry
+        if expires_at is not None and expires_at <= time.time():
+            self.pop(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key, default=None):
+        """Như get nhưng ko đổi thứ tự LRU, ko tính hit/miss."""
+        entry = self._entries.get(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def put(self, key, value, expires_at: float | None = None) -> None:
+        self.pop(key)
+        size = self._sizeof(key, value)
+        self._entries[key] = (value, expires_at, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes and len(self._entries) > 1):
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        entry = self._entries.pop(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        self.bytes -= entry[2]
+        return entry[0]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "max_entries": self.max_entries,
+                "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions, "expirations": self.expirations}
+
+
+class SingleFlight:
+    """Gộp các lời gọi đồng thời cùng khóa: chỉ chạy 1 lần, mọi người chờ nhận chung kết quả."""
+
+    def __init__(self):
+        self._in_flight: dict = {}
+        self.calls = 0 # Số lần thực sự chạy
+        self.shared = 0 # Số lời gọi được gộp vào lần chạy đang có
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    async def run(self, key, coro_factory):
+        """`coro_factory()` chỉ được gọi nếu chưa có lần chạy nào cho `key`."""
+        future = self._in_flight.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.ensure_future(coro_factory())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done, key=key: self._on_done(key, done))
+        else:
+            self.shared += 1
+        # shield: 1 người chờ bị hủy ko hủy lần chạy của những người chờ còn lại
+        return await asyncio.shield(future)
+
+    def _on_done(self, key, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if not future.cancelled():
+            future.exception() # Đánh dấu đã lấy lỗi, tránh cảnh báo khi mọi người chờ đã bị hủy
+
+    def stats(self) -> dict:
+        total = self.calls + self.shared
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._in_flight),
+                "dedup_ratio": round(self.shared / total, 3) if total else 0.0}
@@ -168,6 +168,7 @@ class AdminCog(commands.Cog):
     async def slash_config_set_jp_channel(self, interaction: discord.Interaction, channel: discord.TextChannel):
         await interaction.response.defer(ephemeral=True)
 
+        await utils.wait_for_language_resources(self.bot)
         if not self.bot.kakasi:
             await interaction.followup.send(
                 "⚠️ Không thể đặt kênh Tiếng Nhật do bot hiện tại chưa được cấu hình đúng (thiếu thư viện PyKakasi). "
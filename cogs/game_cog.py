@@ -17,12 +17,16 @@ class GameCog(commands.Cog):
     async def on_message(self, message: discord.Message):
         if message.author == self.bot.user or not message.guild: 
             return
-
-        ctx = await self.bot.get_context(message)
-        if ctx.valid and ctx.command: # Ignore if it's a valid command invocation
+        # Fast path: tin nhắn ko liên quan tới game bị bỏ qua mà ko await / truy cập DB
+        if not game_logic.is_possible_game_move(self.bot, message):
             return
 
-        await game_logic.process_game_message(self.bot, message) 
+        if utils.may_be_command(self.bot, message):
+            ctx = await self.bot.get_context(message)
+            if ctx.valid and ctx.command: # Ignore if it's a valid command invocation
+                return
+
+        self.bot.move_queue.submit(message) # Xử lý tuần tự theo kênh
 
     @commands.command(name='bxh', aliases=['leaderboard', 'xephang'])
     async def leaderboard_command_prefix(self, ctx: commands.Context):
@@ -38,7 +42,7 @@ class GameCog(commands.Cog):
             await utils._send_message_smart(ctx, "Kênh này chưa được cấu hình để chơi Nối Từ. Không thể xem BXH.", ephemeral=True)
             return
             
-        embed, error_msg = await utils.generate_leaderboard_embed(self.bot, ctx.guild, game_lang_for_channel)
+        embed, error_msg = await utils.generate_leaderboard_embed(self.bot, ctx.guild, game_lang_for_channel, ctx.author.id)
         if error_msg: 
             is_db_error = "DB chưa sẵn sàng" in error_msg 
             await utils._send_message_smart(ctx, error_msg, ephemeral=True, delete_after=10 if is_db_error else None)
@@ -58,7 +62,7 @@ class GameCog(commands.Cog):
                 await interaction.followup.send("Kênh này chưa được cấu hình để chơi Nối Từ. Không thể xem BXH.", ephemeral=True)
                 return
 
-            embed, error_msg = await utils.generate_leaderboard_embed(self.bot, interaction.guild, game_lang_for_channel)
+            embed, error_msg = await utils.generate_leaderboard_embed(self.bot, interaction.guild, game_lang_for_channel, interaction.user.id)
             if error_msg:
                 await interaction.followup.send(error_msg, ephemeral=True) 
             else:
@@ -91,6 +95,32 @@ class GameCog(commands.Cog):
         
         await game_logic.internal_start_game(self.bot, interaction.channel, interaction.user, interaction.guild_id, phrase, interaction=interaction)
 
+    @commands.command(name='vsbot', aliases=['choibot', 'daubot'])
+    async def vsbot_command_prefix(self, ctx: commands.Context, difficulty: str = "medium"):
+        if not ctx.guild:
+            await utils._send_message_smart(ctx, "Lệnh này chỉ dùng trong server.", ephemeral=True); return
+        if not isinstance(ctx.channel, discord.TextChannel): 
+            await utils._send_message_smart(ctx, "Lệnh này chỉ dùng trong kênh text.", ephemeral=True); return
+
+        bot_difficulty = game_logic.BOT_DIFFICULTY_ALIASES.get(difficulty.lower())
+        if not bot_difficulty:
+            await utils._send_message_smart(ctx, "Độ khó phải là `easy`/`medium`/`hard` (hoặc `de`/`vua`/`kho`).", ephemeral=True); return
+        await game_logic.internal_start_game(self.bot, ctx.channel, ctx.author, ctx.guild.id, None, interaction=getattr(ctx, 'interaction', None), bot_difficulty=bot_difficulty)
+
+    @app_commands.command(name="vsbot", description="Bắt đầu game Nối Từ đấu với Bot trong kênh này.")
+    @app_commands.describe(difficulty="Độ khó của Bot (mặc định: Vừa).")
+    @app_commands.choices(difficulty=[
+        app_commands.Choice(name="Dễ", value="easy"),
+        app_commands.Choice(name="Vừa", value="medium"),
+        app_commands.Choice(name="Khó", value="hard"),
+    ])
+    async def slash_vsbot(self, interaction: discord.Interaction, difficulty: app_commands.Choice[str] = None):
+        if not interaction.guild_id or not isinstance(interaction.channel, discord.TextChannel):
+            await interaction.response.send_message("Lệnh này chỉ dùng trong kênh text của server.", ephemeral=True); return
+
+        bot_difficulty = difficulty.value if difficulty else "medium"
+        await game_logic.internal_start_game(self.bot, interaction.channel, interaction.user, interaction.guild_id, None, interaction=interaction, bot_difficulty=bot_difficulty)
+
     @commands.command(name='stop', aliases=['dunglai', 'stopnoitu'])
     async def stop_command_prefix(self, ctx: commands.Context):
         if not ctx.guild:
@@ -13,11 +13,65 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 DEFAULT_COMMAND_PREFIX = "!"
 DEFAULT_TIMEOUT_SECONDS = 60
 DEFAULT_MIN_PLAYERS_FOR_TIMEOUT = 2
+TURN_TIMER_TICK_SECONDS = 1.0 # Độ phân giải của bánh xe hẹn giờ lượt (game.timers)
+COUNTDOWN_EDITS_PER_SECOND = 20 # Ngân sách gửi/sửa tin nhắn đếm ngược cho mọi kênh cộng lại
+COUNTDOWN_MIN_INTERVAL_SECONDS = 1.0 # Mỗi kênh sửa tin nhắn đếm ngược tối đa 1 lần/khoảng này
 
 # URLs Wiktionary
 VIETNAMESE_WIKTIONARY_API_URL = "https://vi.wiktionary.org/w/api.php"
 JAPANESE_WIKTIONARY_API_URL = "https://ja.wiktionary.org/w/api.php"
 
+# HTTP client Wiktionary
+WIKTIONARY_USER_AGENT = "NoituDiscordBot/1.0 (Discord word-chain game bot)"
+WIKTIONARY_MAX_CONCURRENCY = 8 # Số request/kết nối đồng thời tối đa
+WIKTIONARY_REQUEST_TIMEOUT = 4.0 # Giây, cho mỗi lần gọi
+WIKTIONARY_RETRIES = 2
+WIKTIONARY_RETRY_BASE_DELAY = 0.3 # Giây, nhân đôi mỗi lần retry (kèm jitter)
+WIKTIONARY_DNS_CACHE_SECONDS = 300
+WIKTIONARY_KEEPALIVE_SECONDS = 30
+WIKTIONARY_BREAKER_FAILURES = 5 # Số lần lỗi liên tiếp trước khi ngắt mạch (chỉ dùng từ điển local)
+WIKTIONARY_BREAKER_RESET_SECONDS = 30 # Thời gian ngắt mạch trước khi thử gọi lại
+
+# Gom nhiều title vào 1 request Wiktionary (titles=a|b|c)
+WIKTIONARY_BATCH_MAX_TITLES = 50
+WIKTIONARY_BATCH_WINDOW_VN = 0.05 # Giây chờ gom title trước khi gửi
+WIKTIONARY_BATCH_WINDOW_JP = 0.05
+
+# Kakasi (chuyển input JP sang Hiragana)
+KAKASI_CACHE_SIZE = 4096 # Số input đã chuyển đổi được giữ lại (LRU)
+KAKASI_WORKERS = 2 # Số thread chạy kakasi
+JP_MAX_WORD_LENGTH = 32 # Input dài hơn bị coi là ko hợp lệ, ko đưa qua kakasi/Wiktionary
+
+# Cache kết quả Wiktionary (bảng wiktionary_cache, dùng chung giữa các shard)
+WIKTIONARY_CACHE_POSITIVE_TTL_SECONDS = 30 * 24 * 3600 # Từ hợp lệ
+WIKTIONARY_CACHE_NEGATIVE_TTL_SECONDS = 24 * 3600 # Từ ko có trên Wiktionary (trang có thể được tạo sau)
+WIKTIONARY_CACHE_MEMORY_SIZE = 20000 # Số mục tối đa giữ trong RAM mỗi ngôn ngữ
+WIKTIONARY_CACHE_MEMORY_BYTES = 4 * 1024 * 1024 # Ngân sách RAM ước lượng mỗi ngôn ngữ (None = ko giới hạn)
+WIKTIONARY_CACHE_WARMUP_LIMIT = 5000 # Số mục hay dùng nhất nạp sẵn lúc khởi động
+WIKTIONARY_CACHE_FLUSH_SECONDS = 60 # Chu kỳ ghi dồn hit_count xuống DB
+
+# Ghi dồn stats leaderboard (stats_buffer.py)
+STATS_FLUSH_SECONDS = 5 # Chu kỳ ghi dồn
+STATS_FLUSH_MAX_PENDING = 500 # Số dòng (user, guild, ngôn ngữ) chờ ghi tối đa trước khi ghi ngay
+STATS_FLUSH_MAX_BACKLOG = 20000 # DB lỗi: số dòng giữ lại tối đa để ghi sau, phần dư bị bỏ
+STATS_FLUSH_RETRY_MAX_SECONDS = 60 # Backoff tối đa giữa các lần thử ghi lại sau lỗi
+
+# Bảng xếp hạng (leaderboard.py)
+LEADERBOARD_TOP_SIZE = 10
+LEADERBOARD_CACHE_SIZE = 2000 # Số (guild, ngôn ngữ) giữ top-N đã render trong RAM
+LEADERBOARD_CACHE_SECONDS = 300 # Giới hạn độ cũ khi shard/process khác ghi stats
+
+# Cache user/tên hiển thị (user_names.py)
+USER_NAME_CACHE_SIZE = 20000
+USER_NAME_CACHE_SECONDS = 3600
+
+# Nhật ký game để khôi phục sau khi khởi động lại (game/journal.py)
+GAME_JOURNAL_FLUSH_SECONDS = 1.0 # Chu kỳ ghi dồn (mất tối đa chừng này giây nước đi nếu bot chết đột ngột)
+GAME_JOURNAL_MAX_PENDING = 1000 # Số sự kiện chờ ghi tối đa trước khi ghi ngay
+GAME_JOURNAL_MAX_BACKLOG = 20000 # DB lỗi: số sự kiện giữ lại tối đa để ghi sau, phần dư (cũ nhất) bị bỏ
+GAME_JOURNAL_RETRY_MAX_SECONDS = 60 # Backoff tối đa giữa các lần thử ghi lại sau lỗi
+GAME_RESTORE_MIN_TURN_SECONDS = 15 # Lượt của ván khôi phục còn ít nhất chừng này giây (lúc bot tắt ko ai chơi được)
+
 
 WRONG_TURN_REACTION = "⚠️"
 CORRECT_REACTION = "✅"
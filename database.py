@@ -1,4 +1,5 @@
 # Noitu/database.py
+import asyncio
 import asyncpg
 import traceback
 from . import config as bot_cfg
@@ -41,6 +42,39 @@ async def init_db(database_url: str, default_prefix: str, default_timeout: int,
                     PRIMARY KEY (user_id, guild_id, game_language)
                 );
             ''')
+            # Index xếp hạng (leaderboard.py): top-N và hạng của 1 user đọc thẳng theo thứ tự index, ko sort cả guild
+            await connection.execute('''
+                ALTER TABLE leaderboard_stats ADD COLUMN IF NOT EXISTS total_errors INTEGER
+                    GENERATED ALWAYS AS (wrong_word_link + invalid_wiktionary + used_word_error + wrong_turn + lost_by_n_ending) STORED;
+                CREATE INDEX IF NOT EXISTS leaderboard_rank_idx ON leaderboard_stats
+                    (guild_id, game_language, (-wins), (-correct_moves), (-max_win_streak), (-current_win_streak), total_errors, name);
+            ''')
+
+            # Wiktionary Cache (dùng chung giữa các process, xem wiktionary_cache.py)
+            await connection.execute('''
+                CREATE TABLE IF NOT EXISTS wiktionary_cache (
+                    game_language VARCHAR(2) NOT NULL,
+                    term TEXT NOT NULL,
+                    is_valid BOOLEAN NOT NULL,
+                    checked_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    ttl_seconds INTEGER NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (game_language, term)
+                );
+                CREATE INDEX IF NOT EXISTS wiktionary_cache_hot_idx ON wiktionary_cache (game_language, hit_count DESC);
+            ''')
+
+            # Nhật ký các ván đang chơi (xem game/journal.py), dùng để khôi phục game khi bot khởi động lại
+            await connection.execute('''
+                CREATE TABLE IF NOT EXISTS game_journal (
+                    seq BIGSERIAL PRIMARY KEY,
+                    channel_id BIGINT NOT NULL,
+                    event VARCHAR(10) NOT NULL,
+                    payload JSONB NOT NULL,
+                    recorded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                );
+                CREATE INDEX IF NOT EXISTS game_journal_channel_idx ON game_journal (channel_id, seq);
+            ''')
         print("DB connected, tables initialized.")
         return pool
     
@@ -49,26 +83,133 @@ async def init_db(database_url: str, default_prefix: str, default_timeout: int,
         traceback.print_exc()
         return None
 
+# Cache config guild trong RAM: nạp hết lúc khởi động, ghi xuyên (write-through) khi admin đổi config,
+# đồng bộ giữa các process bằng LISTEN/NOTIFY trên kênh GUILD_CONFIG_CHANNEL.
+GUILD_CONFIG_CHANNEL = "noitu_guild_config"
+_GUILD_CONFIG_COLUMNS = "guild_id, command_prefix, timeout_seconds, min_players_for_timeout, jp_channel_id, vn_channel_id"
+_guild_config_cache: dict[int, dict] = {}
+_listener_connection = None
+_listener_callbacks = None # (on_notify, on_terminated) để gỡ khi dừng
+_listener_refresh_tasks: set = set()
+
+def _cache_guild_config(row) -> dict:
+    config = dict(row)
+    guild_id = config.pop("guild_id")
+    _guild_config_cache[guild_id] = config
+    return dict(config)
+
+def get_cached_guild_config(guild_id: int) -> dict | None:
+    """Tra config guild ko cần await (vd. get_prefix). None nếu guild chưa có trong cache."""
+    config = _guild_config_cache.get(guild_id)
+    return dict(config) if config is not None else None
+
+async def load_guild_configs(db_pool: asyncpg.Pool) -> int:
+    """Nạp toàn bộ guild_configs vào cache (1 query). Trả về số guild."""
+    if not db_pool: return 0
+    async with db_pool.acquire() as connection:
+        rows = await connection.fetch(f"SELECT {_GUILD_CONFIG_COLUMNS} FROM guild_configs")
+    _guild_config_cache.clear()
+    for row in rows:
+        _cache_guild_config(row)
+    return len(rows)
+
+async def _refresh_guild_config(db_pool: asyncpg.Pool, guild_id: int):
+    try:
+        async with db_pool.acquire() as connection:
+            row = await connection.fetchrow(f"SELECT {_GUILD_CONFIG_COLUMNS} FROM guild_configs WHERE guild_id = $1", guild_id)
+        if row:
+            _cache_guild_config(row)
+        else:
+            _guild_config_cache.pop(guild_id, None)
+    except Exception as e:
+        print(f"Lỗi làm mới config guild {guild_id}: {e}")
+        _guild_config_cache.pop(guild_id, None) # Lần đọc sau sẽ lấy lại từ DB
+
+async def start_guild_config_listener(db_pool: asyncpg.Pool):
+    """Giữ 1 connection LISTEN để nhận thay đổi config từ các process khác."""
+    global _listener_connection, _listener_callbacks
+    if not db_pool or _listener_connection is not None: return
+
+    def on_notify(_connection, _pid, _channel, payload):
+        try:
+            guild_id = int(payload)
+        except ValueError:
+            return
+        task = asyncio.create_task(_refresh_guild_config(db_pool, guild_id))
+        _listener_refresh_tasks.add(task)
+        task.add_done_callback(_listener_refresh_tasks.discard)
+
+    def on_terminated(terminated_connection):
+        # Mất LISTEN thì có thể đã lỡ thông báo: bỏ cache, nghe lại rồi nạp lại từ đầu
+        global _listener_connection
+        print("Mất kết nối LISTEN config guild, sẽ kết nối lại.")
+        _listener_connection = None
+        _guild_config_cache.clear()
+        task = asyncio.create_task(_restart_guild_config_listener(db_pool, terminated_connection))
+        _listener_refresh_tasks.add(task)
+        task.add_done_callback(_listener_refresh_tasks.discard)
+
+    connection = await db_pool.acquire()
+    try:
+        await connection.add_listener(GUILD_CONFIG_CHANNEL, on_notify)
+        connection.add_termination_listener(on_terminated)
+    except Exception:
+        await db_pool.release(connection)
+        raise
+    _listener_connection = connection
+    _listener_callbacks = (on_notify, on_terminated)
+
+async def _restart_guild_config_listener(db_pool: asyncpg.Pool, terminated_connection, delay_seconds: float = 5.0):
+    try:
+        await db_pool.release(terminated_connection) # Trả slot cho pool
+    except Exception:
+        pass
+    await asyncio.sleep(delay_seconds)
+    try:
+        await start_guild_config_listener(db_pool)
+        await load_guild_configs(db_pool)
+    except Exception as e:
+        print(f"Lỗi kết nối lại LISTEN config guild: {e}")
+
+async def stop_guild_config_listener(db_pool: asyncpg.Pool):
+    global _listener_connection
+    connection, _listener_connection = _listener_connection, None
+    if connection is None: return
+    on_notify, on_terminated = _listener_callbacks
+    try:
+        connection.remove_termination_listener(on_terminated)
+        await connection.remove_listener(GUILD_CONFIG_CHANNEL, on_notify)
+        await db_pool.release(connection)
+    except Exception as e:
+        print(f"Lỗi đóng LISTEN config guild: {e}")
+
+# Tạo config mặc định nếu chưa có, ngược lại đọc dòng sẵn có; ko ghi gì vào dòng đã tồn tại.
+# SELECT ngoài dùng snapshot trước INSERT nên chỉ 1 trong 2 nhánh trả về dòng.
+_GET_GUILD_CONFIG_SQL = f"""
+    WITH inserted AS (
+        INSERT INTO guild_configs (guild_id, command_prefix, timeout_seconds, min_players_for_timeout, jp_channel_id, vn_channel_id)
+        VALUES ($1, $2, $3, $4, NULL, NULL)
+        ON CONFLICT (guild_id) DO NOTHING
+        RETURNING {_GUILD_CONFIG_COLUMNS}
+    )
+    SELECT {_GUILD_CONFIG_COLUMNS} FROM inserted
+    UNION ALL
+    SELECT {_GUILD_CONFIG_COLUMNS} FROM guild_configs WHERE guild_id = $1
+    LIMIT 1
+"""
+
 async def get_guild_config(db_pool: asyncpg.Pool, guild_id: int):
+    cached_config = get_cached_guild_config(guild_id)
+    if cached_config is not None:
+        return cached_config
     if not db_pool: return None
     async with db_pool.acquire() as connection:
         row = await connection.fetchrow(
-            "SELECT command_prefix, timeout_seconds, min_players_for_timeout, jp_channel_id, vn_channel_id FROM guild_configs WHERE guild_id = $1",
-            guild_id
-        )
-        if row:
-            return dict(row)
-
-        await connection.execute(
-            "INSERT INTO guild_configs (guild_id, command_prefix, timeout_seconds, min_players_for_timeout, jp_channel_id, vn_channel_id) VALUES ($1, $2, $3, $4, NULL, NULL) ON CONFLICT (guild_id) DO NOTHING",
+            _GET_GUILD_CONFIG_SQL,
             guild_id, bot_cfg.DEFAULT_COMMAND_PREFIX, bot_cfg.DEFAULT_TIMEOUT_SECONDS, bot_cfg.DEFAULT_MIN_PLAYERS_FOR_TIMEOUT
         )
-        row_after_insert = await connection.fetchrow(
-            "SELECT command_prefix, timeout_seconds, min_players_for_timeout, jp_channel_id, vn_channel_id FROM guild_configs WHERE guild_id = $1",
-            guild_id
-        )
-        if row_after_insert:
-            return dict(row_after_insert)
+        if row:
+            return _cache_guild_config(row)
         
         return {
             "command_prefix": bot_cfg.DEFAULT_COMMAND_PREFIX,
@@ -84,80 +225,146 @@ async def set_guild_config_value(db_pool: asyncpg.Pool, guild_id: int, key: str,
     if key not in allowed_keys: return False
     
     async with db_pool.acquire() as connection:
-        await connection.execute(
-             "INSERT INTO guild_configs (guild_id, command_prefix, timeout_seconds, min_players_for_timeout) VALUES ($1, $2, $3, $4) ON CONFLICT (guild_id) DO NOTHING",
-            guild_id, bot_cfg.DEFAULT_COMMAND_PREFIX, bot_cfg.DEFAULT_TIMEOUT_SECONDS, bot_cfg.DEFAULT_MIN_PLAYERS_FOR_TIMEOUT
-        )
-        await connection.execute(f"UPDATE guild_configs SET {key} = $1 WHERE guild_id = $2", value, guild_id)
+        async with connection.transaction():
+            await connection.execute(
+                 "INSERT INTO guild_configs (guild_id, command_prefix, timeout_seconds, min_players_for_timeout) VALUES ($1, $2, $3, $4) ON CONFLICT (guild_id) DO NOTHING",
+                guild_id, bot_cfg.DEFAULT_COMMAND_PREFIX, bot_cfg.DEFAULT_TIMEOUT_SECONDS, bot_cfg.DEFAULT_MIN_PLAYERS_FOR_TIMEOUT
+            )
+            row = await connection.fetchrow(
+                f"UPDATE guild_configs SET {key} = $1 WHERE guild_id = $2 RETURNING {_GUILD_CONFIG_COLUMNS}", value, guild_id
+            )
+            # NOTIFY chỉ được gửi khi transaction commit -> process khác ko đọc được giá trị cũ
+            await connection.execute("SELECT pg_notify($1, $2)", GUILD_CONFIG_CHANNEL, str(guild_id))
+    if row:
+        _cache_guild_config(row) # Write-through
     return True
 
-async def get_user_stats_entry(db_pool: asyncpg.Pool, user_id: int, guild_id: int, game_language: str, username: str = "Unknown User"):
+# Cột đếm của leaderboard_stats; các lỗi trong STREAK_BREAKING_STATS làm mất chuỗi thắng
+STAT_COLUMNS = ("wins", "correct_moves", "wrong_word_link", "invalid_wiktionary", "used_word_error", "wrong_turn", "lost_by_n_ending")
+STREAK_BREAKING_STATS = frozenset({"wrong_word_link", "invalid_wiktionary", "used_word_error", "wrong_turn", "lost_by_n_ending"})
+UNKNOWN_USER_NAME = "Unknown User"
+
+# SQL cố định (asyncpg tự prepare và cache theo từng connection): tạo dòng nếu chưa có, cộng stat,
+# tính chuỗi thắng, cập nhật tên và trả về dòng mới trong 1 round trip. $4 = NULL thì giữ tên cũ.
+# Đọc stats: chỉ ghi khi tạo dòng mới hoặc tên thật sự đổi; còn lại đọc dòng sẵn có (ko khóa, ko tạo phiên bản dòng mới)
+_GET_STATS_SQL = """
+    WITH upserted AS (
+        INSERT INTO leaderboard_stats AS s (user_id, guild_id, game_language, name)
+        VALUES ($1, $2, $3, COALESCE($4, 'Unknown User'))
+        ON CONFLICT (user_id, guild_id, game_language) DO UPDATE SET name = EXCLUDED.name
+        WHERE $4::varchar IS NOT NULL AND s.name IS DISTINCT FROM EXCLUDED.name
+        RETURNING *
+    )
+    SELECT * FROM upserted
+    UNION ALL
+    SELECT * FROM leaderboard_stats
+    WHERE user_id = $1 AND guild_id = $2 AND game_language = $3 AND NOT EXISTS (SELECT 1 FROM upserted)
+"""
+
+def _update_stat_sql(stat_key: str) -> str:
+    if stat_key == "wins":
+        insert_streak, update_streak = "1, 1", """,
+        current_win_streak = s.current_win_streak + 1,
+        max_win_streak = GREATEST(s.max_win_streak, s.current_win_streak + 1)"""
+    elif stat_key in STREAK_BREAKING_STATS:
+        insert_streak, update_streak = "0, 0", """,
+        current_win_streak = 0"""
+    else:
+        insert_streak, update_streak = "0, 0", ""
+    return f"""
+    INSERT INTO leaderboard_stats AS s (user_id, guild_id, game_language, name, {stat_key}, current_win_streak, max_win_streak)
+    VALUES ($1, $2, $3, COALESCE($4, 'Unknown User'), $5, {insert_streak})
+    ON CONFLICT (user_id, guild_id, game_language) DO UPDATE
+    SET name = COALESCE($4, s.name),
+        {stat_key} = s.{stat_key} + $5{update_streak}
+    RETURNING *
+"""
+
+_UPDATE_STAT_SQL = {stat_key: _update_stat_sql(stat_key) for stat_key in STAT_COLUMNS}
+# Cột quyết định thứ hạng (xem leaderboard_rank_idx): các câu ghi trả về để cache BXH biết top-N có đổi ko
+RANK_COLUMNS = "user_id, wins, correct_moves, max_win_streak, current_win_streak, total_errors"
+_RESET_STREAK_SQL = f"""
+    UPDATE leaderboard_stats SET current_win_streak = 0
+    WHERE user_id = $1 AND guild_id = $2 AND game_language = $3 AND current_win_streak <> 0
+    RETURNING {RANK_COLUMNS}
+"""
+_RESET_STREAKS_SQL = f"""
+    UPDATE leaderboard_stats SET current_win_streak = 0
+    WHERE user_id = ANY($1::bigint[]) AND guild_id = $2 AND game_language = $3 AND current_win_streak <> 0
+    RETURNING {RANK_COLUMNS}
+"""
+
+def _name_param(username: str | None) -> str | None:
+    return username if username and username != UNKNOWN_USER_NAME else None
+
+# Listener được báo sau mỗi lần ghi stats (vd. cache BXH ở leaderboard.py):
+# listener(guild_id, game_language, rows), rows = các dòng vừa đổi (có các cột RANK_COLUMNS)
+_stats_listeners: list = []
+
+def add_stats_listener(listener) -> None:
+    _stats_listeners.append(listener)
+
+def notify_stats_changed(guild_id: int, game_language: str, rows) -> None:
+    if not rows: return
+    game_language = game_language.upper()
+    for listener in _stats_listeners:
+        listener(guild_id, game_language, rows)
+
+async def get_user_stats_entry(db_pool: asyncpg.Pool, user_id: int, guild_id: int, game_language: str, username: str = UNKNOWN_USER_NAME):
+    """Stats của user (tạo dòng nếu chưa có, cập nhật tên nếu đổi) trong 1 round trip."""
     if not db_pool: return None
-    game_language_upper = game_language.upper()
     async with db_pool.acquire() as connection:
-        stats = await connection.fetchrow(
-            "SELECT * FROM leaderboard_stats WHERE user_id = $1 AND guild_id = $2 AND game_language = $3",
-            user_id, guild_id, game_language_upper
-        )
-        if not stats:
-            await connection.execute(
-                """
-                INSERT INTO leaderboard_stats (user_id, guild_id, game_language, name)
-                VALUES ($1, $2, $3, $4);
-                """, user_id, guild_id, game_language_upper, username
-            )
-            stats = await connection.fetchrow(
-                 "SELECT * FROM leaderboard_stats WHERE user_id = $1 AND guild_id = $2 AND game_language = $3",
-                 user_id, guild_id, game_language_upper
-            )
-        if stats and username and stats['name'] != username and username != "Unknown User":
-            await connection.execute(
-                "UPDATE leaderboard_stats SET name = $1 WHERE user_id = $2 AND guild_id = $3 AND game_language = $4",
-                username, user_id, guild_id, game_language_upper
-            )
-            stats = await connection.fetchrow(
-                 "SELECT * FROM leaderboard_stats WHERE user_id = $1 AND guild_id = $2 AND game_language = $3",
-                 user_id, guild_id, game_language_upper
-            )
-        return dict(stats) if stats else None
+        stats = await connection.fetchrow(_GET_STATS_SQL, user_id, guild_id, game_language.upper(), _name_param(username))
+    return dict(stats) if stats else None
 
 async def update_stat(db_pool: asyncpg.Pool, bot_user_id: int, user_id: int, guild_id: int, stat_key: str, username: str, game_language: str, increment: int = 1):
-    if user_id == bot_user_id or not db_pool: return
-    game_language_upper = game_language.upper()
-    stats = await get_user_stats_entry(db_pool, user_id, guild_id, game_language_upper, username)
-    if not stats:
-        print(f"Không thể lấy/tạo entry cho user {user_id} guild {guild_id} lang {game_language_upper} để cập nhật stat.")
-        return
-
+    """Cộng stat (và cập nhật chuỗi thắng) trong 1 round trip. Trả về stats mới của user."""
+    if user_id == bot_user_id or not db_pool: return None
+    sql = _UPDATE_STAT_SQL.get(stat_key)
+    if sql is None:
+        raise ValueError(f"Stat ko hợp lệ: {stat_key}")
     async with db_pool.acquire() as connection:
-        if stat_key == "wins":
-            await connection.execute(
-                """
-                UPDATE leaderboard_stats
-                SET wins = wins + $1,
-                    current_win_streak = current_win_streak + 1,
-                    max_win_streak = GREATEST(max_win_streak, current_win_streak + 1)
-                WHERE user_id = $2 AND guild_id = $3 AND game_language = $4;
-                """, increment, user_id, guild_id, game_language_upper
-            )
-        elif stat_key in ["wrong_word_link", "invalid_wiktionary", "used_word_error", "wrong_turn", "lost_by_n_ending"]:
-            await connection.execute(
-                f"""
-                UPDATE leaderboard_stats
-                SET {stat_key} = {stat_key} + $1,
-                    current_win_streak = 0
-                WHERE user_id = $2 AND guild_id = $3 AND game_language = $4;
-                """, increment, user_id, guild_id, game_language_upper
-            )
-        else: 
-            await connection.execute(
-                f"UPDATE leaderboard_stats SET {stat_key} = {stat_key} + $1 WHERE user_id = $2 AND guild_id = $3 AND game_language = $4",
-                increment, user_id, guild_id, game_language_upper
-            )
+        stats = await connection.fetchrow(sql, user_id, guild_id, game_language.upper(), _name_param(username), increment)
+    notify_stats_changed(guild_id, game_language, [stats] if stats else None)
+    return dict(stats) if stats else None
 
 async def reset_win_streak_for_user(db_pool: asyncpg.Pool, user_id: int, guild_id: int, game_language: str):
     if not db_pool: return
     game_language_upper = game_language.upper()
     async with db_pool.acquire() as conn:
-        await conn.execute("UPDATE leaderboard_stats SET current_win_streak = 0 WHERE user_id = $1 AND guild_id = $2 AND game_language = $3",
-                           user_id, guild_id, game_language_upper)
\ No newline at end of file
+        rows = await conn.fetch(_RESET_STREAK_SQL, user_id, guild_id, game_language_upper)
+    notify_stats_changed(guild_id, game_language_upper, rows)
+
+async def settle_game(db_pool: asyncpg.Pool, guild_id: int, game_language: str,
+                      winner_id: int | None = None, winner_name: str = UNKNOWN_USER_NAME, reset_user_ids=(),
+                      loser_id: int | None = None, loser_name: str = UNKNOWN_USER_NAME, loser_stat: str | None = None,
+                      stats_buffer=None):
+    """Chốt kết quả ván trong 1 transaction: delta còn chờ của guild trong `stats_buffer` (nếu có, để chúng
+    đứng trước kết quả ván), stat thua của `loser_id`, reset chuỗi thắng của `reset_user_ids` (1 câu `= ANY`),
+    cộng thắng cho `winner_id`. Trả về stats mới của người thắng."""
+    if not db_pool: return None
+    game_language_upper = game_language.upper()
+    reset_ids = [user_id for user_id in reset_user_ids if user_id != winner_id]
+    if loser_stat and _UPDATE_STAT_SQL.get(loser_stat) is None:
+        raise ValueError(f"Stat ko hợp lệ: {loser_stat}")
+    winner_stats = None
+    changed_rows = []
+    pending = await stats_buffer.take(guild_id, game_language_upper) if stats_buffer else None
+    try:
+        async with db_pool.acquire() as connection:
+            async with connection.transaction():
+                if pending: # Vd. wrong_turn của người thắng: reset chuỗi thắng phải xảy ra TRƯỚC trận thắng này
+                    changed_rows.extend(await stats_buffer.write(connection, pending))
+                if loser_id is not None and loser_stat:
+                    loser_stats = await connection.fetchrow(_UPDATE_STAT_SQL[loser_stat], loser_id, guild_id, game_language_upper, _name_param(loser_name), 1)
+                    changed_rows.append(loser_stats)
+                if reset_ids:
+                    changed_rows.extend(await connection.fetch(_RESET_STREAKS_SQL, reset_ids, guild_id, game_language_upper))
+                if winner_id is not None:
+                    winner_stats = await connection.fetchrow(_UPDATE_STAT_SQL["wins"], winner_id, guild_id, game_language_upper, _name_param(winner_name), 1)
+                    changed_rows.append(winner_stats)
+    except Exception:
+        if pending: stats_buffer.restore(pending)
+        raise
+    notify_stats_changed(guild_id, game_language_upper, [row for row in changed_rows if row])
+    return dict(winner_stats) if winner_stats else None
@@ -0,0 +1,208 @@
+# Noitu/dict_snapshot.py
+# Định dạng snapshot nhị phân cho từ điển: đọc bằng mmap, ko tạo object Python cho từng từ.
+#
+# Bố cục file (little-endian):
+#   header   : magic(8) | version u32 | section_count u32 | crc32(payload) u32 | byte_order(1) | pad(3)
+#   directory: section_count x [name(16) | offset u64 | length u64]
+#   payload  : các section, mỗi section căn lề 4 byte
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+
+MAGIC = b"NOITUSNP"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<8sIIIc3x")
+_SECTION = struct.Struct("<16sQQ")
+_BYTE_ORDER = b"L" if sys.byteorder == "little" else b"B"
+
+class SnapshotError(Exception):
+    pass
+
+
+def pack_u32(values) -> bytes:
+    return array.array("I", values).tobytes()
+
+def pack_strings(sections: dict, name: str, strings: list[str]) -> None:
+    """Ghi một bảng chuỗi: blob UTF-8 nối liền + mảng offset (N+1 phần tử)."""
+    offsets = array.array("I", [0])
+    blob = bytearray()
+    for s in strings:
+        blob += s.encode("utf-8")
+        offsets.append(len(blob))
+    sections[f"{name}.off"] = offsets.tobytes()
+    sections[f"{name}.dat"] = bytes(blob)
+
+def pack_snapshot(sections: dict[str, bytes]) -> bytes:
+    names = sorted(sections)
+    payload_start = _HEADER.size + _SECTION.size * len(names)
+    directory = bytearray()
+    payload = bytearray()
+    for name in names:
+        encoded_name = name.encode("ascii")
+        if len(encoded_name) > 16:
+            raise SnapshotError(f"Tên section quá dài: {name}")
+        payload += b"\0" * (-(payload_start + len(payload)) % 4)
+        directory += _SECTION.pack(encoded_name, payload_start + len(payload), len(sections[name]))
+        payload += sections[name]
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(names), zlib.crc32(payload), _BYTE_ORDER)
+    return header + bytes(directory) + bytes(payload)
+
+def write_snapshot(path: str, sections: dict[str, bytes]) -> None:
+    data = pack_snapshot(sections)
+    # Tên file tạm riêng cho mỗi lần ghi: nhiều shard cùng biên dịch lại ko ghi đè file tạm của nhau
+    directory, name = os.path.split(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("wb", dir=directory, prefix=f"{name}.", suffix=".tmp", delete=False) as f:
+        tmp_path = f.name
+        try:
+            f.write(data)
+        except BaseException:
+            f.close()
+            os.unlink(tmp_path)
+            raise
+    os.replace(tmp_path, path) # Atomic: process khác ko bao giờ thấy file ghi dở
+
+
+class StringTable:
+    """Bảng chuỗi trên buffer snapshot. Chuỗi chỉ được decode khi truy cập."""
+    __slots__ = ("_offsets", "_blob")
+
+    def __init__(self, offsets: memoryview, blob: memoryview):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def raw(self, index: int) -> bytes:
+        return bytes(self._blob[self._offsets[index]:self._offsets[index + 1]])
+
+    def __getitem__(self, index: int) -> str:
+        return self.raw(index).decode("utf-8")
+
+    def bisect_left(self, key: bytes, order: memoryview | None = None) -> int:
+        """Tìm nhị phân. `order` là mảng id đã sắp theo chuỗi (nếu bảng ko tự sắp xếp)."""
+        lo, hi = 0, len(self) if order is None else len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.raw(mid if order is None else order[mid]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, key: str, order: memoryview | None = None) -> int | None:
+        """Trả về id của chuỗi `key` (id nhỏ nhất nếu trùng), hoặc None."""
+        encoded = key.encode("utf-8")
+        pos = self.bisect_left(encoded, order)
+        size = len(self) if order is None else len(order)
+        if pos < size:
+            index = pos if order is None else order[pos]
+            if self.raw(index) == encoded:
+                return index
+        return None
+
+
+class Snapshot:
+    def __init__(self, buffer, path: str | None = None):
+        self._buffer = buffer # mmap hoặc bytes, phải sống cùng các memoryview
+        self.path = path
+        view = memoryview(buffer)
+        if len(view) < _HEADER.size:
+            raise SnapshotError("File snapshot quá ngắn.")
+        magic, version, section_count, checksum, byte_order = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise SnapshotError("Sai magic, ko phải file snapshot từ điển.")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"Phiên bản snapshot {version} != {FORMAT_VERSION}.")
+        if byte_order != _BYTE_ORDER:
+            raise SnapshotError("Snapshot được build trên máy khác byte order.")
+
+        payload_start = _HEADER.size + _SECTION.size * section_count
+        if zlib.crc32(view[payload_start:]) != checksum:
+            raise SnapshotError("Checksum snapshot ko khớp (file hỏng?).")
+
+        self._sections: dict[str, memoryview] = {}
+        for i in range(section_count):
+            raw_name, offset, length = _SECTION.unpack_from(view, _HEADER.size + i * _SECTION.size)
+            self._sections[raw_name.rstrip(b"\0").decode("ascii")] = view[offset:offset + length]
+        self.checksum = checksum
+
+    @classmethod
+    def open(cls, path: str) -> "Snapshot":
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, path)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sections
+
+    def section(self, name: str) -> memoryview:
+        try:
+            return self._sections[name]
+        except KeyError:
+            raise SnapshotError(f"Snapshot thiếu section '{name}'.") from None
+
+    def u32(self, name: str) -> memoryview:
+        return self.section(name).cast("I")
+
+    def strings(self, name: str) -> StringTable:
+        return StringTable(self.u32(f"{name}.off"), self.section(f"{name}.dat"))
+
+    def meta(self) -> dict:
+        return json.loads(bytes(self.section("meta")).decode("utf-8")) if "meta" in self else {}
+
+
+def _source_fingerprint(source_path: str) -> dict | None:
+    try:
+        st = os.stat(source_path)
+    except OSError:
+        return None
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def _compile_sections(source_path: str, kind: str, compile_fn) -> dict[str, bytes]:
+    sections = compile_fn(source_path)
+    sections["meta"] = json.dumps({"kind": kind, "source": _source_fingerprint(source_path)}).encode("utf-8")
+    return sections
+
+def build_snapshot(source_path: str, snapshot_path: str, kind: str, compile_fn) -> None:
+    """Biên dịch file nguồn thành snapshot. `compile_fn(source_path)` trả về dict các section."""
+    write_snapshot(snapshot_path, _compile_sections(source_path, kind, compile_fn))
+
+def open_if_current(source_path: str, snapshot_path: str, kind: str) -> Snapshot | None:
+    """mmap snapshot nếu còn hợp lệ (đúng kind, khớp file nguồn); None (kèm log) nếu thiếu, cũ hoặc hỏng."""
+    if not os.path.exists(snapshot_path):
+        return None
+    source_fp = _source_fingerprint(source_path)
+    try:
+        snapshot = Snapshot.open(snapshot_path)
+        meta = snapshot.meta()
+        # Ko có file nguồn (deploy chỉ kèm snapshot) thì dùng luôn snapshot
+        if meta.get("kind") == kind and (source_fp is None or meta.get("source") == source_fp):
+            return snapshot
+        print(f"Snapshot '{snapshot_path}' đã cũ.")
+    except (SnapshotError, ValueError, OSError) as e:
+        print(f"Snapshot '{snapshot_path}' ko dùng được ({e}).")
+    return None
+
+def load_or_build(source_path: str, snapshot_path: str, kind: str, compile_fn) -> Snapshot:
+    """mmap snapshot nếu còn hợp lệ, ngược lại biên dịch lại từ file nguồn."""
+    snapshot = open_if_current(source_path, snapshot_path, kind)
+    if snapshot is not None:
+        return snapshot
+    if _source_fingerprint(source_path) is None:
+        raise FileNotFoundError(source_path)
+    print(f"Biên dịch lại snapshot '{snapshot_path}'.")
+    sections = _compile_sections(source_path, kind, compile_fn)
+    try:
+        write_snapshot(snapshot_path, sections)
+        return Snapshot.open(snapshot_path)
+    except OSError as e:
+        # Thư mục chỉ đọc: vẫn chạy được với snapshot trong RAM
+        print(f"Ko ghi được snapshot '{snapshot_path}': {e}. Dùng bản trong bộ nhớ.")
+        return Snapshot(pack_snapshot(sections))
@@ -0,0 +1,146 @@
+# Noitu/game/countdown.py
+# Hiển thị đếm ngược: mỗi game 1 tin nhắn được sửa lại (ko gửi/xóa mỗi lượt), cập nhật được gộp theo kênh
+# và mọi kênh dùng chung 1 ngân sách request/giây. Khi quá tải, mỗi kênh chỉ được cập nhật thưa hơn.
+import asyncio
+import time
+
+import discord
+
+from .. import config as bot_cfg
+
+
+class _Countdown:
+    __slots__ = ("channel", "message", "content", "rendered", "rendered_at", "urgent", "in_flight", "released")
+
+    def __init__(self, channel: discord.TextChannel):
+        self.channel = channel
+        self.message: discord.Message | None = None
+        self.content = "" # Nội dung muốn hiển thị (mới nhất)
+        self.rendered = "" # Nội dung đang hiển thị trên Discord
+        self.rendered_at = 0.0
+        self.urgent = False # Lượt mới: ưu tiên hơn các tick giảm giây
+        self.in_flight = False
+        self.released = False
+
+
+class CountdownRenderer:
+    def __init__(self, edits_per_second: float = bot_cfg.COUNTDOWN_EDITS_PER_SECOND,
+                 min_interval: float = bot_cfg.COUNTDOWN_MIN_INTERVAL_SECONDS):
+        self.rate = edits_per_second
+        self.min_interval = min_interval # Khoảng cách tối thiểu giữa 2 lần sửa trong cùng kênh
+        self._tokens = float(edits_per_second)
+        self._refilled_at = time.monotonic()
+        self._entries: dict[int, _Countdown] = {} # channel_id -> tin nhắn đếm ngược của game
+        self._dirty: dict[int, None] = {} # Kênh cần hiển thị lại, cũ nhất đứng trước
+        self.on_sent = None # (channel_id, message_id) -> None, gọi khi gửi tin nhắn đếm ngược mới
+        self._tasks: set[asyncio.Task] = set() # Giữ tham chiếu để task ko bị GC khi đang chạy
+        self.sent = 0
+        self.edited = 0
+        self.deleted = 0
+        self.failed = 0
+        self.skipped = 0 # Cập nhật bị bỏ (bị bản mới hơn thay thế trước khi kịp hiển thị)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def show(self, channel: discord.TextChannel, content: str, urgent: bool = False) -> None:
+        """Đặt nội dung đếm ngược của kênh. Chỉ bản mới nhất được gửi khi có ngân sách."""
+        entry = self._entries.get(channel.id)
+        if entry is None:
+            entry = self._entries[channel.id] = _Countdown(channel)
+        if entry.content == content:
+            return
+        if entry.content != entry.rendered:
+            self.skipped += 1
+        entry.content = content
+        entry.urgent = entry.urgent or urgent
+        if channel.id not in self._dirty:
+            self._dirty[channel.id] = None
+
+    def release(self, channel_id: int) -> None:
+        """Game kết thúc / hết lượt có hẹn giờ: xóa tin nhắn đếm ngược."""
+        entry = self._entries.pop(channel_id, None)
+        self._dirty.pop(channel_id, None)
+        if entry is None:
+            return
+        if entry.content != entry.rendered:
+            self.skipped += 1
+        entry.released = True
+        if entry.message and not entry.in_flight: # Đang gửi/sửa thì _render tự xóa khi xong
+            self._delete(entry)
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(float(self.rate), self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def pump(self) -> None:
+        """Gửi các cập nhật đang chờ trong giới hạn ngân sách: lượt mới trước, rồi kênh chờ lâu nhất."""
+        if not self._dirty:
+            return
+        now = time.monotonic()
+        self._refill(now)
+        for urgent_pass in (True, False):
+            for channel_id in list(self._dirty):
+                if self._tokens < 1:
+                    return
+                entry = self._entries[channel_id]
+                if entry.in_flight or entry.urgent != urgent_pass:
+                    continue
+                if not entry.urgent and now - entry.rendered_at < self.min_interval:
+                    continue
+                del self._dirty[channel_id]
+                self._tokens -= 1
+                entry.in_flight = True
+                entry.urgent = False
+                self._spawn(self._render(entry, entry.content))
+
+    async def _render(self, entry: _Countdown, content: str) -> None:
+        try:
+            if entry.message is None:
+                entry.message = await entry.channel.send(content)
+                self.sent += 1
+                if self.on_sent:
+                    self.on_sent(entry.channel.id, entry.message.id)
+            else:
+                await entry.message.edit(content=content)
+                self.edited += 1
+            entry.rendered = content
+        except discord.NotFound: # Tin nhắn bị xóa tay: lần sau gửi tin mới
+            entry.message = None
+        except discord.HTTPException as e:
+            self.failed += 1
+            entry.rendered = content # Ko thử lại ngay; tick sau có nội dung mới thì gửi lại
+            print(f"Lỗi cập nhật msg đếm ngược ở kênh {entry.channel.id}: {e}")
+        finally:
+            entry.in_flight = False
+            entry.rendered_at = time.monotonic()
+
+        if entry.released:
+            if entry.message:
+                self._delete(entry)
+        elif entry.content != entry.rendered and entry.channel.id not in self._dirty:
+            self._dirty[entry.channel.id] = None
+
+    def _delete(self, entry: _Countdown) -> None:
+        message, entry.message = entry.message, None
+        self.deleted += 1
+        self._spawn(_delete_quietly(message))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def close(self) -> None:
+        for channel_id in list(self._entries):
+            self.release(channel_id)
+
+    def stats(self) -> dict:
+        return {"active": len(self._entries), "pending": len(self._dirty), "in_flight": len(self._tasks), "sent": self.sent, "edited": self.edited,
+                "deleted": self.deleted, "failed": self.failed, "skipped": self.skipped,
+                "edits_per_second": self.rate}
+
+
+async def _delete_quietly(message: discord.Message) -> None:
+    try: await message.delete()
+    except (discord.NotFound, discord.HTTPException): pass
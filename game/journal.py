@@ -0,0 +1,199 @@
+# Noitu/game/journal.py
+# Nhật ký (append-only) các ván đang chơi: bắt đầu, nước đi hợp lệ, tin nhắn đếm ngược, kết thúc.
+# Ghi chỉ là thêm vào list trong RAM; task nền ghi xuống bảng game_journal theo lô nên ko làm chậm nước đi.
+# Khi bot khởi động lại, các ván chưa kết thúc được dựng lại từ nhật ký (logic.restore_active_games).
+import asyncio
+import json
+import time
+import traceback
+
+import asyncpg
+
+from .. import config as bot_cfg
+from .state import GameState
+
+START, MOVE, COUNTDOWN, END = "start", "move", "countdown", "end"
+
+_APPEND_SQL = """
+    INSERT INTO game_journal (channel_id, event, payload)
+    SELECT channel_id, event, payload::jsonb
+    FROM unnest($1::bigint[], $2::varchar[], $3::text[]) WITH ORDINALITY AS e(channel_id, event, payload, ord)
+    ORDER BY ord
+"""
+# Ván đã kết thúc ko cần khôi phục: xóa luôn các dòng của kênh -> bảng chỉ chứa các ván đang chơi
+_DELETE_SQL = "DELETE FROM game_journal WHERE channel_id = ANY($1::bigint[])"
+_LOAD_SQL = "SELECT channel_id, event, payload FROM game_journal ORDER BY channel_id, seq"
+
+
+def _position(game_state: GameState) -> dict:
+    return {
+        "phrase": game_state.current_phrase_str,
+        "display": game_state.current_phrase_display_form,
+        "match": game_state.word_to_match_next,
+        "player": game_state.last_player_id,
+        "message": game_state.last_correct_message_id,
+        "at": time.time(), # Giờ thật: tính thời gian còn lại của lượt sau khi khởi động lại
+    }
+
+
+class GameJournal:
+    def __init__(self, db_pool: asyncpg.Pool | None, max_pending: int = bot_cfg.GAME_JOURNAL_MAX_PENDING,
+                 max_backlog: int = bot_cfg.GAME_JOURNAL_MAX_BACKLOG,
+                 max_retry_delay: float = bot_cfg.GAME_JOURNAL_RETRY_MAX_SECONDS):
+        self.db_pool = db_pool
+        self.max_pending = max_pending # Đủ số sự kiện này thì ghi ngay, ko chờ chu kỳ
+        self.max_backlog = max_backlog # DB lỗi lâu: giữ tối đa chừng này sự kiện, phần dư bị bỏ
+        self.max_retry_delay = max_retry_delay
+        self._retry_delay = 0.0
+        self._retry_at = 0.0 # Sau lần ghi lỗi: chờ tới lúc này mới thử lại (backoff lũy thừa)
+        self._pending: list[tuple[int, str, dict]] = []
+        self._flush_lock = asyncio.Lock()
+        self._threshold_flush: asyncio.Task | None = None
+        self.recorded = 0
+        self.flushes = 0
+        self.written = 0
+        self.compacted = 0 # Số ván kết thúc đã được xóa khỏi bảng
+        self.failed_flushes = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _record(self, channel_id: int, event: str, payload: dict) -> None:
+        if not self.db_pool: return
+        self._pending.append((channel_id, event, payload))
+        self.recorded += 1
+        if len(self._pending) >= self.max_pending and not self._threshold_flush and not self._backing_off():
+            self._threshold_flush = asyncio.create_task(self._flush_on_threshold())
+
+    def start(self, channel_id: int, game_state: GameState) -> None:
+        payload = _position(game_state)
+        payload.update(guild=game_state.guild_id, lang=game_state.game_language,
+                       min_players=game_state.min_players_for_timeout, timeout=game_state.timeout_seconds,
+                       difficulty=game_state.bot_difficulty)
+        self._record(channel_id, START, payload)
+
+    def move(self, channel_id: int, game_state: GameState) -> None:
+        """Gọi sau khi nước đi đã được áp dụng vào `game_state`."""
+        self._record(channel_id, MOVE, _position(game_state))
+
+    def countdown(self, channel_id: int, message_id: int) -> None:
+        """Tin nhắn đếm ngược mới của kênh (để dọn nếu bot chết giữa ván)."""
+        self._record(channel_id, COUNTDOWN, {"message": message_id})
+
+    def end(self, channel_id: int) -> None:
+        self._record(channel_id, END, {})
+
+    def _backing_off(self) -> bool:
+        return time.monotonic() < self._retry_at
+
+    async def _flush_on_threshold(self) -> None:
+        try:
+            await self.flush()
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self._threshold_flush = None
+
+    async def flush(self, force: bool = False) -> int:
+        """Ghi các sự kiện đang chờ. Sau lần ghi lỗi, các lần gọi trong thời gian backoff ko làm gì (trừ khi `force`)."""
+        async with self._flush_lock:
+            if not self._pending or not self.db_pool:
+                return 0
+            if self._backing_off() and not force:
+                return 0
+            batch, self._pending = _compact(self._pending), []
+            last_end = {channel_id: i for i, (channel_id, event, _) in enumerate(batch) if event == END}
+            rows = [entry for i, entry in enumerate(batch) if i > last_end.get(entry[0], -1)]
+            try:
+                async with self.db_pool.acquire() as connection:
+                    async with connection.transaction():
+                        if last_end:
+                            await connection.execute(_DELETE_SQL, list(last_end))
+                        if rows:
+                            await connection.execute(_APPEND_SQL, [row[0] for row in rows], [row[1] for row in rows],
+                                                     [json.dumps(row[2]) for row in rows])
+            except Exception as e:
+                self.failed_flushes += 1
+                self._retry_delay = min(max(self._retry_delay * 2, 1.0), self.max_retry_delay)
+                self._retry_at = time.monotonic() + self._retry_delay
+                print(f"Lỗi ghi nhật ký game ({len(batch)} sự kiện), thử lại sau {self._retry_delay:.0f}s: {e}")
+                # Giữ thứ tự: sự kiện cũ trước sự kiện mới ghi trong lúc flush
+                self._pending = _compact(batch + self._pending)
+                excess = len(self._pending) - self.max_backlog
+                if excess > 0: # Ko để hàng đợi phình mãi khi DB lỗi lâu
+                    del self._pending[:excess]
+                    self.dropped += excess
+                    print(f"Nhật ký game vượt {self.max_backlog} sự kiện, bỏ {excess} sự kiện cũ nhất (tổng đã bỏ: {self.dropped}).")
+                return 0
+            self._retry_delay = 0.0
+            self._retry_at = 0.0
+            self.flushes += 1
+            self.written += len(rows)
+            self.compacted += len(last_end)
+            return len(rows)
+
+    async def load(self) -> dict[int, list[tuple[str, dict]]]:
+        """Nhật ký các ván chưa kết thúc: channel_id -> [(sự kiện, payload)] theo thứ tự ghi."""
+        if not self.db_pool: return {}
+        async with self.db_pool.acquire() as connection:
+            rows = await connection.fetch(_LOAD_SQL)
+        games: dict[int, list[tuple[str, dict]]] = {}
+        for row in rows:
+            games.setdefault(row["channel_id"], []).append((row["event"], json.loads(row["payload"])))
+        return games
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "recorded": self.recorded, "flushes": self.flushes,
+                "written": self.written, "compacted": self.compacted, "failed_flushes": self.failed_flushes,
+                "dropped": self.dropped}
+
+
+def _compact(events: list[tuple[int, str, dict]]) -> list[tuple[int, str, dict]]:
+    """Bỏ các sự kiện đứng trước END cuối cùng của mỗi kênh (ván đó đã xong). END được giữ lại
+    để flush còn xóa các dòng cũ của kênh đã nằm trong DB."""
+    last_end = {channel_id: i for i, (channel_id, event, _) in enumerate(events) if event == END}
+    if not last_end:
+        return events
+    return [entry for i, entry in enumerate(events) if i >= last_end.get(entry[0], -1)]
+
+
+def replay(events: list[tuple[str, dict]], dictionary_for, bot_user_id: int) -> tuple[GameState | None, float, list[int]]:
+    """Dựng lại GameState từ nhật ký của 1 kênh. Trả về (state hoặc None nếu ván đã kết thúc/ko đủ dữ liệu,
+    thời điểm nước đi cuối, id các tin nhắn đếm ngược đã gửi)."""
+    countdown_message_ids = [payload["message"] for event, payload in events if event == COUNTDOWN]
+    starts = [i for i, (event, _) in enumerate(events) if event == START]
+    if not starts or any(event == END for event, _ in events[starts[-1]:]):
+        return None, 0.0, countdown_message_ids
+
+    game_state, last_at = None, 0.0
+    for event, payload in events[starts[-1]:]:
+        if event == START:
+            game_state = GameState(payload["lang"], dictionary_for(payload["lang"]), payload["guild"],
+                                   min_players_for_timeout=payload["min_players"], timeout_seconds=payload["timeout"],
+                                   bot_difficulty=payload["difficulty"])
+        elif event != MOVE:
+            continue
+        game_state.current_phrase_str = payload["phrase"]
+        game_state.current_phrase_display_form = payload["display"]
+        game_state.word_to_match_next = payload["match"]
+        game_state.last_player_id = payload["player"]
+        game_state.last_correct_message_id = payload["message"]
+        game_state.mark_used(payload["phrase"])
+        if payload["player"] != bot_user_id:
+            game_state.add_participant(payload["player"])
+        last_at = payload["at"]
+
+    game_state.timeout_can_be_activated = bool(game_state.bot_difficulty) or \
+        len(game_state.participants_since_start) >= game_state.min_players_for_timeout
+    return game_state, last_at, countdown_message_ids
+
+
+async def run_flush_loop(journal: GameJournal, interval_seconds: float = bot_cfg.GAME_JOURNAL_FLUSH_SECONDS):
+    """Task nền: định kỳ ghi nhật ký game xuống DB."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await journal.flush()
+        except Exception:
+            traceback.print_exc()
@@ -3,6 +3,7 @@ import discord
 from discord.ext import commands
 import random # Đảm bảo import random
 import asyncio
+import time
 import traceback
 
 from .. import database
@@ -10,173 +11,143 @@ from .. import wiktionary_api
 from .. import utils
 from .. import config as bot_cfg
 from .views import PostGameView
+from .state import GameState
+from .journal import replay as replay_journal
 
+# Chế độ đấu với bot: tên độ khó người chơi nhập -> độ khó trong game.word_graph
+BOT_DIFFICULTY_ALIASES = {
+    "easy": "easy", "de": "easy", "dễ": "easy",
+    "medium": "medium", "vua": "medium", "vừa": "medium",
+    "hard": "hard", "kho": "hard", "khó": "hard",
+}
+BOT_DIFFICULTY_LABELS = {"easy": "Dễ", "medium": "Vừa", "hard": "Khó"}
 
-async def check_game_timeout(bot: commands.Bot, channel_id: int, guild_id: int, expected_last_player_id: int, expected_phrase_normalized: str, game_lang: str):
-    if not bot.db_pool: return 
 
-    timeout_seconds_for_guild, _ , _ = await utils.get_channel_game_settings(bot, guild_id, channel_id)
-    
-    guild_cfg_for_prefix = await database.get_guild_config(bot.db_pool, guild_id)
+def _dictionary_for(bot: commands.Bot, game_lang: str):
+    return bot.local_dictionary_vn if game_lang == "VN" else bot.local_dictionary_jp
+
+async def end_game_dead_end(bot: commands.Bot, channel: discord.TextChannel, game_state: GameState):
+    """Kết thúc game ngay khi ko còn từ để nối, ko chờ timeout."""
+    if bot.active_games.get(channel.id) is game_state:
+        del bot.active_games[channel.id]
+        bot.game_journal.end(channel.id)
+    game_state.cancel_timeout()
+
+    guild_cfg_for_prefix = await database.get_guild_config(bot.db_pool, game_state.guild_id)
     command_prefix_for_guild = guild_cfg_for_prefix.get("command_prefix", bot_cfg.DEFAULT_COMMAND_PREFIX) if guild_cfg_for_prefix else bot_cfg.DEFAULT_COMMAND_PREFIX
+    await announce_last_player_win(bot, channel, game_state, command_prefix_for_guild)
 
-    countdown_message: discord.Message = None
-    message_channel = bot.get_channel(channel_id)
-    if not message_channel or not isinstance(message_channel, discord.TextChannel):
-        if channel_id in bot.active_games: del bot.active_games[channel_id] 
+
+async def handle_turn_timeout(bot: commands.Bot, timer):
+    """Gọi bởi game.timers.TurnTimers khi hết giờ lượt: người ra từ cuối thắng."""
+    game = timer.game_state
+    channel_id = timer.channel.id
+    if bot.active_games.get(channel_id) is not game or not game.active:
         return
+    if game.last_player_id != timer.last_player_id or game.current_phrase_str != timer.phrase:
+        return # Đã có nước đi mới (timer mới đã được đặt)
+    del bot.active_games[channel_id]
+    bot.game_journal.end(channel_id)
 
-    display_phrase_for_countdown = expected_phrase_normalized.title() if game_lang == "VN" else expected_phrase_normalized
+    guild_cfg_for_prefix = await database.get_guild_config(bot.db_pool, game.guild_id)
+    command_prefix_for_guild = guild_cfg_for_prefix.get("command_prefix", bot_cfg.DEFAULT_COMMAND_PREFIX) if guild_cfg_for_prefix else bot_cfg.DEFAULT_COMMAND_PREFIX
+    await announce_last_player_win(bot, timer.channel, game, command_prefix_for_guild, timeout_seconds=timer.timeout_seconds)
+
+async def announce_last_player_win(bot: commands.Bot, message_channel: discord.TextChannel, game: GameState,
+                                   command_prefix_for_guild: str, timeout_seconds: int = None):
+    """Người ra từ cuối thắng: hết giờ (timeout_seconds) hoặc hết từ để nối (timeout_seconds=None)."""
+    winner_id = game.last_player_id
+    guild_id = game.guild_id
+    await bot.stats_buffer.flush_before_settlement(guild_id, game.game_language) # Stats trong ván phải xuống DB trước khi chốt thắng/thua
+    expected_phrase_normalized = game.current_phrase_str
+    current_game_lang = game.game_language 
+    
+    winning_phrase_display = ""
+    if current_game_lang == "VN":
+        winning_phrase_display = " ".join(w.capitalize() for w in expected_phrase_normalized.split())
+    else: 
+        winning_phrase_display = game.current_phrase_display_form
 
-    initial_countdown_text_base = "" 
-    if expected_last_player_id == bot.user.id:
-        initial_countdown_text_base = f"⏳ {bot_cfg.BOT_PLAYER_START_EMOJI} Bot đã ra từ \"**{display_phrase_for_countdown}**\". "
+    if timeout_seconds is not None:
+        end_title = "Hết Giờ!"
+        end_reason_text = f"Đã hết **{timeout_seconds} giây**!"
+        win_detail_text = f"Không ai nối tiếp được từ \"**{winning_phrase_display}**\" của bạn trong **{timeout_seconds} giây**."
     else:
+        end_title = "Hết Từ!"
+        end_reason_text = "Từ điển không còn từ nào chưa dùng để nối!"
+        win_detail_text = f"Không còn từ nào chưa dùng để nối tiếp \"**{winning_phrase_display}**\" của bạn."
+
+    win_embed = discord.Embed(color=bot_cfg.EMBED_COLOR_WIN)
+    original_starter_for_view = winner_id 
+    game_lang_display = f"{bot_cfg.GAME_VN_ICON} Tiếng Việt" if current_game_lang == "VN" else f"{bot_cfg.GAME_JP_ICON} Tiếng Nhật"
+
+    if winner_id == bot.user.id: 
+        win_embed.title = f"{bot_cfg.TIMEOUT_WIN_ICON} {end_title} Không Ai Nối Từ Của Bot {bot_cfg.TIMEOUT_WIN_ICON}"
+        win_embed.description = (
+            f"{end_reason_text} Không ai nối được từ \"**{winning_phrase_display}**\" của {bot_cfg.BOT_PLAYER_START_EMOJI} Bot.\n"
+            f"Game Nối Từ ({game_lang_display}) kết thúc không có người thắng."
+        )
+        if game.bot_difficulty: # Đấu với bot: người chơi thua bot
+            win_embed.description = (
+                f"{end_reason_text} Không nối được từ \"**{winning_phrase_display}**\".\n"
+                f"{bot_cfg.BOT_PLAYER_START_EMOJI} Bot (độ khó: {BOT_DIFFICULTY_LABELS.get(game.bot_difficulty)}) thắng game Nối Từ ({game_lang_display})!"
+            )
+            await database.settle_game(bot.db_pool, guild_id, current_game_lang, reset_user_ids=game.participants_since_start, stats_buffer=bot.stats_buffer)
+        original_starter_for_view = game.participants_since_start[0] if game.participants_since_start else bot.user.id
+        if bot.user.display_avatar: win_embed.set_thumbnail(url=bot.user.display_avatar.url)
+    else: 
+        winner_name_display = f"User ID {winner_id}" 
+        winner_user_obj = None
         try:
-            winner_user_to_be = await bot.fetch_user(expected_last_player_id)
-            initial_countdown_text_base = f"⏳ {bot_cfg.USER_PLAYER_START_EMOJI} {winner_user_to_be.mention} đã ra từ \"**{display_phrase_for_countdown}**\". "
-        except discord.NotFound:
-            initial_countdown_text_base = f"⏳ {bot_cfg.USER_PLAYER_START_EMOJI} Người chơi ID {expected_last_player_id} đã ra từ \"**{display_phrase_for_countdown}**\". "
-        except discord.HTTPException: 
-            initial_countdown_text_base = f"⏳ {bot_cfg.USER_PLAYER_START_EMOJI} Một người chơi đã ra từ \"**{display_phrase_for_countdown}**\". "
-
-    try:
-        countdown_message = await message_channel.send(f"{initial_countdown_text_base}Thời gian cho người tiếp theo: {timeout_seconds_for_guild} giây.")
-    except discord.HTTPException as e:
-        print(f"Lỗi gửi msg đếm ngược: {e}")
-        countdown_message = None
-
-    time_slept = 0 
-    edit_interval = 1 
-
-    try:
-        while time_slept < timeout_seconds_for_guild:
-            await asyncio.sleep(min(edit_interval, timeout_seconds_for_guild - time_slept))
-            time_slept += edit_interval
-
-            if channel_id not in bot.active_games or not bot.active_games[channel_id]["active"]:
-                if countdown_message: 
-                    try: await countdown_message.delete()
-                    except (discord.NotFound, discord.HTTPException): pass
-                return
-
-            game = bot.active_games[channel_id]
-            if not (game.get("last_player_id") == expected_last_player_id and \
-                    game.get("current_phrase_str") == expected_phrase_normalized):
-                if countdown_message: 
-                    try: await countdown_message.delete()
-                    except (discord.NotFound, discord.HTTPException): pass
-                return
-
-            if countdown_message: 
-                remaining_time = max(0, timeout_seconds_for_guild - time_slept)
-                new_text = f"{initial_countdown_text_base}Thời gian cho người tiếp theo: {remaining_time} giây."
-                if remaining_time > 0 :
-                    try: await countdown_message.edit(content=new_text)
-                    except (discord.NotFound, discord.HTTPException): countdown_message = None
-
-            if time_slept >= timeout_seconds_for_guild: break 
-
-        if countdown_message: 
-            try: await countdown_message.delete()
-            except (discord.NotFound, discord.HTTPException): pass
-
-        if channel_id in bot.active_games and bot.active_games[channel_id]["active"]:
-            game = bot.active_games[channel_id]
-            if game.get("last_player_id") == expected_last_player_id and \
-               game.get("current_phrase_str") == expected_phrase_normalized:
-
-                winner_id = game["last_player_id"]
-                current_game_lang = game.get("game_language", "VN") 
-                
-                winning_phrase_display = ""
-                if current_game_lang == "VN":
-                    winning_phrase_display = " ".join(w.capitalize() for w in expected_phrase_normalized.split())
-                else: 
-                    winning_phrase_display = game.get("current_phrase_display_form", expected_phrase_normalized)
-
-                win_embed = discord.Embed(color=bot_cfg.EMBED_COLOR_WIN)
-                original_starter_for_view = winner_id 
-                game_lang_display = f"{bot_cfg.GAME_VN_ICON} Tiếng Việt" if current_game_lang == "VN" else f"{bot_cfg.GAME_JP_ICON} Tiếng Nhật"
-
-                if winner_id == bot.user.id: 
-                    win_embed.title = f"{bot_cfg.TIMEOUT_WIN_ICON} Hết Giờ! Không Ai Nối Từ Của Bot {bot_cfg.TIMEOUT_WIN_ICON}"
-                    win_embed.description = (
-                        f"Đã hết **{timeout_seconds_for_guild} giây**! Không ai nối được từ \"**{winning_phrase_display}**\" của {bot_cfg.BOT_PLAYER_START_EMOJI} Bot.\n"
-                        f"Game Nối Từ ({game_lang_display}) kết thúc không có người thắng."
-                    )
-                    participants_list = list(game.get("participants_since_start", []))
-                    original_starter_for_view = participants_list[0] if participants_list else bot.user.id
-                    if bot.user.display_avatar: win_embed.set_thumbnail(url=bot.user.display_avatar.url)
-                else: 
-                    winner_name_display = f"User ID {winner_id}" 
-                    winner_user_obj = None
-                    try:
-                        winner_user_obj = await bot.fetch_user(winner_id)
-                        winner_name_display = winner_user_obj.name 
-                        if winner_user_obj.display_avatar: win_embed.set_thumbnail(url=winner_user_obj.display_avatar.url)
-                        
-                        await database.update_stat(bot.db_pool, bot.user.id, winner_id, guild_id, "wins", winner_name_display, game_language=current_game_lang)
-                        for pid in game.get("participants_since_start", set()):
-                            if pid != winner_id and pid != bot.user.id:
-                                await database.reset_win_streak_for_user(bot.db_pool, pid, guild_id, game_language=current_game_lang)
-
-                        win_embed.title = f"{bot_cfg.WIN_ICON} {discord.utils.escape_markdown(winner_name_display)} Chiến Thắng! {bot_cfg.WIN_ICON}"
-                        win_embed.description = (
-                            f"{winner_user_obj.mention} đã chiến thắng game Nối Từ ({game_lang_display})!\n"
-                            f"Không ai nối tiếp được từ \"**{winning_phrase_display}**\" của bạn trong **{timeout_seconds_for_guild} giây**."
-                        )
-                        user_stats = await database.get_user_stats_entry(bot.db_pool, winner_id, guild_id, current_game_lang, winner_name_display)
-                        if user_stats: 
-                             stats_text = (
-                                 f"🏅 Tổng thắng: **{user_stats['wins']}**\n"
-                                 f"🔥 Chuỗi thắng hiện tại: **{user_stats['current_win_streak']}** (Max: **{user_stats['max_win_streak']}**)"
-                             )
-                             win_embed.add_field(name="Thành Tích Cá Nhân", value=stats_text, inline=False)
-                        original_starter_for_view = winner_id
-                    except discord.NotFound: 
-                        await database.update_stat(bot.db_pool, bot.user.id, winner_id, guild_id, "wins", f"User ID {winner_id}", game_language=current_game_lang)
-                        win_embed.title = f"{bot_cfg.WIN_ICON} Người Chơi ID {winner_id} Thắng Cuộc! {bot_cfg.WIN_ICON}"
-                        win_embed.description = f"Người chơi ID {winner_id} đã thắng game ({game_lang_display}) với từ \"**{winning_phrase_display}**\"! (Không thể lấy thông tin chi tiết)."
-                    except discord.HTTPException: 
-                         await database.update_stat(bot.db_pool, bot.user.id, winner_id, guild_id, "wins", f"User ID {winner_id} (API Err)", game_language=current_game_lang)
-                         win_embed.title = f"{bot_cfg.WIN_ICON} Một Người Chơi Thắng! {bot_cfg.WIN_ICON}"
-                         win_embed.description = f"Một người chơi đã thắng game ({game_lang_display}) với từ \"**{winning_phrase_display}**\"! (Lỗi khi lấy thông tin người chơi)."
-                
-                win_embed.set_footer(text=f"Kênh: #{message_channel.name} | Server: {message_channel.guild.name}")
-                
-                view = PostGameView(
-                    channel=message_channel,
-                    original_starter_id=original_starter_for_view,
-                    command_prefix_for_guild=command_prefix_for_guild,
-                    bot_instance=bot, 
-                    internal_start_game_callable=internal_start_game 
-                )
-                msg_with_view = await message_channel.send(embed=win_embed, view=view)
-                if msg_with_view: view.message_to_edit = msg_with_view 
-
-                # Gửi emoji ngẫu nhiên
-                if message_channel.guild:
-                    await utils.send_random_guild_emoji_if_any(message_channel, message_channel.guild)
-
-                if channel_id in bot.active_games and \
-                   bot.active_games[channel_id].get("last_player_id") == expected_last_player_id and \
-                   bot.active_games[channel_id].get("current_phrase_str") == expected_phrase_normalized:
-                    del bot.active_games[channel_id]
+            winner_user_obj = await bot.user_names.fetch(winner_id, message_channel.guild)
+            winner_name_display = winner_user_obj.name 
+            if winner_user_obj.display_avatar: win_embed.set_thumbnail(url=winner_user_obj.display_avatar.url)
+            
+            user_stats = await database.settle_game(bot.db_pool, guild_id, current_game_lang, winner_id, winner_name_display,
+                                                    reset_user_ids=game.participants_since_start, stats_buffer=bot.stats_buffer)
 
-    except asyncio.CancelledError: 
-        if countdown_message:
-            try: await countdown_message.delete()
-            except (discord.NotFound, discord.HTTPException): pass
-    except Exception as e:
-        print(f"Lỗi nghiêm trọng trong check_game_timeout cho kênh {channel_id} (từ: {expected_phrase_normalized}): {e}")
-        traceback.print_exc()
-        if countdown_message:
-            try: await countdown_message.delete()
-            except (discord.NotFound, discord.HTTPException): pass
+            win_embed.title = f"{bot_cfg.WIN_ICON} {discord.utils.escape_markdown(winner_name_display)} Chiến Thắng! {bot_cfg.WIN_ICON}"
+            win_embed.description = (
+                f"{winner_user_obj.mention} đã chiến thắng game Nối Từ ({game_lang_display})!\n"
+                f"{win_detail_text}"
+            )
+            if user_stats: 
+                 stats_text = (
+                     f"🏅 Tổng thắng: **{user_stats['wins']}**\n"
+                     f"🔥 Chuỗi thắng hiện tại: **{user_stats['current_win_streak']}** (Max: **{user_stats['max_win_streak']}**)"
+                 )
+                 win_embed.add_field(name="Thành Tích Cá Nhân", value=stats_text, inline=False)
+            original_starter_for_view = winner_id
+        except discord.NotFound: 
+            await database.settle_game(bot.db_pool, guild_id, current_game_lang, winner_id, f"User ID {winner_id}",
+                                       reset_user_ids=game.participants_since_start, stats_buffer=bot.stats_buffer)
+            win_embed.title = f"{bot_cfg.WIN_ICON} Người Chơi ID {winner_id} Thắng Cuộc! {bot_cfg.WIN_ICON}"
+            win_embed.description = f"Người chơi ID {winner_id} đã thắng game ({game_lang_display}) với từ \"**{winning_phrase_display}**\"! (Không thể lấy thông tin chi tiết)."
+        except discord.HTTPException: 
+             await database.settle_game(bot.db_pool, guild_id, current_game_lang, winner_id, f"User ID {winner_id} (API Err)",
+                                        reset_user_ids=game.participants_since_start, stats_buffer=bot.stats_buffer)
+             win_embed.title = f"{bot_cfg.WIN_ICON} Một Người Chơi Thắng! {bot_cfg.WIN_ICON}"
+             win_embed.description = f"Một người chơi đã thắng game ({game_lang_display}) với từ \"**{winning_phrase_display}**\"! (Lỗi khi lấy thông tin người chơi)."
+    
+    win_embed.set_footer(text=f"Kênh: #{message_channel.name} | Server: {message_channel.guild.name}")
+    
+    view = PostGameView(
+        channel=message_channel,
+        original_starter_id=original_starter_for_view,
+        command_prefix_for_guild=command_prefix_for_guild,
+        bot_instance=bot, 
+        internal_start_game_callable=internal_start_game 
+    )
+    msg_with_view = await message_channel.send(embed=win_embed, view=view)
+    if msg_with_view: view.message_to_edit = msg_with_view 
+
+    # Gửi emoji ngẫu nhiên
+    if message_channel.guild:
+        await utils.send_random_guild_emoji_if_any(message_channel, message_channel.guild)
 
 async def internal_start_game(bot: commands.Bot, channel: discord.TextChannel, author: discord.User | discord.Member,
-                              guild_id: int, start_phrase_input: str = None, interaction: discord.Interaction = None):
+                              guild_id: int, start_phrase_input: str = None, interaction: discord.Interaction = None,
+                              bot_difficulty: str = None):
     
     async def send_response(msg_content: str, ephemeral_flag: bool = True, embed=None):
         target = interaction if interaction else commands.Context(message=None, bot=bot, view=None, prefix=None) 
@@ -196,18 +167,24 @@ async def internal_start_game(bot: commands.Bot, channel: discord.TextChannel, a
         
         await utils._send_message_smart(target, content=msg_content, embed=embed, ephemeral=ephemeral_flag)
 
-    if not bot.http_session or bot.http_session.closed:
+    if not bot.wiktionary_client or bot.wiktionary_client.closed:
         await send_response("⚠️ Bot chưa sẵn sàng (Session HTTP). Vui lòng thử lại sau giây lát.")
         return
     if not bot.db_pool:
         await send_response("⚠️ Bot chưa sẵn sàng (Kết nối Database). Vui lòng thử lại sau giây lát.")
         return
+    if not await utils.wait_for_language_resources(bot):
+        await send_response("⚠️ Bot chưa sẵn sàng (đang tải từ điển). Vui lòng thử lại sau giây lát.")
+        return
 
     timeout_s, min_p, game_lang_for_channel = await utils.get_channel_game_settings(bot, guild_id, channel.id)
 
     if not game_lang_for_channel:
         await send_response(f"⚠️ Kênh này chưa được cấu hình để chơi Nối Từ. Admin có thể dùng `/config set_vn_channel` hoặc `/config set_jp_channel`.")
         return
+    if bot_difficulty and not (bot.word_graph_vn if game_lang_for_channel == "VN" else bot.word_graph_jp):
+        await send_response("⚠️ Chế độ đấu với Bot đang tắt (bảng nước đi chưa được biên dịch). Vui lòng báo admin bot.")
+        return
     
     if game_lang_for_channel == "JP" and not bot.kakasi:
         await send_response("⚠️ Không thể bắt đầu game Tiếng Nhật do bot chưa được cấu hình đúng (PyKakasi).")
@@ -218,22 +195,18 @@ async def internal_start_game(bot: commands.Bot, channel: discord.TextChannel, a
 
     if channel.id in bot.active_games:
         existing_game_state = bot.active_games[channel.id]
-        if existing_game_state.get("active", False):
-            if "timeout_task" in existing_game_state and existing_game_state["timeout_task"] and not existing_game_state["timeout_task"].done():
-                existing_game_state["timeout_task"].cancel() 
-            current_game_lang_name = f"{bot_cfg.GAME_VN_ICON} Tiếng Việt" if existing_game_state.get('game_language') == "VN" else f"{bot_cfg.GAME_JP_ICON} Tiếng Nhật"
+        existing_game_state.cancel_timeout()
+        if existing_game_state.active:
+            current_game_lang_name = f"{bot_cfg.GAME_VN_ICON} Tiếng Việt" if existing_game_state.game_language == "VN" else f"{bot_cfg.GAME_JP_ICON} Tiếng Nhật"
             msg = f"⚠️ Một game Nối Từ ({current_game_lang_name}) đã đang diễn ra. Dùng `{prefix}stop` hoặc `/stop` để dừng."
             await send_response(msg)
             return
-        elif "timeout_task" in existing_game_state and existing_game_state["timeout_task"] and not existing_game_state["timeout_task"].done():
-             existing_game_state["timeout_task"].cancel() 
 
     current_phrase_str: str = "" 
     word_to_match_next: str = ""
     current_phrase_display_form: str = ""
     
     player_id_for_first_move = author.id
-    participants_since_start = set()
     sent_game_start_message: discord.Message = None
     
     if interaction and not interaction.response.is_done():
@@ -250,12 +223,13 @@ async def internal_start_game(bot: commands.Bot, channel: discord.TextChannel, a
         player_id_for_first_move = bot.user.id # Bot starts
         if game_lang_for_channel == "VN":
             game_author_name = f"{bot_cfg.GAME_VN_ICON} Nối Từ Tiếng Việt"
-            possible_starts_vn = ["ấm áp", "bầu trời", "dòng sông", "cây cầu", "máy tính", "điện thoại", "học sinh", "sinh viên", "viên phấn", "nhà cửa", "cơm nước", "xe cộ", "tình yêu", "hạnh phúc", "nỗi buồn", "áo quần", "quần đảo", "đảo xa"]
+            # Chỉ mục nối từ: chọn ngay cụm 2 chữ còn nối tiếp được, ko cần tra Wiktionary
+            chosen_start_phrase_vn = bot.local_dictionary_vn.random_start_word() or ""
+            possible_starts_vn = [] if chosen_start_phrase_vn else ["ấm áp", "bầu trời", "dòng sông", "cây cầu", "máy tính", "điện thoại", "học sinh", "sinh viên", "viên phấn", "nhà cửa", "cơm nước", "xe cộ", "tình yêu", "hạnh phúc", "nỗi buồn", "áo quần", "quần đảo", "đảo xa"]
             random.shuffle(possible_starts_vn)
-            chosen_start_phrase_vn = ""
             for phrase_attempt in possible_starts_vn:
                 if await wiktionary_api.is_vietnamese_phrase_or_word_valid_api(
-                    phrase_attempt, bot.http_session, bot.wiktionary_cache_vn, bot.local_dictionary_vn
+                    phrase_attempt, bot.wiktionary_client, bot.wiktionary_cache_vn, bot.local_dictionary_vn
                 ):
                     chosen_start_phrase_vn = phrase_attempt
                     break
@@ -273,21 +247,14 @@ async def internal_start_game(bot: commands.Bot, channel: discord.TextChannel, a
             if not bot.local_dictionary_jp:
                 await send_response("⚠️ Bot không có từ điển Tiếng Nhật để chọn từ bắt đầu."); return
             
-            valid_jp_starts = [
-                entry for entry in bot.local_dictionary_jp 
-                if entry.get('hira') and not entry['hira'].endswith('ん') 
-            ]
-            if not valid_jp_starts: 
-                valid_jp_starts = [entry for entry in bot.local_dictionary_jp if entry.get('hira')]
-
-            if not valid_jp_starts:
+            chosen_entry = bot.local_dictionary_jp.random_start_entry()
+            if not chosen_entry:
                  await send_response("⚠️ Bot không tìm được từ Tiếng Nhật ngẫu nhiên hợp lệ."); return
 
-            chosen_entry = random.choice(valid_jp_starts)
             current_phrase_str = chosen_entry['hira'] 
             current_phrase_display_form = chosen_entry.get('kanji', current_phrase_str) 
             
-            last_hira_char = utils.get_last_hiragana_char(current_phrase_str)
+            last_hira_char = utils.get_last_hiragana_char(current_phrase_str, bot.local_dictionary_jp)
             if not last_hira_char: 
                 await send_response("⚠️ Lỗi xử lý từ bắt đầu Tiếng Nhật của Bot."); return
             word_to_match_next = last_hira_char 
@@ -303,7 +270,7 @@ async def internal_start_game(bot: commands.Bot, channel: discord.TextChannel, a
 
             phrase_to_check_vn = f"{temp_words[0]} {temp_words[1]}"
             if not await wiktionary_api.is_vietnamese_phrase_or_word_valid_api(
-                phrase_to_check_vn, bot.http_session, bot.wiktionary_cache_vn, bot.local_dictionary_vn
+                phrase_to_check_vn, bot.wiktionary_client, bot.wiktionary_cache_vn, bot.local_dictionary_vn
             ):
                 await send_response(f"⚠️ Cụm từ \"**{start_phrase_input_cleaned.title()}**\" không hợp lệ theo từ điển VN."); return
             
@@ -318,25 +285,30 @@ async def internal_start_game(bot: commands.Bot, channel: discord.TextChannel, a
                  await send_response("⚠️ Lỗi: Không thể xử lý từ Tiếng Nhật do thiếu thư viện trên bot."); return
 
             is_valid_jp, hira_form_jp = await wiktionary_api.is_japanese_word_valid_api(
-                start_phrase_input_cleaned, bot.http_session, bot.wiktionary_cache_jp, bot.local_dictionary_jp, bot.kakasi
+                start_phrase_input_cleaned, bot.wiktionary_client, bot.wiktionary_cache_jp, bot.local_dictionary_jp, bot.kakasi_service
             )
             if not is_valid_jp or not hira_form_jp:
                 await send_response(f"⚠️ Từ \"**{start_phrase_input_cleaned}**\" không hợp lệ theo từ điển JP."); return
 
-            if hira_form_jp.endswith('ん'): 
+            if utils.get_last_hiragana_char(hira_form_jp, bot.local_dictionary_jp) == 'ん': 
                 await send_response(f"⚠️ Từ bắt đầu \"**{start_phrase_input_cleaned}**\" (`{hira_form_jp}`) kết thúc bằng 'ん'. Vui lòng chọn từ khác."); return
 
             current_phrase_str = hira_form_jp 
             current_phrase_display_form = start_phrase_input_cleaned 
             
-            last_hira_char = utils.get_last_hiragana_char(current_phrase_str)
+            last_hira_char = utils.get_last_hiragana_char(current_phrase_str, bot.local_dictionary_jp)
             if not last_hira_char:
                 await send_response(f"⚠️ Lỗi xử lý từ \"**{start_phrase_input_cleaned}**\"."); return
             word_to_match_next = last_hira_char
             game_start_embed.description = f"{bot_cfg.USER_PLAYER_START_EMOJI} {author.mention} bắt đầu với: **{current_phrase_display_form}** (`{current_phrase_str}`)\n\n🔗 Tiếp theo: **{word_to_match_next}**"
 
-        if player_id_for_first_move != bot.user.id:
-             participants_since_start.add(player_id_for_first_move)
+    game_state = GameState(game_lang_for_channel, _dictionary_for(bot, game_lang_for_channel), guild_id,
+                           min_players_for_timeout=min_p, timeout_seconds=timeout_s, bot_difficulty=bot_difficulty)
+    if player_id_for_first_move != bot.user.id:
+        game_state.add_participant(player_id_for_first_move)
+    game_state.mark_used(current_phrase_str)
+    if game_state.is_dead_end(word_to_match_next):
+        await send_response(f"⚠️ Không còn từ nào để nối tiếp \"**{current_phrase_display_form}**\". Vui lòng chọn từ khác."); return
     
     game_start_embed.set_author(name=game_author_name, icon_url=game_author_icon_url)
     game_start_embed.set_footer(text=f"Kênh: #{channel.name} | Server: {channel.guild.name}")
@@ -350,39 +322,37 @@ async def internal_start_game(bot: commands.Bot, channel: discord.TextChannel, a
             del bot.active_games[channel.id]
         return
 
-    bot.active_games[channel.id] = {
-        "game_language": game_lang_for_channel, 
-        "current_phrase_str": current_phrase_str, 
-        "current_phrase_display_form": current_phrase_display_form, 
-        "word_to_match_next": word_to_match_next, 
-        "used_phrases": {current_phrase_str}, 
-        "last_player_id": player_id_for_first_move,
-        "active": True,
-        "last_correct_message_id": sent_game_start_message.id,
-        "timeout_task": None,
-        "participants_since_start": participants_since_start,
-        "timeout_can_be_activated": len(participants_since_start) >= min_p,
-        "guild_id": guild_id,
-        "min_players_for_timeout": min_p,
-        "timeout_seconds": timeout_s 
-    }
-
-    game_state = bot.active_games[channel.id]
-
-    if game_state["timeout_can_be_activated"] and player_id_for_first_move != bot.user.id:
-        new_timeout_task = asyncio.create_task(
-            check_game_timeout(
-                bot, channel.id, guild_id,
-                game_state["last_player_id"],
-                game_state["current_phrase_str"],
-                game_state["game_language"] 
+    game_state.current_phrase_str = current_phrase_str
+    game_state.current_phrase_display_form = current_phrase_display_form
+    game_state.word_to_match_next = word_to_match_next
+    game_state.last_player_id = player_id_for_first_move
+    game_state.last_correct_message_id = sent_game_start_message.id
+    game_state.timeout_can_be_activated = len(game_state.participants_since_start) >= min_p
+    bot.active_games[channel.id] = game_state
+    bot.game_journal.start(channel.id, game_state)
+
+    if bot_difficulty:
+        # Bot là đối thủ thật nên timeout luôn áp dụng
+        game_state.timeout_can_be_activated = True
+        try:
+            await channel.send(
+                f"🤖 Chế độ đấu với Bot (độ khó: **{BOT_DIFFICULTY_LABELS.get(bot_difficulty, bot_difficulty)}**). "
+                f"Bạn có {timeout_s} giây cho mỗi lượt.",
+                delete_after=20
             )
-        )
-        game_state["timeout_task"] = new_timeout_task
+        except discord.HTTPException: pass
+        if player_id_for_first_move != bot.user.id:
+            await play_bot_move(bot, channel, game_state)
+        else:
+            bot.turn_timers.arm(channel, game_state)
+        return
+
+    if game_state.timeout_can_be_activated and player_id_for_first_move != bot.user.id:
+        bot.turn_timers.arm(channel, game_state)
         if channel:
             try: 
                 await channel.send(
-                    f"ℹ️ Đã có {len(game_state['participants_since_start'])} người chơi (tối thiểu: {min_p}). "
+                    f"ℹ️ Đã có {len(game_state.participants_since_start)} người chơi (tối thiểu: {min_p}). "
                     f"Thời gian chờ {timeout_s} giây cho mỗi lượt sẽ được áp dụng.",
                     delete_after=20
                 )
@@ -400,15 +370,16 @@ async def internal_stop_game(bot: commands.Bot, channel: discord.TextChannel, au
 
     if channel.id in bot.active_games: 
         game_to_stop = bot.active_games.pop(channel.id) 
+        bot.game_journal.end(channel.id)
 
-        if "timeout_task" in game_to_stop and game_to_stop["timeout_task"] and not game_to_stop["timeout_task"].done():
-            game_to_stop["timeout_task"].cancel() 
+        game_to_stop.cancel_timeout()
 
-        current_game_lang = game_to_stop.get("game_language", "VN") 
-        if game_to_stop.get("active") and game_to_stop.get("last_player_id") != bot.user.id:
-            last_player_id = game_to_stop.get("last_player_id")
-            last_player_guild_id = game_to_stop.get("guild_id", guild_id)
+        current_game_lang = game_to_stop.game_language 
+        if game_to_stop.active and game_to_stop.last_player_id != bot.user.id:
+            last_player_id = game_to_stop.last_player_id
+            last_player_guild_id = game_to_stop.guild_id
             if last_player_id and last_player_guild_id and bot.db_pool:
+                 await bot.stats_buffer.flush_before_settlement(last_player_guild_id, current_game_lang)
                  await database.reset_win_streak_for_user(bot.db_pool, last_player_id, last_player_guild_id, game_language=current_game_lang)
 
         game_lang_stopped_name = f"{bot_cfg.GAME_VN_ICON} Tiếng Việt" if current_game_lang == "VN" else f"{bot_cfg.GAME_JP_ICON} Tiếng Nhật"
@@ -450,33 +421,78 @@ async def internal_stop_game(bot: commands.Bot, channel: discord.TextChannel, au
         await utils._send_message_smart(target_for_no_game_message, content=msg_content, ephemeral=True)
 
 
-async def process_game_message(bot: commands.Bot, message: discord.Message):
+def is_possible_game_move(bot: commands.Bot, message: discord.Message) -> bool:
+    """Lọc đồng bộ trước khi await bất cứ gì: kênh có game đang chạy và nội dung có dạng 1 nước đi."""
+    game_state = bot.active_games.get(message.channel.id)
+    if not game_state or not game_state.active:
+        return False
+    if game_state.game_language.upper() == "VN":
+        return utils.looks_like_vn_move(message.content)
+    return utils.looks_like_jp_move(message.content)
+
+async def validate_move_input(bot: commands.Bot, game_lang: str, user_input: str) -> tuple[bool, str | None]:
+    """Tra từ điển/Wiktionary cho input của người chơi -> (hợp lệ, dạng chuẩn hóa).
+    Ko phụ thuộc state game nên move_queue chạy được ngay khi tin nhắn tới, trước khi tới lượt xử lý."""
+    if game_lang == "VN":
+        words = utils.get_words_from_input(user_input)
+        if len(words) != 2:
+            return False, None
+        phrase = f"{words[0]} {words[1]}"
+        is_valid = await wiktionary_api.is_vietnamese_phrase_or_word_valid_api(
+            phrase, bot.wiktionary_client, bot.wiktionary_cache_vn, bot.local_dictionary_vn
+        )
+        return is_valid, phrase
+    return await wiktionary_api.is_japanese_word_valid_api(
+        user_input.strip(), bot.wiktionary_client, bot.wiktionary_cache_jp, bot.local_dictionary_jp, bot.kakasi_service
+    )
+
+def should_prevalidate(game_state: GameState, message: discord.Message) -> bool:
+    """Có nên tra từ ngay khi tin nhắn tới ko: bỏ qua tin nhắn chắc chắn bị loại mà ko cần tra
+    (sai lượt, VN nối sai chữ) theo state hiện tại. Nếu state đổi trước khi tới lượt xử lý,
+    process_game_message tự tra khi cần."""
+    if message.author.id == game_state.last_player_id:
+        return False
+    if game_state.game_language.upper() == "VN":
+        words = utils.get_words_from_input(message.content)
+        return len(words) == 2 and words[0] == game_state.word_to_match_next
+    return True
+
+def start_move_validation(bot: commands.Bot, game_lang: str, user_input: str) -> asyncio.Task:
+    task = asyncio.ensure_future(validate_move_input(bot, game_lang, user_input))
+    # Kết quả có thể ko được dùng (vd. sai lượt) -> lấy exception để asyncio ko cảnh báo
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+    return task
+
+async def process_game_message(bot: commands.Bot, message: discord.Message, validation: asyncio.Future | None = None):
+    """Xử lý 1 nước đi. Phải được gọi tuần tự cho mỗi kênh (qua move_queue.MoveQueue).
+    `validation`: kết quả validate_move_input đã chạy trước (nếu có)."""
     channel_id = message.channel.id
     guild_id = message.guild.id
 
-    if not bot.http_session or bot.http_session.closed: return 
+    if not bot.wiktionary_client or bot.wiktionary_client.closed: return 
     if not bot.db_pool: return
 
-    if channel_id not in bot.active_games or not bot.active_games[channel_id].get("active", False):
+    if channel_id not in bot.active_games or not bot.active_games[channel_id].active:
         return 
+    if not await utils.wait_for_language_resources(bot): return
 
     game_state = bot.active_games[channel_id]
     current_player_id = message.author.id
     current_player_name = message.author.name
-    game_lang = game_state.get("game_language", "VN").upper() 
+    game_lang = game_state.game_language.upper() 
 
     if game_lang == "JP" and not bot.kakasi: 
-        print(f"WARNING: Kakasi không sẵn sàng cho game JP ở kênh {channel_id}, game {game_state.get('game_language')}")
+        print(f"WARNING: Kakasi không sẵn sàng cho game JP ở kênh {channel_id}, game {game_state.game_language}")
         return
 
-    if game_state.get("guild_id") != guild_id:
-        print(f"Lỗi: Game state kênh {channel_id} có guild_id {game_state.get('guild_id')} ko khớp {guild_id}.")
-        if "timeout_task" in game_state and game_state["timeout_task"] and not game_state["timeout_task"].done():
-            game_state["timeout_task"].cancel() 
+    if game_state.guild_id != guild_id:
+        print(f"Lỗi: Game state kênh {channel_id} có guild_id {game_state.guild_id} ko khớp {guild_id}.")
+        game_state.cancel_timeout()
         del bot.active_games[channel_id]
+        bot.game_journal.end(channel_id)
         return
 
-    if current_player_id == game_state["last_player_id"]:
+    if current_player_id == game_state.last_player_id:
         try:
             await message.add_reaction(bot_cfg.WRONG_TURN_REACTION)
             guild_cfg_obj = await database.get_guild_config(bot.db_pool, guild_id)
@@ -487,7 +503,7 @@ async def process_game_message(bot: commands.Bot, message: discord.Message):
                 f"(Dùng `{prefix_val}stop` hoặc `/stop` để dừng).",
                 delete_after=bot_cfg.DELETE_WRONG_TURN_MESSAGE_AFTER
             )
-            await database.update_stat(bot.db_pool, bot.user.id, current_player_id, guild_id, "wrong_turn", current_player_name, game_language=game_lang)
+            bot.stats_buffer.record(bot.user.id, current_player_id, guild_id, "wrong_turn", current_player_name, game_language=game_lang)
         except (discord.Forbidden, discord.HTTPException): pass 
         return
 
@@ -497,7 +513,7 @@ async def process_game_message(bot: commands.Bot, message: discord.Message):
     phrase_to_validate: str = ""
     display_form_for_current_move: str = user_input_original_str
     
-    expected_first_char_or_word = game_state["word_to_match_next"] 
+    expected_first_char_or_word = game_state.word_to_match_next 
 
     error_occurred = False 
     error_type_for_stat = None 
@@ -513,35 +529,36 @@ async def process_game_message(bot: commands.Bot, message: discord.Message):
         if word1_user != expected_first_char_or_word:
             error_occurred = True; error_type_for_stat = "wrong_word_link"
         
-        if not error_occurred and not await wiktionary_api.is_vietnamese_phrase_or_word_valid_api(
-            phrase_to_validate, bot.http_session, bot.wiktionary_cache_vn, bot.local_dictionary_vn
-        ):
-            error_occurred = True; error_type_for_stat = "invalid_wiktionary"
+        if not error_occurred:
+            if validation is None: # Chỉ tra Wiktionary khi đã nối đúng chữ
+                validation = start_move_validation(bot, game_lang, user_input_original_str)
+            if not (await validation)[0]:
+                error_occurred = True; error_type_for_stat = "invalid_wiktionary"
     
     else: # JP game
-        is_valid_jp, hira_form_jp = await wiktionary_api.is_japanese_word_valid_api(
-            user_input_original_str, bot.http_session, bot.wiktionary_cache_jp, bot.local_dictionary_jp, bot.kakasi
-        )
+        if validation is None:
+            validation = start_move_validation(bot, game_lang, user_input_original_str)
+        is_valid_jp, hira_form_jp = await validation
         if not is_valid_jp or not hira_form_jp:
             error_occurred = True; error_type_for_stat = "invalid_wiktionary"
         else:
             phrase_to_validate = hira_form_jp 
-            first_char_current_hira = utils.get_first_hiragana_char(hira_form_jp)
+            first_char_current_hira = utils.get_first_hiragana_char(hira_form_jp, bot.local_dictionary_jp)
             if not first_char_current_hira or first_char_current_hira != expected_first_char_or_word:
                 error_occurred = True; error_type_for_stat = "wrong_word_link"
             
-            if not error_occurred and phrase_to_validate.endswith('ん'):
+            if not error_occurred and utils.get_last_hiragana_char(phrase_to_validate, bot.local_dictionary_jp) == 'ん':
                 try: await message.add_reaction(bot_cfg.SHIRITORI_LOSS_REACTION)
                 except (discord.Forbidden, discord.HTTPException): pass
                 
-                if "timeout_task" in game_state and game_state["timeout_task"] and not game_state["timeout_task"].done():
-                    game_state["timeout_task"].cancel()
+                game_state.cancel_timeout()
 
-                winner_id = game_state["last_player_id"] 
+                winner_id = game_state.last_player_id 
                 loser_id = current_player_id
                 
-                await database.update_stat(bot.db_pool, bot.user.id, loser_id, guild_id, "lost_by_n_ending", current_player_name, game_language=game_lang)
-                await database.reset_win_streak_for_user(bot.db_pool, loser_id, guild_id, game_language=game_lang)
+                await bot.stats_buffer.flush_before_settlement(guild_id, game_lang)
+                # Chốt stat thua cùng transaction với người thắng; lost_by_n_ending tự reset chuỗi thắng
+                loser_settlement = {"loser_id": loser_id, "loser_name": current_player_name, "loser_stat": "lost_by_n_ending"}
 
                 loss_embed = discord.Embed(color=bot_cfg.EMBED_COLOR_LOSS)
                 original_starter_for_view = winner_id
@@ -555,12 +572,13 @@ async def process_game_message(bot: commands.Bot, message: discord.Message):
                         f"Theo luật Shiritori, {bot_cfg.BOT_PLAYER_START_EMOJI} Bot (người chơi trước) chiến thắng!"
                     )
                     if bot.user.display_avatar: loss_embed.set_thumbnail(url=bot.user.display_avatar.url)
+                    await database.settle_game(bot.db_pool, guild_id, game_lang, **loser_settlement, stats_buffer=bot.stats_buffer)
                 else: 
                     try:
-                        winner_user = await bot.fetch_user(winner_id)
+                        winner_user = await bot.user_names.fetch(winner_id, message.guild)
                         winner_name_display = winner_user.name
                         
-                        await database.update_stat(bot.db_pool, bot.user.id, winner_id, guild_id, "wins", winner_name_display, game_language=game_lang)
+                        user_stats = await database.settle_game(bot.db_pool, guild_id, game_lang, winner_id, winner_name_display, **loser_settlement, stats_buffer=bot.stats_buffer)
                         
                         loss_embed.title = f"{bot_cfg.SHIRITORI_LOSS_WIN_ICON} Chúc Mừng {discord.utils.escape_markdown(winner_name_display)}! {bot_cfg.SHIRITORI_LOSS_WIN_ICON}"
                         loss_embed.description = (
@@ -569,7 +587,6 @@ async def process_game_message(bot: commands.Bot, message: discord.Message):
                         )
                         if winner_user.display_avatar: loss_embed.set_thumbnail(url=winner_user.display_avatar.url)
                         
-                        user_stats = await database.get_user_stats_entry(bot.db_pool, winner_id, guild_id, game_lang, winner_name_display)
                         if user_stats:
                              stats_text = (
                                  f"🏅 Tổng thắng: **{user_stats['wins']}**\n"
@@ -578,11 +595,11 @@ async def process_game_message(bot: commands.Bot, message: discord.Message):
                              loss_embed.add_field(name="Thành Tích Người Thắng", value=stats_text, inline=False)
                     
                     except discord.NotFound:
-                        await database.update_stat(bot.db_pool, bot.user.id, winner_id, guild_id, "wins", f"User ID {winner_id}", game_language=game_lang)
+                        await database.settle_game(bot.db_pool, guild_id, game_lang, winner_id, f"User ID {winner_id}", **loser_settlement, stats_buffer=bot.stats_buffer)
                         loss_embed.title = f"{bot_cfg.SHIRITORI_LOSS_WIN_ICON} Người Chơi ID {winner_id} Thắng Cuộc! {bot_cfg.SHIRITORI_LOSS_WIN_ICON}"
                         loss_embed.description = f"{bot_cfg.USER_PLAYER_START_EMOJI} {message.author.mention} thua do dùng từ \"**{display_form_for_current_move}**\" (`{phrase_to_validate}`) kết thúc bằng 'ん'."
                     except discord.HTTPException:
-                        await database.update_stat(bot.db_pool, bot.user.id, winner_id, guild_id, "wins", f"User ID {winner_id} (API Err)", game_language=game_lang)
+                        await database.settle_game(bot.db_pool, guild_id, game_lang, winner_id, f"User ID {winner_id} (API Err)", **loser_settlement, stats_buffer=bot.stats_buffer)
                         loss_embed.title = f"{bot_cfg.SHIRITORI_LOSS_WIN_ICON} Một Người Chơi Thắng! {bot_cfg.SHIRITORI_LOSS_WIN_ICON}"
                         loss_embed.description = f"{bot_cfg.USER_PLAYER_START_EMOJI} {message.author.mention} thua do dùng từ \"**{display_form_for_current_move}**\" (`{phrase_to_validate}`) kết thúc bằng 'ん'. (Lỗi lấy thông tin người thắng)."
                 
@@ -607,66 +624,210 @@ async def process_game_message(bot: commands.Bot, message: discord.Message):
 
                 if channel_id in bot.active_games: 
                     del bot.active_games[channel_id]
+                    bot.game_journal.end(channel_id)
                 return 
 
-    if not error_occurred and phrase_to_validate in game_state["used_phrases"]:
+    if not error_occurred and game_state.is_used(phrase_to_validate):
         error_occurred = True; error_type_for_stat = "used_word_error"
 
     if error_occurred: 
         try: await message.add_reaction(bot_cfg.ERROR_REACTION)
         except (discord.Forbidden, discord.HTTPException): pass
         if error_type_for_stat: 
-            await database.update_stat(bot.db_pool, bot.user.id, current_player_id, guild_id, error_type_for_stat, current_player_name, game_language=game_lang)
+            bot.stats_buffer.record(bot.user.id, current_player_id, guild_id, error_type_for_stat, current_player_name, game_language=game_lang)
         return
 
     try: await message.add_reaction(bot_cfg.CORRECT_REACTION)
     except (discord.Forbidden, discord.HTTPException): pass
-    await database.update_stat(bot.db_pool, bot.user.id, current_player_id, guild_id, "correct_moves", current_player_name, game_language=game_lang)
+    bot.stats_buffer.record(bot.user.id, current_player_id, guild_id, "correct_moves", current_player_name, game_language=game_lang)
+    bot.user_names.remember(message.author) # Người thắng luôn là tác giả 1 nước hợp lệ -> ko cần fetch_user khi chốt ván
 
-    if "timeout_task" in game_state and game_state["timeout_task"] and not game_state["timeout_task"].done():
-        game_state["timeout_task"].cancel()
+    game_state.cancel_timeout()
 
-    game_state["current_phrase_str"] = phrase_to_validate 
-    game_state["current_phrase_display_form"] = display_form_for_current_move 
+    game_state.current_phrase_str = phrase_to_validate 
+    game_state.current_phrase_display_form = display_form_for_current_move 
 
     if game_lang == "VN":
-        game_state["word_to_match_next"] = phrase_to_validate.split()[1]
+        game_state.word_to_match_next = phrase_to_validate.split()[1]
     else: # JP
-        last_hira_char_of_current = utils.get_last_hiragana_char(phrase_to_validate)
+        last_hira_char_of_current = utils.get_last_hiragana_char(phrase_to_validate, bot.local_dictionary_jp)
         if not last_hira_char_of_current: 
             print(f"LỖI NGHIÊM TRỌNG: Không thể lấy ký tự cuối của từ JP hợp lệ: {phrase_to_validate}")
             await message.channel.send(f"⚠️ Bot gặp lỗi xử lý từ \"{display_form_for_current_move}\". Lượt này có thể không được tính đúng.")
         else:
-            game_state["word_to_match_next"] = last_hira_char_of_current
+            game_state.word_to_match_next = last_hira_char_of_current
 
-    game_state["used_phrases"].add(phrase_to_validate)
-    game_state["last_player_id"] = current_player_id
-    game_state["last_correct_message_id"] = message.id
+    game_state.mark_used(phrase_to_validate)
+    game_state.last_player_id = current_player_id
+    game_state.last_correct_message_id = message.id
 
     if current_player_id != bot.user.id: 
-        game_state["participants_since_start"].add(current_player_id)
+        game_state.add_participant(current_player_id)
+    bot.game_journal.move(channel_id, game_state) # Chỉ thêm vào hàng đợi, task nền ghi xuống DB
 
-    timeout_s_config = game_state.get("timeout_seconds", bot_cfg.DEFAULT_TIMEOUT_SECONDS)
-    min_p_config = game_state.get("min_players_for_timeout", bot_cfg.DEFAULT_MIN_PLAYERS_FOR_TIMEOUT)
+    if game_state.is_dead_end():
+        await end_game_dead_end(bot, message.channel, game_state)
+        return
+
+    if game_state.bot_difficulty:
+        await play_bot_move(bot, message.channel, game_state)
+        return
+
+    timeout_s_config = game_state.timeout_seconds
+    min_p_config = game_state.min_players_for_timeout
     
-    if not game_state["timeout_can_be_activated"] and \
-       len(game_state["participants_since_start"]) >= min_p_config: 
-        game_state["timeout_can_be_activated"] = True
+    if not game_state.timeout_can_be_activated and \
+       len(game_state.participants_since_start) >= min_p_config: 
+        game_state.timeout_can_be_activated = True
         if msg_channel := bot.get_channel(channel_id):
             try: 
                 await msg_channel.send(
-                    f"ℹ️ Đã có {len(game_state['participants_since_start'])} người chơi ({min_p_config} tối thiểu). "
+                    f"ℹ️ Đã có {len(game_state.participants_since_start)} người chơi ({min_p_config} tối thiểu). "
                     f"Timeout {timeout_s_config} giây sẽ áp dụng.",
                     delete_after=20
                 )
             except discord.HTTPException: pass
 
-    if game_state["timeout_can_be_activated"]:
-        new_timeout_task = asyncio.create_task(
-            check_game_timeout(
-                bot, channel_id, guild_id, 
-                game_state["last_player_id"], game_state["current_phrase_str"],
-                game_lang 
-            )
+    if game_state.timeout_can_be_activated:
+        bot.turn_timers.arm(message.channel, game_state)
+
+
+async def play_bot_move(bot: commands.Bot, channel: discord.TextChannel, game_state: GameState):
+    """Lượt của bot trong chế độ đấu với bot: tra bảng nước đi đã tính sẵn (game.word_graph)."""
+    game_lang = game_state.game_language
+    graph = bot.word_graph_vn if game_lang == "VN" else bot.word_graph_jp
+    word_id = None
+    if graph:
+        word_id = graph.choose_move(game_state.word_to_match_next, game_state.bot_difficulty, game_state.used_words)
+    if word_id is None:
+        await end_game_bot_conceded(bot, channel, game_state)
+        return
+
+    dictionary = graph.lexicon
+    phrase_str = dictionary.word(word_id)
+    next_index = dictionary.next_index
+    word_to_match_next = next_index.key(next_index.tail(word_id))
+    if game_lang == "VN":
+        display_form = " ".join(w.capitalize() for w in phrase_str.split())
+        bot_move_text = f"{bot_cfg.BOT_PLAYER_START_EMOJI} **{display_form}**\n🔗 Tiếp theo: **{word_to_match_next.capitalize()}**"
+    else:
+        display_form = dictionary.entry(word_id)['kanji']
+        bot_move_text = f"{bot_cfg.BOT_PLAYER_START_EMOJI} **{display_form}** (`{phrase_str}`)\n🔗 Tiếp theo: **{word_to_match_next}**"
+
+    try:
+        bot_message = await channel.send(bot_move_text)
+    except discord.HTTPException as e:
+        print(f"Lỗi gửi nước đi của bot ở kênh {channel.id}: {e}")
+        bot_message = None
+
+    game_state.current_phrase_str = phrase_str
+    game_state.current_phrase_display_form = display_form
+    game_state.word_to_match_next = word_to_match_next
+    game_state.mark_used(phrase_str)
+    game_state.last_player_id = bot.user.id
+    if bot_message: game_state.last_correct_message_id = bot_message.id
+    bot.game_journal.move(channel.id, game_state)
+
+    if game_state.is_dead_end():
+        await end_game_dead_end(bot, channel, game_state)
+        return
+
+    bot.turn_timers.arm(channel, game_state)
+
+
+async def end_game_bot_conceded(bot: commands.Bot, channel: discord.TextChannel, game_state: GameState):
+    """Bot hết từ để nối -> người chơi vừa ra từ thắng."""
+    if bot.active_games.get(channel.id) is game_state:
+        del bot.active_games[channel.id]
+        bot.game_journal.end(channel.id)
+
+    await bot.stats_buffer.flush_before_settlement(game_state.guild_id, game_state.game_language)
+    winner_id = game_state.last_player_id
+    guild_id = game_state.guild_id
+    game_lang = game_state.game_language
+    game_lang_display = f"{bot_cfg.GAME_VN_ICON} Tiếng Việt" if game_lang == "VN" else f"{bot_cfg.GAME_JP_ICON} Tiếng Nhật"
+    difficulty_label = BOT_DIFFICULTY_LABELS.get(game_state.bot_difficulty, "")
+
+    win_embed = discord.Embed(color=bot_cfg.EMBED_COLOR_WIN)
+    try:
+        winner_user = await bot.user_names.fetch(winner_id, channel.guild)
+        winner_name_display = winner_user.name
+        winner_mention = winner_user.mention
+        if winner_user.display_avatar: win_embed.set_thumbnail(url=winner_user.display_avatar.url)
+    except (discord.NotFound, discord.HTTPException):
+        winner_name_display = f"User ID {winner_id}"
+        winner_mention = winner_name_display
+
+    user_stats = await database.settle_game(bot.db_pool, guild_id, game_lang, winner_id, winner_name_display, stats_buffer=bot.stats_buffer)
+    win_embed.title = f"{bot_cfg.WIN_ICON} {discord.utils.escape_markdown(winner_name_display)} Thắng Bot! {bot_cfg.WIN_ICON}"
+    win_embed.description = (
+        f"{bot_cfg.BOT_PLAYER_START_EMOJI} Bot (độ khó: {difficulty_label}) không còn từ nào để nối **{game_state.word_to_match_next}**.\n"
+        f"{winner_mention} đã chiến thắng game Nối Từ ({game_lang_display})!"
+    )
+    if user_stats:
+        stats_text = (
+            f"🏅 Tổng thắng: **{user_stats['wins']}**\n"
+            f"🔥 Chuỗi thắng hiện tại: **{user_stats['current_win_streak']}** (Max: **{user_stats['max_win_streak']}**)"
         )
-        game_state["timeout_task"] = new_timeout_task
\ No newline at end of file
+        win_embed.add_field(name="Thành Tích Cá Nhân", value=stats_text, inline=False)
+    win_embed.set_footer(text=f"Kênh: #{channel.name} | Server: {channel.guild.name}")
+
+    guild_cfg_for_prefix = await database.get_guild_config(bot.db_pool, guild_id)
+    command_prefix_for_guild = guild_cfg_for_prefix.get("command_prefix", bot_cfg.DEFAULT_COMMAND_PREFIX) if guild_cfg_for_prefix else bot_cfg.DEFAULT_COMMAND_PREFIX
+    view = PostGameView(
+        channel=channel,
+        original_starter_id=winner_id,
+        command_prefix_for_guild=command_prefix_for_guild,
+        bot_instance=bot, 
+        internal_start_game_callable=internal_start_game 
+    )
+    msg_with_view = await channel.send(embed=win_embed, view=view)
+    if msg_with_view: view.message_to_edit = msg_with_view
+
+
+async def restore_active_games(bot: commands.Bot) -> int:
+    """Dựng lại các ván chưa kết thúc từ nhật ký (game.journal) sau khi bot khởi động lại:
+    dọn tin nhắn đếm ngược cũ, hẹn giờ lại với thời gian còn lại của lượt. Trả về số ván khôi phục được."""
+    await bot.wait_until_ready()
+    await bot.language_resources_ready.wait()
+    journal_by_channel = await bot.game_journal.load()
+    now = time.time()
+    restored = 0
+    for channel_id, events in journal_by_channel.items():
+        if channel_id in bot.active_games: # Ván mới đã bắt đầu trong lúc đang khôi phục
+            continue
+        try: # 1 kênh lỗi ko được chặn việc khôi phục các kênh còn lại
+            if await _restore_channel_game(bot, channel_id, events, now):
+                restored += 1
+        except Exception as e:
+            print(f"Lỗi khôi phục game ở kênh {channel_id}: {e}")
+            traceback.print_exc()
+    return restored
+
+
+async def _restore_channel_game(bot: commands.Bot, channel_id: int, events: list, now: float) -> bool:
+    game_state, last_move_at, countdown_message_ids = replay_journal(
+        events, lambda game_lang: _dictionary_for(bot, game_lang), bot.user.id
+    )
+    channel = bot.get_channel(channel_id)
+    if channel:
+        for message_id in countdown_message_ids:
+            try: await channel.get_partial_message(message_id).delete()
+            except (discord.NotFound, discord.HTTPException): pass
+    if game_state is None or not isinstance(channel, discord.TextChannel) or channel.guild.id != game_state.guild_id:
+        bot.game_journal.end(channel_id) # Ko khôi phục được: xóa khỏi nhật ký
+        return False
+
+    bot.active_games[channel_id] = game_state
+    try:
+        await channel.send(f"♻️ Bot vừa khởi động lại, game Nối Từ được khôi phục. 🔗 Tiếp theo: **{game_state.word_to_match_next}**")
+    except discord.HTTPException: pass
+    if game_state.bot_difficulty and game_state.last_player_id != bot.user.id:
+        await play_bot_move(bot, channel, game_state) # Bot chết trước khi kịp trả lời
+    # Như lúc chơi: ván thường chỉ hẹn giờ sau khi người chơi đã nối (ko hẹn sau từ bắt đầu của bot),
+    # ván với bot thì hẹn giờ cho lượt người sau nước đi của bot
+    elif game_state.timeout_can_be_activated and (game_state.bot_difficulty or game_state.last_player_id != bot.user.id):
+        remaining_seconds = game_state.timeout_seconds - (now - last_move_at)
+        remaining_seconds = max(remaining_seconds, min(bot_cfg.GAME_RESTORE_MIN_TURN_SECONDS, game_state.timeout_seconds))
+        bot.turn_timers.arm(channel, game_state, remaining_seconds)
+    return True
@@ -0,0 +1,65 @@
+# Noitu/game/move_queue.py
+# Tuần tự hóa nước đi theo kênh: mỗi kênh có 1 worker xử lý lần lượt từng tin nhắn,
+# các kênh khác nhau vẫn chạy song song. Tra từ điển/Wiktionary được bắt đầu ngay khi tin nhắn tới
+# (trừ tin nhắn chắc chắn bị loại: sai lượt, nối sai chữ).
+import asyncio
+import traceback
+from collections import deque
+
+import discord
+from discord.ext import commands
+
+from . import logic as game_logic
+
+
+class MoveQueue:
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self._pending: dict[int, deque] = {} # channel_id -> [(message, game_lang, validation)]
+        self._workers: dict[int, asyncio.Task] = {}
+        self.submitted = 0
+        self.prevalidated = 0
+        self.max_depth = 0
+
+    def __len__(self) -> int:
+        return sum(len(pending) for pending in self._pending.values())
+
+    def submit(self, message: discord.Message) -> None:
+        channel_id = message.channel.id
+        game_state = self.bot.active_games.get(channel_id)
+        if not game_state:
+            return
+        game_lang = game_state.game_language.upper()
+        validation = None # Sai lượt / nối sai chữ: ko tốn lượt tra Wiktionary/kakasi nào
+        if game_logic.should_prevalidate(game_state, message):
+            validation = game_logic.start_move_validation(self.bot, game_lang, message.content)
+            self.prevalidated += 1
+
+        pending = self._pending.setdefault(channel_id, deque())
+        pending.append((message, game_lang, validation))
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, len(pending))
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.create_task(self._run(channel_id, pending))
+
+    async def _run(self, channel_id: int, pending: deque) -> None:
+        try:
+            while pending:
+                message, game_lang, validation = pending.popleft()
+                game_state = self.bot.active_games.get(channel_id)
+                if not game_state or game_state.game_language.upper() != game_lang:
+                    validation = None # Game đã đổi (kết thúc/bắt đầu lại): tra lại theo state hiện tại
+                try:
+                    await game_logic.process_game_message(self.bot, message, validation)
+                except Exception as e:
+                    print(f"Lỗi xử lý nước đi ở kênh {channel_id}: {e}")
+                    traceback.print_exc()
+        finally:
+            # Ko có await giữa lần kiểm tra `pending` cuối và đoạn này -> submit() ko thể chen vào
+            self._workers.pop(channel_id, None)
+            if self._pending.get(channel_id) is pending and not pending:
+                del self._pending[channel_id]
+
+    def stats(self) -> dict:
+        return {"submitted": self.submitted, "prevalidated": self.prevalidated, "queued": len(self), "active_channels": len(self._workers),
+                "max_depth": self.max_depth}
@@ -0,0 +1,112 @@
+# Noitu/game/state.py
+# State của 1 ván nối từ trong bot.active_games. Dùng __slots__ và lưu từ đã dùng bằng id từ điển
+# để ván dài / hàng nghìn kênh chạy cùng lúc vẫn tốn ít bộ nhớ.
+import array
+from bisect import bisect_left
+
+
+class UsedWords:
+    """Tập từ đã dùng: id từ điển trong mảng u32 đã sắp xếp (4 byte/từ),
+    từ chỉ Wiktionary biết (ko có id) giữ dạng chuỗi."""
+    __slots__ = ("dictionary", "_ids", "_extra")
+
+    def __init__(self, dictionary):
+        self.dictionary = dictionary
+        self._ids = array.array("I")
+        self._extra: set[str] | None = None # Chỉ tạo khi thật sự có từ ngoài từ điển
+
+    def __len__(self) -> int:
+        return len(self._ids) + (len(self._extra) if self._extra else 0)
+
+    def contains_id(self, word_id: int) -> bool:
+        ids = self._ids
+        pos = bisect_left(ids, word_id)
+        return pos < len(ids) and ids[pos] == word_id
+
+    def __contains__(self, phrase: str) -> bool:
+        word_ids = self.dictionary.word_ids(phrase)
+        if word_ids:
+            return self.contains_id(word_ids[0])
+        return self._extra is not None and phrase in self._extra
+
+    def add(self, phrase: str) -> range | None:
+        """Đánh dấu `phrase` đã dùng. Trả về các id vừa thêm (rỗng nếu từ ko có trong từ điển),
+        None nếu từ đã dùng rồi."""
+        word_ids = self.dictionary.word_ids(phrase)
+        if not word_ids:
+            if self._extra is None:
+                self._extra = set()
+            elif phrase in self._extra:
+                return None
+            self._extra.add(phrase)
+            return word_ids
+        pos = bisect_left(self._ids, word_ids[0])
+        if pos < len(self._ids) and self._ids[pos] == word_ids[0]:
+            return None
+        # JP: mọi mục cùng hiragana đều coi là đã dùng (id liền nhau)
+        self._ids[pos:pos] = array.array("I", word_ids)
+        return word_ids
+
+
+class GameState:
+    __slots__ = (
+        "game_language", "dictionary", "guild_id",
+        "current_phrase_str", "current_phrase_display_form", "word_to_match_next",
+        "used_words", "remaining_moves",
+        "last_player_id", "active", "last_correct_message_id", "turn_timer",
+        "participants_since_start", "timeout_can_be_activated",
+        "min_players_for_timeout", "timeout_seconds", "bot_difficulty",
+    )
+
+    def __init__(self, game_language: str, dictionary, guild_id: int, min_players_for_timeout: int,
+                 timeout_seconds: int, bot_difficulty: str | None = None):
+        self.game_language = game_language
+        self.dictionary = dictionary # Lexicon của ngôn ngữ game (dùng chung, ko sao chép)
+        self.guild_id = guild_id
+        self.current_phrase_str = ""
+        self.current_phrase_display_form = ""
+        self.word_to_match_next = ""
+        self.used_words = UsedWords(dictionary)
+        self.remaining_moves: dict[int, int] = {} # slot -> số từ chưa dùng, chỉ lưu khóa đã bị trừ
+        self.last_player_id: int | None = None
+        self.active = True
+        self.last_correct_message_id: int | None = None
+        self.turn_timer = None # game.timers.TurnTimer của lượt hiện tại
+        self.participants_since_start = array.array("Q") # Theo thứ tự tham gia, ko trùng
+        self.timeout_can_be_activated = False
+        self.min_players_for_timeout = min_players_for_timeout
+        self.timeout_seconds = timeout_seconds
+        self.bot_difficulty = bot_difficulty # None = chơi giữa người với người
+
+    def add_participant(self, user_id: int) -> None:
+        if user_id not in self.participants_since_start:
+            self.participants_since_start.append(user_id)
+
+    def is_used(self, phrase: str) -> bool:
+        return phrase in self.used_words
+
+    def mark_used(self, phrase: str) -> None:
+        """Thêm từ vào used_words và trừ bộ đếm từ nối còn lại của khóa đầu của nó (O(1))."""
+        word_ids = self.used_words.add(phrase)
+        if not word_ids or self.dictionary.is_losing_move(word_ids[0]): # Từ chỉ Wiktionary biết / từ 'ん' ko được đếm
+            return
+        next_index = self.dictionary.next_index
+        slot = next_index.head(word_ids[0])
+        if slot is not None:
+            remaining = self.remaining_moves
+            remaining[slot] = remaining.get(slot, next_index.move_count(slot)) - len(word_ids)
+
+    def is_dead_end(self, key: str = None) -> bool:
+        """True nếu ko còn từ nào trong từ điển local nối được `key` (mặc định: word_to_match_next).
+        Index nối tiếp của từ điển local là authority, kể cả khi Wiktionary đang dùng được."""
+        if not len(self.dictionary): # Chưa có từ điển: ko kết luận được
+            return False
+        next_index = self.dictionary.next_index
+        slot = next_index.slot(key if key is not None else self.word_to_match_next)
+        if slot is None: # Khóa ko có trong từ điển local (vd. từ chỉ Wiktionary biết): ko kết luận được
+            return False
+        return self.remaining_moves.get(slot, next_index.move_count(slot)) <= 0
+
+    def cancel_timeout(self) -> None:
+        if self.turn_timer:
+            self.turn_timer.cancel()
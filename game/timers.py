@@ -0,0 +1,176 @@
+# Noitu/game/timers.py
+# Hẹn giờ lượt cho mọi game bằng 1 task duy nhất: bánh xe thời gian chia theo tick.
+# Đặt lại hạn sau mỗi nước đi là O(1): ko tạo task, ko truy vấn DB, ko gọi REST.
+# Tin nhắn đếm ngược (game.countdown) cũng được cập nhật từ chính tick chung này.
+import asyncio
+import math
+import time
+import traceback
+
+import discord
+from discord.ext import commands
+
+from .. import config as bot_cfg
+from .countdown import CountdownRenderer
+
+
+class TurnTimer:
+    """Hạn của lượt hiện tại trong 1 kênh. Hết hạn khi ko ai nối được từ `phrase` của `last_player_id`."""
+    __slots__ = ("channel", "game_state", "last_player_id", "phrase", "timeout_seconds", "deadline", "tick",
+                 "cancelled", "countdown_text", "shown_seconds")
+
+    def __init__(self, channel: discord.TextChannel, game_state, timeout_seconds: int, deadline: float, tick: int):
+        self.channel = channel
+        self.game_state = game_state
+        self.last_player_id = game_state.last_player_id
+        self.phrase = game_state.current_phrase_str
+        self.timeout_seconds = timeout_seconds
+        self.deadline = deadline
+        self.tick = tick
+        self.cancelled = False
+        self.countdown_text = ""
+        self.shown_seconds = timeout_seconds
+
+    def cancel(self) -> None:
+        """Hủy O(1); tick kế tiếp sẽ dọn timer và tin nhắn đếm ngược."""
+        self.cancelled = True
+
+    def remaining(self, now: float) -> int:
+        return max(0, math.ceil(self.deadline - now))
+
+
+class TurnTimers:
+    def __init__(self, bot: commands.Bot, on_expire, tick_seconds: float = bot_cfg.TURN_TIMER_TICK_SECONDS,
+                 countdown: CountdownRenderer | None = None):
+        self.bot = bot
+        self.on_expire = on_expire # async (bot, TurnTimer) -> None
+        self.countdown = countdown if countdown is not None else CountdownRenderer()
+        self.tick_seconds = tick_seconds
+        self._timers: dict[int, TurnTimer] = {} # channel_id -> timer đang chạy
+        self._wheel: dict[int, set[int]] = {} # số tick -> các kênh hết hạn ở tick đó
+        self._last_tick = self._current_tick(time.monotonic())
+        self._task: asyncio.Task | None = None
+        self._expiring: set[asyncio.Task] = set() # Giữ tham chiếu để task ko bị GC khi đang chạy
+        self.armed = 0
+        self.expired = 0
+        self.cancelled = 0
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def _tick_of(self, deadline: float) -> int:
+        return math.ceil(deadline / self.tick_seconds) # Hạn làm tròn lên, ...
+
+    def _current_tick(self, now: float) -> int:
+        return math.floor(now / self.tick_seconds) # ... giờ hiện tại làm tròn xuống: ko bao giờ hết hạn sớm
+
+    def arm(self, channel: discord.TextChannel, game_state, remaining_seconds: float | None = None) -> TurnTimer:
+        """Bắt đầu (hoặc đặt lại) hạn cho lượt tiếp theo của kênh, theo state hiện tại của game.
+        `remaining_seconds`: lượt đã chạy dở (ván khôi phục từ nhật ký), mặc định cả timeout_seconds."""
+        now = time.monotonic()
+        previous = self._timers.get(channel.id)
+        if previous:
+            self._unlink(previous, keep_countdown=True) # Lượt mới sửa lại chính tin nhắn đếm ngược cũ
+        deadline = now + (game_state.timeout_seconds if remaining_seconds is None else remaining_seconds)
+        timer = TurnTimer(channel, game_state, game_state.timeout_seconds, deadline, self._tick_of(deadline))
+        timer.shown_seconds = timer.remaining(now)
+        timer.countdown_text = self._countdown_text(timer)
+        self._timers[channel.id] = timer
+        self._wheel.setdefault(timer.tick, set()).add(channel.id)
+        game_state.turn_timer = timer
+        self.armed += 1
+        self.countdown.show(channel, self._countdown_content(timer, timer.shown_seconds), urgent=True)
+        self.countdown.pump()
+        if self._task is None:
+            self._last_tick = self._current_tick(now)
+            self._task = asyncio.create_task(self._run())
+        return timer
+
+    def disarm(self, channel_id: int) -> None:
+        timer = self._timers.get(channel_id)
+        if timer:
+            self._unlink(timer)
+
+    def _unlink(self, timer: TurnTimer, keep_countdown: bool = False) -> None:
+        channel_id = timer.channel.id
+        if self._timers.get(channel_id) is timer:
+            del self._timers[channel_id]
+        bucket = self._wheel.get(timer.tick)
+        if bucket is not None:
+            bucket.discard(channel_id)
+            if not bucket:
+                del self._wheel[timer.tick]
+        timer.cancelled = True
+        self.cancelled += 1
+        if not keep_countdown:
+            self.countdown.release(channel_id)
+
+    async def _run(self) -> None:
+        try:
+            while self._timers:
+                await asyncio.sleep(self.tick_seconds)
+                try:
+                    self._on_tick(time.monotonic())
+                except Exception as e:
+                    print(f"Lỗi trong tick hẹn giờ lượt: {e}")
+                    traceback.print_exc()
+        finally:
+            # Ko có await giữa lần kiểm tra `self._timers` cuối và đoạn này -> arm() ko thể chen vào
+            self._task = None
+
+    def _on_tick(self, now: float) -> None:
+        for timer in [t for t in self._timers.values() if t.cancelled]:
+            self._unlink(timer)
+
+        current_tick = self._current_tick(now)
+        for tick in range(self._last_tick + 1, current_tick + 1): # Bù các tick bị trễ (event loop bận)
+            for channel_id in self._wheel.pop(tick, ()):
+                timer = self._timers.get(channel_id)
+                if timer is None or timer.tick != tick or timer.cancelled:
+                    continue
+                del self._timers[channel_id]
+                self.expired += 1
+                task = asyncio.create_task(self._expire(timer))
+                self._expiring.add(task)
+                task.add_done_callback(self._expiring.discard)
+        self._last_tick = max(self._last_tick, current_tick)
+
+        for timer in self._timers.values():
+            seconds_left = timer.remaining(now)
+            if 0 < seconds_left != timer.shown_seconds:
+                timer.shown_seconds = seconds_left
+                self.countdown.show(timer.channel, self._countdown_content(timer, seconds_left))
+        self.countdown.pump()
+
+    async def _expire(self, timer: TurnTimer) -> None:
+        timer.cancelled = True
+        if timer.channel.id not in self._timers:
+            self.countdown.release(timer.channel.id)
+        try:
+            await self.on_expire(self.bot, timer)
+        except Exception as e:
+            print(f"Lỗi xử lý hết giờ cho kênh {timer.channel.id} (từ: {timer.phrase}): {e}")
+            traceback.print_exc()
+
+    # --- Tin nhắn đếm ngược ---
+    def _countdown_text(self, timer: TurnTimer) -> str:
+        phrase_display = timer.phrase.title() if timer.game_state.game_language == "VN" else timer.phrase
+        if timer.last_player_id == self.bot.user.id:
+            return f"⏳ {bot_cfg.BOT_PLAYER_START_EMOJI} Bot đã ra từ \"**{phrase_display}**\". "
+        # Mention dạng <@id> hiển thị được mà ko cần fetch_user
+        return f"⏳ {bot_cfg.USER_PLAYER_START_EMOJI} <@{timer.last_player_id}> đã ra từ \"**{phrase_display}**\". "
+
+    def _countdown_content(self, timer: TurnTimer, seconds_left: int) -> str:
+        return f"{timer.countdown_text}Thời gian cho người tiếp theo: {seconds_left} giây."
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+        for timer in list(self._timers.values()):
+            self._unlink(timer)
+        self.countdown.close()
+
+    def stats(self) -> dict:
+        return {"active": len(self._timers), "armed": self.armed, "expired": self.expired,
+                "cancelled": self.cancelled, "wheel_slots": len(self._wheel)}
+
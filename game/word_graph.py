@@ -0,0 +1,165 @@
+# Noitu/game/word_graph.py
+# Phân tích đồ thị nối từ (chạy batch): node = âm tiết/kana cần nối, cạnh = một từ (đầu -> cuối).
+# Kết quả (bảng thắng/thua + danh sách nước đi đã xếp hạng) được bot nạp lúc khởi động; bot ko tự tính lại.
+# Biên dịch trước khi deploy (và mỗi khi đổi từ điển): python -m Noitu.game.word_graph
+import itertools
+import os
+import random
+from collections import deque
+
+from .. import dict_snapshot
+from .. import lexicon as lexicon_module
+from ..dict_snapshot import Snapshot, pack_u32
+
+# Kết quả với người PHẢI ra từ ở node đó (bỏ qua việc từ đã dùng)
+DRAW, WIN, LOSS = 0, 1, 2
+DIFFICULTIES = ("easy", "medium", "hard")
+GRAPH_SCHEMA = 1
+
+
+def analyze(lexicon_obj) -> dict[str, bytes]:
+    """Retrograde analysis trên đồ thị nối từ của `lexicon_obj`. Trả về các section của bảng."""
+    index = lexicon_obj.next_index
+    node_count = len(index)
+    moves: list[list[tuple[int, int]]] = [[] for _ in range(node_count)] # node -> [(word_id, node đích)]
+    predecessors: list[list[int]] = [[] for _ in range(node_count)] # 1 phần tử cho mỗi cạnh
+    for slot in range(node_count):
+        for word_id in index.ids(slot):
+            if lexicon_obj.is_losing_move(word_id): # Bot ko bao giờ ra từ kết thúc bằng 'ん'
+                continue
+            target = index.tail(word_id)
+            moves[slot].append((word_id, target))
+            predecessors[target].append(slot)
+
+    status = [DRAW] * node_count
+    depth = [0] * node_count # Số nước tới khi ván kết thúc (nếu chơi tối ưu)
+    undecided_moves = [len(node_moves) for node_moves in moves]
+    queue = deque()
+    for slot in range(node_count):
+        if not moves[slot]: # Ko còn nước đi -> người phải nối thua
+            status[slot] = LOSS
+            queue.append(slot)
+
+    while queue:
+        node = queue.popleft()
+        for pred in predecessors[node]:
+            if status[pred] != DRAW:
+                continue
+            if status[node] == LOSS: # Có 1 nước đẩy đối thủ vào thế thua
+                status[pred] = WIN
+                depth[pred] = depth[node] + 1
+                queue.append(pred)
+            else:
+                undecided_moves[pred] -= 1
+                if undecided_moves[pred] == 0: # Mọi nước đều để đối thủ thắng
+                    status[pred] = LOSS
+                    depth[pred] = depth[node] + 1
+                    queue.append(pred)
+
+    out_degree = [len(node_moves) for node_moves in moves]
+
+    def hard_rank(move):
+        target = move[1]
+        if status[target] == LOSS: return (0, depth[target]) # Thắng nhanh nhất
+        if status[target] == DRAW: return (1, out_degree[target])
+        return (2, -depth[target]) # Thua thì kéo dài nhất có thể
+
+    start, easy, medium, hard = [0], [], [], []
+    for node_moves in moves:
+        easy.extend(word_id for word_id, _ in node_moves)
+        medium.extend(word_id for word_id, _ in sorted(node_moves, key=lambda m: out_degree[m[1]]))
+        hard.extend(word_id for word_id, _ in sorted(node_moves, key=hard_rank))
+        start.append(len(easy))
+
+    return {
+        "g.status": pack_u32(status),
+        "g.depth": pack_u32(depth),
+        "g.start": pack_u32(start),
+        "g.easy": pack_u32(easy),
+        "g.medium": pack_u32(medium),
+        "g.hard": pack_u32(hard),
+    }
+
+
+class WordGraph:
+    """Bảng nước đi đã tính sẵn cho bot; chọn nước chỉ là đọc mảng trên snapshot."""
+
+    def __init__(self, snapshot: Snapshot, lexicon_obj):
+        self.lexicon = lexicon_obj
+        self._status = snapshot.u32("g.status")
+        self._depth = snapshot.u32("g.depth")
+        self._start = snapshot.u32("g.start")
+        self._moves = {difficulty: snapshot.u32(f"g.{difficulty}") for difficulty in DIFFICULTIES}
+
+    def __len__(self) -> int:
+        return len(self._status)
+
+    def status(self, slot: int) -> int:
+        return self._status[slot]
+
+    def out_degree(self, slot: int) -> int:
+        return self._start[slot + 1] - self._start[slot]
+
+    def choose_move(self, key: str, difficulty: str, used_words) -> int | None:
+        """Chọn id từ để nối `key`, bỏ qua id có trong `used_words` (game.state.UsedWords). None nếu bot hết nước."""
+        slot = self.lexicon.next_index.slot(key)
+        if slot is None or difficulty not in self._moves:
+            return None
+        lo, hi = self._start[slot], self._start[slot + 1]
+        if lo == hi:
+            return None
+        moves = self._moves[difficulty]
+        is_used = used_words.contains_id # So theo id, ko cần decode chuỗi từ snapshot
+
+        if difficulty == "easy": # Ngẫu nhiên: bắt đầu từ vị trí bất kỳ rồi quét vòng
+            pivot = random.randrange(lo, hi)
+            for i in itertools.chain(range(pivot, hi), range(lo, pivot)):
+                if not is_used(moves[i]):
+                    return moves[i]
+            return None
+
+        candidates = []
+        for i in range(lo, hi):
+            if not is_used(moves[i]):
+                if difficulty == "hard":
+                    return moves[i]
+                candidates.append(moves[i])
+                if len(candidates) == 3: # Medium: chọn ngẫu nhiên trong 3 nước tốt nhất còn lại
+                    break
+        return random.choice(candidates) if candidates else None
+
+
+def _graph_kind(lexicon_obj) -> str:
+    return f"graph/{lexicon_obj.KIND}/{lexicon_obj.SCHEMA}/{GRAPH_SCHEMA}"
+
+def graph_path_for(lexicon_snapshot_path: str) -> str:
+    return os.path.splitext(lexicon_snapshot_path)[0] + ".graph"
+
+def load_word_graph(lexicon_obj) -> WordGraph | None:
+    """Nạp bảng đã tính sẵn. None nếu bảng thiếu hoặc cũ hơn snapshot từ điển: phân tích là việc batch,
+    ko chạy trong lúc bot khởi động."""
+    lexicon_snapshot_path = lexicon_obj.snapshot.path
+    if not lexicon_snapshot_path: # Từ điển chỉ có trong bộ nhớ: ko có bảng nào khớp
+        return None
+    snapshot = dict_snapshot.open_if_current(lexicon_snapshot_path, graph_path_for(lexicon_snapshot_path),
+                                             _graph_kind(lexicon_obj))
+    return WordGraph(snapshot, lexicon_obj) if snapshot is not None else None
+
+
+def main():
+    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for lexicon_cls, file_name in ((lexicon_module.VietnameseLexicon, "directory-vn.txt"),
+                                   (lexicon_module.JapaneseLexicon, "directory-jp.txt")):
+        lexicon_obj = lexicon_module.open_lexicon(lexicon_cls, os.path.join(script_dir, file_name))
+        graph_path = graph_path_for(lexicon_obj.snapshot.path)
+        dict_snapshot.build_snapshot(lexicon_obj.snapshot.path, graph_path, _graph_kind(lexicon_obj),
+                                     lambda _path: analyze(lexicon_obj))
+        graph = WordGraph(Snapshot.open(graph_path), lexicon_obj)
+        counts = [0, 0, 0]
+        for slot in range(len(graph)):
+            counts[graph.status(slot)] += 1
+        print(f"{file_name}: {len(graph)} node -> '{graph_path}' "
+              f"(thắng: {counts[WIN]}, thua: {counts[LOSS]}, hòa/vòng lặp: {counts[DRAW]})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Noitu/kakasi_service.py
+# Chuyển input JP sang Hiragana bằng kakasi trong thread pool riêng, có cache LRU.
+# pykakasi chạy đồng bộ và khá chậm với input dài -> ko được gọi trực tiếp trên event loop.
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config as bot_cfg
+from .caches import LRUCache, SingleFlight
+from .wiktionary_api import to_hiragana
+
+_MISSING = object()
+
+class KakasiService:
+    """Cache LRU theo input đã chuẩn hóa + gộp các yêu cầu trùng đang chạy thành 1 lần convert.
+    pykakasi ko thread-safe: mỗi worker thread dùng converter riêng (thread đầu tiên dùng `kakasi_converter`,
+    các thread sau tạo mới bằng `converter_factory`, mặc định là class của `kakasi_converter`)."""
+
+    def __init__(self, kakasi_converter, max_entries: int = bot_cfg.KAKASI_CACHE_SIZE,
+                 max_workers: int = bot_cfg.KAKASI_WORKERS, max_input_length: int = bot_cfg.JP_MAX_WORD_LENGTH,
+                 converter_factory=None):
+        self._spare_converter = kakasi_converter
+        self._converter_factory = converter_factory or type(kakasi_converter)
+        self._converter_lock = threading.Lock()
+        self._local = threading.local()
+        self._cache = LRUCache(max_entries)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kakasi",
+                                            initializer=self._init_worker)
+        self._flights = SingleFlight()
+        self.max_input_length = max_input_length
+
+    async def to_hiragana(self, text: str) -> str | None:
+        key = text.strip() if text else ""
+        if not key or len(key) > self.max_input_length: # Đoạn văn dài ko phải là 1 từ, bỏ qua
+            return None
+        cached = self._cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        return await self._flights.run(key, lambda: self._convert(key))
+
+    def _init_worker(self) -> None:
+        with self._converter_lock:
+            converter, self._spare_converter = self._spare_converter, None
+        self._local.converter = converter if converter is not None else self._converter_factory()
+
+    def _convert_in_worker(self, key: str) -> str | None:
+        return to_hiragana(key, self._local.converter)
+
+    async def _convert(self, key: str) -> str | None:
+        result = await asyncio.get_running_loop().run_in_executor(self._executor, self._convert_in_worker, key)
+        if result is not None: # None = kakasi lỗi, có thể chỉ là tạm thời -> ko cache
+            self._cache.put(key, result)
+        return result
+
+    @property
+    def hits(self) -> int:
+        return self._cache.hits
+
+    @property
+    def misses(self) -> int:
+        return self._cache.misses
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "coalesced": self._flights.shared, "in_flight": len(self._flights)}
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
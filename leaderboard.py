@@ -0,0 +1,94 @@
+# Noitu/leaderboard.py
+# Bảng xếp hạng: top-N và hạng của 1 user đọc theo index leaderboard_rank_idx (database.init_db) nên ko phải
+# sort cả guild. Top-N đã render được cache theo (guild, ngôn ngữ) và chỉ bị bỏ khi 1 lần ghi stats có thể đổi
+# top-N (database.add_stats_listener -> on_stats_changed); TTL giới hạn độ cũ khi process khác ghi stats.
+import time
+
+import asyncpg
+
+from . import config as bot_cfg
+from .caches import LRUCache, SingleFlight
+
+# Thứ tự xếp hạng tăng dần, khớp đúng các cột của leaderboard_rank_idx (sau guild_id, game_language)
+_RANK_KEY = "(-{0}wins), (-{0}correct_moves), (-{0}max_win_streak), (-{0}current_win_streak), {0}total_errors, {0}name"
+
+_TOP_SQL = f"""
+    SELECT user_id, name, wins, correct_moves, wrong_word_link, invalid_wiktionary, used_word_error, wrong_turn,
+           lost_by_n_ending, current_win_streak, max_win_streak, total_errors
+    FROM leaderboard_stats
+    WHERE guild_id = $1 AND game_language = $2
+    ORDER BY {_RANK_KEY.format("")}
+    LIMIT $3
+"""
+# Hạng = số người đứng trước + 1: so sánh theo hàng trên index, chỉ quét phần index đứng trước user
+_RANK_SQL = f"""
+    SELECT u.name, u.wins, u.correct_moves, u.max_win_streak, u.current_win_streak,
+           (SELECT count(*) FROM leaderboard_stats o
+            WHERE o.guild_id = u.guild_id AND o.game_language = u.game_language
+              AND ({_RANK_KEY.format("o.")}) < ({_RANK_KEY.format("u.")})) + 1 AS rank
+    FROM leaderboard_stats u
+    WHERE u.user_id = $1 AND u.guild_id = $2 AND u.game_language = $3
+"""
+
+
+def _rank_key(row) -> tuple:
+    """Khoá xếp hạng của 1 dòng (nhỏ hơn = đứng trên), bỏ qua name."""
+    return (-row["wins"], -row["correct_moves"], -row["max_win_streak"], -row["current_win_streak"], row["total_errors"])
+
+
+class Leaderboard:
+    def __init__(self, db_pool: asyncpg.Pool | None, render, top_size: int = bot_cfg.LEADERBOARD_TOP_SIZE,
+                 max_entries: int = bot_cfg.LEADERBOARD_CACHE_SIZE, ttl_seconds: float = bot_cfg.LEADERBOARD_CACHE_SECONDS):
+        self.db_pool = db_pool
+        self.render = render # render(rows, game_language) -> nội dung embed
+        self.top_size = top_size
+        self.ttl_seconds = ttl_seconds
+        self._cache = LRUCache(max_entries) # (guild_id, ngôn ngữ) -> (nội dung đã render, user_id trong top, khoá của dòng cuối)
+        self._inflight = SingleFlight() # Nhiều người bấm BXH cùng lúc -> 1 truy vấn
+        self._generations: dict[tuple[int, str], int] = {} # Tăng mỗi lần bỏ cache, để ko lưu kết quả đọc trước lần ghi
+        self.queries = 0
+        self.invalidations = 0
+
+    async def top(self, guild_id: int, game_language: str) -> str | None:
+        """Top-N đã render của guild, None nếu chưa có ai trên BXH."""
+        game_language = game_language.upper()
+        key = (guild_id, game_language)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached[0]
+        generation = self._generations.get(key, 0)
+        return await self._inflight.run((key, generation), lambda: self._load_top(key, generation))
+
+    async def _load_top(self, key: tuple[int, str], generation: int) -> str | None:
+        if not self.db_pool: return None
+        async with self.db_pool.acquire() as connection:
+            rows = await connection.fetch(_TOP_SQL, key[0], key[1], self.top_size)
+        self.queries += 1
+        rendered = self.render([dict(row) for row in rows], key[1]) if rows else None
+        if self._generations.get(key, 0) == generation: # Có lần ghi liên quan xen giữa -> ko lưu, lần sau đọc lại
+            cutoff = _rank_key(rows[-1]) if len(rows) >= self.top_size else None
+            self._cache.put(key, (rendered, frozenset(row["user_id"] for row in rows), cutoff), time.time() + self.ttl_seconds)
+        return rendered
+
+    def on_stats_changed(self, guild_id: int, game_language: str, rows) -> None:
+        """Listener của database: bỏ top-N đã cache nếu các dòng vừa đổi có thể làm top-N khác đi."""
+        key = (guild_id, game_language)
+        cached = self._cache.peek(key)
+        if cached is not None:
+            _, top_user_ids, cutoff = cached
+            # Người trong top đổi số liệu, hoặc người ngoài top giờ xếp ngang/trên dòng cuối (hay top chưa đủ N người)
+            if not any(row["user_id"] in top_user_ids or cutoff is None or _rank_key(row) <= cutoff for row in rows):
+                return
+            self._cache.pop(key)
+            self.invalidations += 1
+        self._generations[key] = self._generations.get(key, 0) + 1
+
+    async def rank(self, user_id: int, guild_id: int, game_language: str) -> dict | None:
+        """Dòng stats của user kèm `rank` (1 = đứng đầu), None nếu user chưa có trên BXH."""
+        if not self.db_pool: return None
+        async with self.db_pool.acquire() as connection:
+            row = await connection.fetchrow(_RANK_SQL, user_id, guild_id, game_language.upper())
+        return dict(row) if row else None
+
+    def stats(self) -> dict:
+        return {"queries": self.queries, "invalidations": self.invalidations, "cache": self._cache.stats(), "inflight": self._inflight.stats()}
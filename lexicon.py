@@ -0,0 +1,349 @@
+# Noitu/lexicon.py
+# Từ điển local VN/JP trên snapshot nhị phân (xem dict_snapshot.py).
+# Biên dịch trước khi deploy: python -m Noitu.lexicon [--vn FILE] [--jp FILE]
+import argparse
+import csv
+import os
+import random
+
+from . import dict_snapshot
+from .dict_snapshot import Snapshot, pack_snapshot, pack_strings, pack_u32
+
+# Katakana (ァ..ヶ) -> Hiragana (ぁ..ゖ): hai khối Unicode lệch nhau đúng 0x60
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+def katakana_to_hiragana(text: str) -> str:
+    return text.translate(_KATAKANA_TO_HIRAGANA)
+
+# Mora (Shiritori): kana nhỏ ghép với kana trước nó (しゃ, ふぁ), 'ー' bị bỏ qua, kana nhỏ đứng riêng -> kana lớn
+_SMALL_KANA_TO_LARGE = str.maketrans("ぁぃぅぇぉっゃゅょゎゕゖ", "あいうえおつやゆよわかけ")
+_COMBINING_SMALL_KANA = frozenset("ぁぃぅぇぉゃゅょゎ")
+_LONG_VOWEL_MARKS = "ー〜～"
+
+def first_mora(text: str) -> str | None:
+    """Mora đầu của một từ (Hiragana hoặc Katakana), dùng làm khóa nối."""
+    kana = katakana_to_hiragana(text.strip()).lstrip(_LONG_VOWEL_MARKS)
+    if not kana:
+        return None
+    if len(kana) >= 2 and kana[1] in _COMBINING_SMALL_KANA and kana[0] not in _COMBINING_SMALL_KANA:
+        return kana[:2]
+    return kana[0].translate(_SMALL_KANA_TO_LARGE)
+
+def last_mora(text: str) -> str | None:
+    """Mora cuối của một từ: 'コーヒー' -> 'ひ', 'いしゃ' -> 'しゃ', 'きっ' -> 'つ'."""
+    kana = katakana_to_hiragana(text.strip()).rstrip(_LONG_VOWEL_MARKS)
+    if not kana:
+        return None
+    if len(kana) >= 2 and kana[-1] in _COMBINING_SMALL_KANA and kana[-2] not in _COMBINING_SMALL_KANA:
+        return kana[-2:]
+    return kana[-1].translate(_SMALL_KANA_TO_LARGE)
+
+def normalize_romaji(text: str) -> str:
+    return text.strip().lower()
+
+def normalize_vietnamese(text: str) -> str:
+    # Giống utils.get_words_from_input: tách theo khoảng trắng rồi ghép lại bằng 1 dấu cách
+    return " ".join(text.lower().split())
+
+
+class ContinuationIndex:
+    """Chỉ mục nối từ: khóa (âm tiết VN / kana JP) -> id các từ bắt đầu bằng khóa đó.
+    Mỗi khóa có một id nhỏ gọn (slot); mỗi từ chơi được lưu slot của khóa đầu và khóa cuối."""
+    NONE = 0xFFFFFFFF # Từ ko chơi được (VN: ko đúng 2 chữ)
+
+    def __init__(self, snapshot: Snapshot, name: str):
+        self._keys = snapshot.strings(f"{name}.keys")
+        self._slot_by_key = {self._keys[i]: i for i in range(len(self._keys))} # Vài nghìn khóa, ko phải từng từ
+        self._start = snapshot.u32(f"{name}.start")
+        self._ids = snapshot.u32(f"{name}.ids")
+        self._head = snapshot.u32(f"{name}.head")
+        self._tail = snapshot.u32(f"{name}.tail")
+        self._move_counts = snapshot.u32(f"{name}.moves")
+
+    @staticmethod
+    def pack(sections: dict, name: str, heads: list[str | None], tails: list[str | None],
+             losing: list[bool] | None = None) -> None:
+        """heads[i]/tails[i]: khóa đầu/cuối của từ id i (None nếu từ ko chơi được).
+        losing[i]: ra từ i là thua ngay (JP 'ん'), ko tính vào số nước đi còn lại của khóa."""
+        keys = sorted({k for k in heads if k is not None} | {k for k in tails if k is not None})
+        slot_by_key = {key: slot for slot, key in enumerate(keys)}
+        groups = [[] for _ in keys]
+        for word_id, head in enumerate(heads):
+            if head is not None:
+                groups[slot_by_key[head]].append(word_id)
+
+        start = [0]
+        ids = []
+        move_counts = []
+        for group in groups:
+            ids.extend(group)
+            start.append(len(ids))
+            move_counts.append(sum(1 for word_id in group if not (losing and losing[word_id])))
+        pack_strings(sections, f"{name}.keys", keys)
+        sections[f"{name}.start"] = pack_u32(start)
+        sections[f"{name}.ids"] = pack_u32(ids)
+        sections[f"{name}.moves"] = pack_u32(move_counts)
+        none = ContinuationIndex.NONE
+        sections[f"{name}.head"] = pack_u32(none if k is None else slot_by_key[k] for k in heads)
+        sections[f"{name}.tail"] = pack_u32(none if k is None else slot_by_key[k] for k in tails)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def playable_count(self) -> int:
+        return len(self._ids)
+
+    def slot(self, key: str) -> int | None:
+        return self._slot_by_key.get(key)
+
+    def key(self, slot: int) -> str:
+        return self._keys[slot]
+
+    def head(self, word_id: int) -> int | None:
+        slot = self._head[word_id]
+        return None if slot == self.NONE else slot
+
+    def tail(self, word_id: int) -> int | None:
+        slot = self._tail[word_id]
+        return None if slot == self.NONE else slot
+
+    def count(self, slot: int) -> int:
+        return self._start[slot + 1] - self._start[slot]
+
+    def move_count(self, slot: int) -> int:
+        """Số từ nối được từ khóa `slot` mà ko thua ngay (dùng để phát hiện ngõ cụt)."""
+        return self._move_counts[slot]
+
+    def ids(self, slot: int) -> memoryview:
+        """Id các từ bắt đầu bằng khóa `slot` (view trên snapshot, ko copy)."""
+        return self._ids[self._start[slot]:self._start[slot + 1]]
+
+    def count_for(self, key: str) -> int:
+        slot = self.slot(key)
+        return self.count(slot) if slot is not None else 0
+
+    def ids_for(self, key: str) -> memoryview:
+        slot = self.slot(key)
+        return self.ids(slot) if slot is not None else self._ids[0:0]
+
+    def random_word(self, predicate=None, attempts: int = 64) -> int | None:
+        """Chọn ngẫu nhiên id một từ chơi được, ưu tiên từ thỏa `predicate(word_id)`."""
+        if not len(self._ids):
+            return None
+        word_id = None
+        for _ in range(attempts):
+            word_id = self._ids[random.randrange(len(self._ids))]
+            if predicate is None or predicate(word_id):
+                return word_id
+        return word_id
+
+
+class VietnameseLexicon:
+    """Tập cụm từ VN đã sắp xếp; id của một cụm là vị trí của nó trong bảng."""
+    KIND = "vn"
+    SCHEMA = 3
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        self._words = snapshot.strings("vn.words")
+        self.next_index = ContinuationIndex(snapshot, "vn.next") # chữ đầu -> cụm 2 chữ
+
+    @classmethod
+    def empty(cls) -> "VietnameseLexicon":
+        return cls(Snapshot(pack_snapshot(cls.compile_rows([]))))
+
+    @staticmethod
+    def compile_rows(lines) -> dict[str, bytes]:
+        words = sorted({w for w in (normalize_vietnamese(line) for line in lines) if w})
+        sections = {}
+        pack_strings(sections, "vn.words", words)
+        heads, tails = [], []
+        for word in words:
+            syllables = word.split(" ")
+            is_playable = len(syllables) == 2 # Luật VN: đúng 2 chữ
+            heads.append(syllables[0] if is_playable else None)
+            tails.append(syllables[1] if is_playable else None)
+        ContinuationIndex.pack(sections, "vn.next", heads, tails)
+        return sections
+
+    @classmethod
+    def compile(cls, source_path: str) -> dict[str, bytes]:
+        with open(source_path, 'r', encoding='utf-8') as f:
+            return cls.compile_rows(f)
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def __contains__(self, phrase: str) -> bool:
+        return self.word_id(phrase) is not None
+
+    def word_id(self, phrase: str) -> int | None:
+        return self._words.find(normalize_vietnamese(phrase)) if phrase else None
+
+    def word(self, word_id: int) -> str:
+        return self._words[word_id]
+
+    def is_losing_move(self, word_id: int) -> bool:
+        return False
+
+    def word_ids(self, phrase: str) -> range:
+        """Các id ứng với cụm từ đã chuẩn hóa (0 hoặc 1 id)."""
+        word_id = self.word_id(phrase)
+        return range(0) if word_id is None else range(word_id, word_id + 1)
+
+    def random_start_word(self) -> str | None:
+        """Cụm 2 chữ ngẫu nhiên mà người chơi sau còn nối tiếp được."""
+        index = self.next_index
+        word_id = index.random_word(lambda i: index.count(index.tail(i)) > 0)
+        return self.word(word_id) if word_id is not None else None
+
+
+class JapaneseLexicon:
+    """Từ điển JP: các mục sắp theo (hira, kanji), id = vị trí.
+    Tra Kanji/Hiragana/Katakana/Romaji bằng tìm nhị phân trên snapshot."""
+    KIND = "jp"
+    SCHEMA = 4
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        self._kanji = snapshot.strings("jp.kanji")
+        self._hira = snapshot.strings("jp.hira") # Bản thân cột hira đã được sắp xếp
+        self._roma = snapshot.strings("jp.roma")
+        self._kanji_order = snapshot.u32("jp.kanji.idx")
+        self._roma_order = snapshot.u32("jp.roma.idx")
+        self.next_index = ContinuationIndex(snapshot, "jp.next") # mora đầu -> mục, mora đầu/cuối tính sẵn cho từng mục
+
+    @classmethod
+    def empty(cls) -> "JapaneseLexicon":
+        return cls(Snapshot(pack_snapshot(cls.compile_rows([]))))
+
+    @staticmethod
+    def compile_rows(rows) -> dict[str, bytes]:
+        unique = set()
+        for row in rows:
+            if len(row) >= 2: # Cần ít nhất kanji/kana và hira
+                hira = row[1].strip()
+                if hira:
+                    roma = normalize_romaji(row[2]) if len(row) >= 3 else ""
+                    unique.add((hira, row[0].strip() or hira, roma))
+        entries = sorted(unique)
+        kanji_col = [kanji for _, kanji, _ in entries]
+        roma_col = [roma for _, _, roma in entries]
+
+        sections = {}
+        pack_strings(sections, "jp.hira", [hira for hira, _, _ in entries])
+        pack_strings(sections, "jp.kanji", kanji_col)
+        pack_strings(sections, "jp.roma", roma_col)
+        # sorted() ổn định -> mục có id nhỏ nhất đứng đầu mỗi nhóm trùng khóa
+        sections["jp.kanji.idx"] = pack_u32(sorted(range(len(entries)), key=lambda i: kanji_col[i].encode("utf-8")))
+        sections["jp.roma.idx"] = pack_u32(sorted((i for i in range(len(entries)) if roma_col[i]),
+                                                  key=lambda i: roma_col[i].encode("utf-8")))
+        heads = [first_mora(hira) for hira, _, _ in entries]
+        tails = [last_mora(hira) for hira, _, _ in entries]
+        ContinuationIndex.pack(sections, "jp.next", heads, tails, losing=[tail == 'ん' for tail in tails])
+        return sections
+
+    @classmethod
+    def compile(cls, source_path: str) -> dict[str, bytes]:
+        with open(source_path, 'r', encoding='utf-8') as f:
+            return cls.compile_rows(csv.reader(f)) # CSV: kanji,hira,roma
+
+    def __len__(self) -> int:
+        return len(self._hira)
+
+    def entry(self, entry_id: int) -> dict:
+        return {'kanji': self._kanji[entry_id], 'hira': self._hira[entry_id], 'roma': self._roma[entry_id]}
+
+    def word(self, entry_id: int) -> str:
+        """Dạng hiragana dùng để so khớp/lưu trong game."""
+        return self._hira[entry_id]
+
+    def is_losing_move(self, entry_id: int) -> bool:
+        return self.entry_last_mora(entry_id) == 'ん' # Luật 'ん': người ra từ này thua ngay
+
+    def entry_first_mora(self, entry_id: int) -> str | None:
+        slot = self.next_index.head(entry_id)
+        return self.next_index.key(slot) if slot is not None else None
+
+    def entry_last_mora(self, entry_id: int) -> str | None:
+        slot = self.next_index.tail(entry_id)
+        return self.next_index.key(slot) if slot is not None else None
+
+    def first_mora(self, hira: str) -> str | None:
+        """Mora đầu: đọc bảng tính sẵn nếu từ có trong từ điển, ngược lại chuẩn hóa trực tiếp."""
+        entry_id = self._hira.find(hira) if hira else None
+        return self.entry_first_mora(entry_id) if entry_id is not None else first_mora(hira)
+
+    def last_mora(self, hira: str) -> str | None:
+        entry_id = self._hira.find(hira) if hira else None
+        return self.entry_last_mora(entry_id) if entry_id is not None else last_mora(hira)
+
+    def word_ids(self, hira: str) -> range:
+        """Các id có cùng hiragana (liền nhau vì cột hira đã sắp xếp)."""
+        first_id = self._hira.find(hira) if hira else None
+        if first_id is None:
+            return range(0)
+        end_id = first_id + 1
+        while end_id < len(self._hira) and self._hira.raw(end_id) == self._hira.raw(first_id):
+            end_id += 1
+        return range(first_id, end_id)
+
+    def lookup_id(self, text: str) -> int | None:
+        """Tìm id theo input gốc của người chơi (Kanji, Hiragana, Katakana hoặc Romaji)."""
+        key = text.strip()
+        if not key:
+            return None
+        entry_id = self._kanji.find(key, self._kanji_order)
+        if entry_id is None:
+            entry_id = self._hira.find(katakana_to_hiragana(key))
+        if entry_id is None:
+            entry_id = self._roma.find(normalize_romaji(key), self._roma_order)
+        return entry_id
+
+    def lookup(self, text: str) -> dict | None:
+        entry_id = self.lookup_id(text)
+        return self.entry(entry_id) if entry_id is not None else None
+
+    def lookup_hiragana(self, hira: str) -> dict | None:
+        entry_id = self._hira.find(hira) if hira else None
+        return self.entry(entry_id) if entry_id is not None else None
+
+    def random_start_entry(self) -> dict | None:
+        """Mục ngẫu nhiên ko kết thúc bằng 'ん' và còn từ nối tiếp được."""
+        index = self.next_index
+        word_id = index.random_word(
+            lambda i: not self.is_losing_move(i) and index.tail(i) is not None and index.move_count(index.tail(i)) > 0
+        )
+        return self.entry(word_id) if word_id is not None else None
+
+
+def snapshot_path_for(source_path: str) -> str:
+    return os.path.splitext(source_path)[0] + ".snap"
+
+def _snapshot_kind(lexicon_cls) -> str:
+    return f"{lexicon_cls.KIND}/{lexicon_cls.SCHEMA}" # Đổi SCHEMA khi thêm/bớt section -> tự biên dịch lại
+
+def open_lexicon(lexicon_cls, source_path: str, snapshot_path: str | None = None):
+    """Mở từ điển từ snapshot mmap, tự biên dịch lại nếu snapshot thiếu hoặc cũ."""
+    snapshot = dict_snapshot.load_or_build(
+        source_path, snapshot_path or snapshot_path_for(source_path), _snapshot_kind(lexicon_cls), lexicon_cls.compile
+    )
+    return lexicon_cls(snapshot)
+
+
+def main(argv=None):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Biên dịch từ điển Nối Từ thành snapshot nhị phân.")
+    parser.add_argument("--vn", default=os.path.join(script_dir, "directory-vn.txt"))
+    parser.add_argument("--jp", default=os.path.join(script_dir, "directory-jp.txt"))
+    args = parser.parse_args(argv)
+
+    for lexicon_cls, source_path in ((VietnameseLexicon, args.vn), (JapaneseLexicon, args.jp)):
+        snapshot_path = snapshot_path_for(source_path)
+        dict_snapshot.build_snapshot(source_path, snapshot_path, _snapshot_kind(lexicon_cls), lexicon_cls.compile)
+        lexicon = lexicon_cls(Snapshot.open(snapshot_path))
+        print(f"Đã biên dịch {len(lexicon)} mục: '{source_path}' -> '{snapshot_path}'.")
+
+if __name__ == "__main__":
+    main()
@@ -3,42 +3,60 @@
 import discord
 from discord.ext import commands
 import asyncio
-import aiohttp
 import traceback
 import os 
-import csv 
 
 from . import config as bot_cfg
 from . import database
 from . import utils 
+from . import lexicon
+from .lexicon import JapaneseLexicon, VietnameseLexicon
+from .kakasi_service import KakasiService
+from . import wiktionary_api
+from . import wiktionary_cache
+from . import stats_buffer
+from .stats_buffer import StatsBuffer
+from .leaderboard import Leaderboard
+from .user_names import UserNameCache
+from .wiktionary_cache import WiktionaryCache
+from .game import word_graph
+from .game import logic as game_logic
+from .game.move_queue import MoveQueue
+from .game.timers import TurnTimers
+from .game import journal as game_journal
+from .game.journal import GameJournal
 
-try:
-    from pykakasi import kakasi
-    kks_instance = kakasi() # Renamed for clarity
-    kakasi_converter = kks_instance 
+def init_kakasi():
+    """Khởi tạo PyKakasi (chậm: nạp từ điển của kakasi), chạy trong worker thread lúc khởi động."""
     try:
-        test_conversion = kakasi_converter.convert("テスト")
-        if not test_conversion or not isinstance(test_conversion, list) or not ('hira' in test_conversion[0]):
-            raise ValueError("Kết quả convert() không như mong đợi.")
-        print(f"PyKakasi initialized and conversion test successful. Example: {test_conversion}")
-    except Exception as e_test:
-        print(f"PyKakasi initialized, but conversion test failed: {e_test}")
-        print("Chức năng tiếng Nhật có thể bị ảnh hưởng.")
-except ImportError:
-    kakasi_converter = None
-    print("LỖI: Thư viện PyKakasi chưa được cài đặt. Chức năng tiếng Nhật sẽ bị hạn chế.")
-    print("Vui lòng chạy: pip install pykakasi")
-except Exception as e: 
-    kakasi_converter = None
-    print(f"LỖI: Không thể khởi tạo PyKakasi: {e}")
-    traceback.print_exc()
+        from pykakasi import kakasi
+        kakasi_converter = kakasi()
+        try:
+            test_conversion = kakasi_converter.convert("テスト")
+            if not test_conversion or not isinstance(test_conversion, list) or not ('hira' in test_conversion[0]):
+                raise ValueError("Kết quả convert() không như mong đợi.")
+            print(f"PyKakasi initialized and conversion test successful. Example: {test_conversion}")
+        except Exception as e_test:
+            print(f"PyKakasi initialized, but conversion test failed: {e_test}")
+            print("Chức năng tiếng Nhật có thể bị ảnh hưởng.")
+        return kakasi_converter
+    except ImportError:
+        print("LỖI: Thư viện PyKakasi chưa được cài đặt. Chức năng tiếng Nhật sẽ bị hạn chế.")
+        print("Vui lòng chạy: pip install pykakasi")
+    except Exception as e: 
+        print(f"LỖI: Không thể khởi tạo PyKakasi: {e}")
+        traceback.print_exc()
+    return None
 
 async def get_prefix(bot_instance: commands.Bot, message: discord.Message):
     if not message.guild: 
         return commands.when_mentioned_or(bot_cfg.DEFAULT_COMMAND_PREFIX)(bot_instance, message)
     if not bot_instance.db_pool:
         return commands.when_mentioned_or(bot_cfg.DEFAULT_COMMAND_PREFIX)(bot_instance, message)
-    guild_config_data = await database.get_guild_config(bot_instance.db_pool, message.guild.id)
+    # Đa số tin nhắn ko liên quan tới game: đọc cache RAM, chỉ chạm DB với guild mới
+    guild_config_data = database.get_cached_guild_config(message.guild.id)
+    if guild_config_data is None:
+        guild_config_data = await database.get_guild_config(bot_instance.db_pool, message.guild.id)
     prefix_to_use = bot_cfg.DEFAULT_COMMAND_PREFIX 
     if guild_config_data and "command_prefix" in guild_config_data:
         prefix_to_use = guild_config_data["command_prefix"]
@@ -52,78 +70,151 @@ intents.guilds = True
 bot = commands.Bot(command_prefix=get_prefix, intents=intents, help_command=None) 
 
 bot.db_pool = None 
-bot.http_session = None 
+bot.wiktionary_client = None # wiktionary_api.WiktionaryClient, tạo trong setup_hook
 bot.active_games = {} 
-bot.wiktionary_cache_vn = {} 
-bot.wiktionary_cache_jp = {} 
-bot.local_dictionary_vn = set() 
-bot.local_dictionary_jp = [] 
-bot.kakasi = kakasi_converter 
+bot.move_queue = MoveQueue(bot) # Nước đi của mỗi kênh được xử lý lần lượt
+bot.turn_timers = TurnTimers(bot, game_logic.handle_turn_timeout) # 1 task hẹn giờ lượt cho mọi kênh
+bot.wiktionary_cache_vn = WiktionaryCache(None, "VN") # Gắn DB pool trong setup_hook
+bot.wiktionary_cache_jp = WiktionaryCache(None, "JP") 
+bot.wiktionary_cache_flush_task = None 
+bot.stats_buffer = StatsBuffer(None) # Gắn DB pool trong setup_hook
+bot.stats_flush_task = None 
+bot.leaderboard = Leaderboard(None, utils.render_leaderboard_entries) # Gắn DB pool trong setup_hook
+bot.user_names = UserNameCache(bot) # Tên/avatar người thắng ko cần gọi REST
+bot.game_journal = GameJournal(None) # Gắn DB pool trong setup_hook
+bot.game_journal_flush_task = None 
+bot.restore_games_task = None 
+bot.local_dictionary_vn = VietnameseLexicon.empty() 
+bot.local_dictionary_jp = JapaneseLexicon.empty() 
+bot.kakasi = None 
+bot.kakasi_service = None # Convert kakasi trong thread pool, có cache
+bot.word_graph_vn = None # Bảng nước đi cho chế độ đấu với bot
+bot.word_graph_jp = None 
+bot.language_resources_ready = asyncio.Event() # Set khi từ điển + kakasi đã tải xong
+bot.language_resources_task = None 
 
-async def load_vietnamese_dictionary(bot_instance: commands.Bot, file_path="tudien-vn.txt"): # Corrected file name
+def load_vietnamese_dictionary(file_path="directory-vn.txt") -> VietnameseLexicon:
     script_dir = os.path.dirname(__file__)
     absolute_file_path = os.path.join(script_dir, file_path)
     try:
-        with open(absolute_file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                word = line.strip().lower()
-                if word:
-                    bot_instance.local_dictionary_vn.add(word)
-        print(f"Đã tải {len(bot_instance.local_dictionary_vn)} từ vào từ điển Tiếng Việt từ '{file_path}'.")
+        # mmap snapshot đã biên dịch (tự biên dịch lại nếu thiếu/cũ)
+        dictionary_vn = lexicon.open_lexicon(VietnameseLexicon, absolute_file_path)
+        print(f"Đã tải {len(dictionary_vn)} từ vào từ điển Tiếng Việt từ '{file_path}'.")
+        return dictionary_vn
     except FileNotFoundError:
         print(f"LỖI: File từ điển Tiếng Việt '{absolute_file_path}' ko tìm thấy.")
     except Exception as e:
         print(f"Lỗi tải từ điển Tiếng Việt: {e}")
         traceback.print_exc()
+    return VietnameseLexicon.empty()
 
-async def load_japanese_dictionary(bot_instance: commands.Bot, file_path="tudien-jp.txt"): # Corrected file name
+def load_japanese_dictionary(file_path="directory-jp.txt") -> JapaneseLexicon:
     script_dir = os.path.dirname(__file__)
     absolute_file_path = os.path.join(script_dir, file_path)
-    loaded_count = 0
     try:
-        with open(absolute_file_path, 'r', encoding='utf-8') as f:
-            # Assuming CSV format: kanji,hira,roma
-            reader = csv.reader(f) 
-            for row in reader:
-                if len(row) >= 2: # Need at least kanji/hira and hira
-                    kanji_or_kana = row[0].strip()
-                    hira = row[1].strip()
-                    roma = row[2].strip() if len(row) >= 3 else ""
-                    
-                    if hira: # Hiragana is essential
-                        entry = {'kanji': kanji_or_kana if kanji_or_kana else hira, 'hira': hira, 'roma': roma}
-                        bot_instance.local_dictionary_jp.append(entry)
-                        loaded_count += 1
-        print(f"Đã tải {loaded_count} từ vào từ điển Tiếng Nhật từ '{file_path}'.")
+        dictionary_jp = lexicon.open_lexicon(JapaneseLexicon, absolute_file_path)
+        print(f"Đã tải {len(dictionary_jp)} từ vào từ điển Tiếng Nhật từ '{file_path}'.")
+        return dictionary_jp
     except FileNotFoundError:
         print(f"LỖI: File từ điển Tiếng Nhật '{absolute_file_path}' ko tìm thấy.")
     except Exception as e:
         print(f"Lỗi tải từ điển Tiếng Nhật: {e}")
         traceback.print_exc()
+    return JapaneseLexicon.empty()
+
+def load_word_graph(dictionary):
+    try:
+        graph = word_graph.load_word_graph(dictionary)
+        if graph is None:
+            print(f"CẢNH BÁO: Bảng nước đi ({dictionary.KIND.upper()}) thiếu hoặc cũ, tắt chế độ đấu với Bot. "
+                  f"Chạy `python -m Noitu.game.word_graph` để biên dịch lại.")
+            return None
+        print(f"Đã nạp bảng nước đi ({dictionary.KIND.upper()}): {len(graph)} node.")
+        return graph
+    except Exception as e:
+        print(f"Lỗi nạp bảng nước đi {dictionary.KIND.upper()}: {e}")
+        traceback.print_exc()
+        return None
+
+def _load_language_resources():
+    dictionary_vn, dictionary_jp = load_vietnamese_dictionary(), load_japanese_dictionary()
+    return (init_kakasi(), dictionary_vn, dictionary_jp,
+            load_word_graph(dictionary_vn), load_word_graph(dictionary_jp))
+
+async def prepare_language_resources(bot_instance: commands.Bot):
+    """Tải kakasi + từ điển đúng 1 lần, trong worker thread để ko chặn event loop."""
+    try:
+        kakasi_converter, dictionary_vn, dictionary_jp, graph_vn, graph_jp = await asyncio.to_thread(_load_language_resources)
+        bot_instance.kakasi = kakasi_converter
+        bot_instance.kakasi_service = KakasiService(kakasi_converter) if kakasi_converter else None
+        bot_instance.local_dictionary_vn = dictionary_vn
+        bot_instance.local_dictionary_jp = dictionary_jp
+        bot_instance.word_graph_vn = graph_vn
+        bot_instance.word_graph_jp = graph_jp
+        if not bot_instance.kakasi: 
+            print("CẢNH BÁO: PyKakasi không được khởi tạo. Chức năng tiếng Nhật có thể không hoạt động đúng.")
+    except Exception as e:
+        print(f"Lỗi tải tài nguyên ngôn ngữ: {e}")
+        traceback.print_exc()
+    finally:
+        bot_instance.language_resources_ready.set() # Ko để lệnh game chờ mãi nếu tải lỗi
+
+async def restore_games(bot_instance: commands.Bot):
+    try:
+        restored_count = await game_logic.restore_active_games(bot_instance)
+        print(f"Đã khôi phục {restored_count} game từ nhật ký.")
+    except Exception as e:
+        print(f"Lỗi khôi phục game từ nhật ký: {e}")
+        traceback.print_exc()
 
 @bot.event
-async def on_ready():
-    print(f'Bot {bot.user.name} (ID: {bot.user.id}) đang kết nối và khởi tạo...')
-
-    if not bot.db_pool:
-        bot.db_pool = await database.init_db( # Removed default_language parameter
-            bot_cfg.DATABASE_URL,
-            bot_cfg.DEFAULT_COMMAND_PREFIX,
-            bot_cfg.DEFAULT_TIMEOUT_SECONDS,
-            bot_cfg.DEFAULT_MIN_PLAYERS_FOR_TIMEOUT
-        )
+async def setup_hook():
+    # Chạy đúng 1 lần trước khi kết nối gateway; on_ready thì có thể chạy lại mỗi lần reconnect.
+    # Từ điển/kakasi tải song song với khởi tạo DB.
+    bot.language_resources_task = asyncio.create_task(prepare_language_resources(bot))
+
+    bot.db_pool = await database.init_db( # Removed default_language parameter
+        bot_cfg.DATABASE_URL,
+        bot_cfg.DEFAULT_COMMAND_PREFIX,
+        bot_cfg.DEFAULT_TIMEOUT_SECONDS,
+        bot_cfg.DEFAULT_MIN_PLAYERS_FOR_TIMEOUT
+    )
     if not bot.db_pool: 
         print("LỖI NGHIÊM TRỌNG: Bot không thể khởi động do lỗi DB.")
         await bot.close()
         return
 
-    if not bot.http_session or bot.http_session.closed:
-        bot.http_session = aiohttp.ClientSession()
+    try:
+        guild_count = await database.load_guild_configs(bot.db_pool)
+        await database.start_guild_config_listener(bot.db_pool)
+        print(f"Đã nạp config của {guild_count} guild vào cache.")
+    except Exception as e:
+        print(f"Lỗi nạp cache config guild: {e}")
+        traceback.print_exc()
 
-    await load_vietnamese_dictionary(bot)
-    await load_japanese_dictionary(bot) # Ensure this uses CSV reader
+    bot.wiktionary_cache_vn = WiktionaryCache(bot.db_pool, "VN")
+    bot.wiktionary_cache_jp = WiktionaryCache(bot.db_pool, "JP")
+    await wiktionary_cache.purge_expired(bot.db_pool)
+    for cache in (bot.wiktionary_cache_vn, bot.wiktionary_cache_jp):
+        warmed_count = await cache.warm_up()
+        print(f"Wiktionary cache {cache.game_language}: đã nạp trước {warmed_count} mục từ DB.")
+    bot.wiktionary_cache_flush_task = asyncio.create_task(
+        wiktionary_cache.run_flush_loop([bot.wiktionary_cache_vn, bot.wiktionary_cache_jp])
+    )
+
+    bot.stats_buffer = StatsBuffer(bot.db_pool)
+    bot.stats_flush_task = asyncio.create_task(stats_buffer.run_flush_loop(bot.stats_buffer))
+    bot.leaderboard = Leaderboard(bot.db_pool, utils.render_leaderboard_entries)
+    database.add_stats_listener(bot.leaderboard.on_stats_changed)
+
+    bot.game_journal = GameJournal(bot.db_pool)
+    bot.turn_timers.countdown.on_sent = bot.game_journal.countdown
+    bot.game_journal_flush_task = asyncio.create_task(game_journal.run_flush_loop(bot.game_journal))
+    bot.restore_games_task = asyncio.create_task(restore_games(bot)) # Chờ on_ready + từ điển rồi mới chạy
+
+    bot.wiktionary_client = wiktionary_api.WiktionaryClient()
+    bot.wiktionary_client.start()
 
-    print(f'Bot {bot.user.name} (ID: {bot.user.id}) đã kết nối Discord và sẵn sàng!')
     if not bot.application_id and not bot_cfg.APPLICATION_ID:
         try:
             app_info = await bot.application_info()
@@ -132,38 +223,41 @@ async def on_ready():
         except Exception as e:
             print(f"Không thể tự động lấy Application ID: {e}")
 
+    cog_extensions = [
+        'Noitu.cogs.general_cog',
+        'Noitu.cogs.game_cog',
+        'Noitu.cogs.admin_cog'
+    ]
+    for extension in cog_extensions:
+        try:
+            await bot.load_extension(extension)
+            print(f"Đã tải cog: {extension}")
+        except Exception as e:
+            print(f"Lỗi tải cog {extension}: {e}")
+            traceback.print_exc()
+    try:
+        if bot.application_id:
+            synced_commands = await bot.tree.sync()
+            print(f"Đã đồng bộ {len(synced_commands)} slash commands.")
+        else:
+            print("Bỏ qua đồng bộ slash commands vì không có Application ID.")
+    except Exception as e:
+        print(f"Lỗi đồng bộ slash commands: {e}")
+        traceback.print_exc()
+
+@bot.event
+async def on_ready():
+    print(f'Bot {bot.user.name} (ID: {bot.user.id}) đã kết nối Discord và sẵn sàng!')
     if bot.application_id:
         print(f"Application ID (Client ID): {bot.application_id}")
     else:
         print("Cảnh báo: Ko tìm thấy Application ID.")
 
     print(f"DB Pool: {'Hoạt động' if bot.db_pool else 'Ko hoạt động'}")
-    print(f"Kakasi (JP): {'Sẵn sàng' if bot.kakasi else 'Không khả dụng'}")
-
-    if bot.db_pool:
-        cog_extensions = [
-            'Noitu.cogs.general_cog',
-            'Noitu.cogs.game_cog',
-            'Noitu.cogs.admin_cog'
-        ]
-        for extension in cog_extensions:
-            try:
-                await bot.load_extension(extension)
-                print(f"Đã tải cog: {extension}")
-            except Exception as e:
-                print(f"Lỗi tải cog {extension}: {e}")
-                traceback.print_exc()
-        try:
-            if bot.application_id:
-                synced_commands = await bot.tree.sync()
-                print(f"Đã đồng bộ {len(synced_commands)} slash commands.")
-            else:
-                print("Bỏ qua đồng bộ slash commands vì không có Application ID.")
-        except Exception as e:
-            print(f"Lỗi đồng bộ slash commands: {e}")
-            traceback.print_exc()
+    if bot.language_resources_ready.is_set():
+        print(f"Kakasi (JP): {'Sẵn sàng' if bot.kakasi else 'Không khả dụng'}")
     else:
-        print("Cogs và slash commands chưa được xử lý do lỗi DB.")
+        print("Từ điển/Kakasi: đang tải nền...")
 
     print(f"Prefix động theo server (mặc định: {bot_cfg.DEFAULT_COMMAND_PREFIX}).")
     # print(f"Ngôn ngữ game mặc định: {bot_cfg.DEFAULT_GAME_LANGUAGE}.") # Removed
@@ -177,9 +271,6 @@ async def main():
     if not bot_cfg.DATABASE_URL:
         print("LỖI NGHIÊM TRỌNG: DATABASE_URL thiếu.")
         return
-    
-    if not bot.kakasi: 
-        print("CẢNH BÁO: PyKakasi không được khởi tạo. Chức năng tiếng Nhật có thể không hoạt động đúng.")
 
     try:
         async with bot:
@@ -190,14 +281,40 @@ async def main():
         print(f"LỖI ko xđ khi chạy bot: {e}")
         traceback.print_exc()
     finally:
-        if bot.http_session and not bot.http_session.closed:
-            await bot.http_session.close()
+        await bot.turn_timers.close()
+        print(f"Hẹn giờ lượt: {bot.turn_timers.stats()}")
+        print(f"Đếm ngược: {bot.turn_timers.countdown.stats()}")
+        print(f"Cache user: {bot.user_names.stats()}")
+        if bot.wiktionary_client and not bot.wiktionary_client.closed:
+            await bot.wiktionary_client.close()
             print("HTTP session đã đóng.")
+        if bot.wiktionary_cache_flush_task:
+            bot.wiktionary_cache_flush_task.cancel()
+        if bot.stats_flush_task:
+            bot.stats_flush_task.cancel()
+        if bot.restore_games_task:
+            bot.restore_games_task.cancel()
+        if bot.game_journal_flush_task:
+            bot.game_journal_flush_task.cancel()
         if bot.db_pool:
+            await bot.stats_buffer.flush(force=True)
+            print(f"Stats ghi dồn: {bot.stats_buffer.stats()}")
+            print(f"BXH: {bot.leaderboard.stats()}")
+            await bot.game_journal.flush(force=True) # Ván đang chơi được khôi phục ở lần chạy sau
+            print(f"Nhật ký game: {bot.game_journal.stats()}")
+            for cache in (bot.wiktionary_cache_vn, bot.wiktionary_cache_jp):
+                await cache.flush_hits()
+            await database.stop_guild_config_listener(bot.db_pool)
             await bot.db_pool.close()
             print("DB pool đã đóng.")
-        print(f"Wiktionary VN cache: {len(bot.wiktionary_cache_vn)} mục.")
-        print(f"Wiktionary JP cache: {len(bot.wiktionary_cache_jp)} mục.")
+        if bot.kakasi_service:
+            bot.kakasi_service.close()
+            print(f"Kakasi cache: {bot.kakasi_service.stats()}")
+        print(f"Wiktionary VN cache: {bot.wiktionary_cache_vn.stats()}")
+        print(f"Wiktionary JP cache: {bot.wiktionary_cache_jp.stats()}")
+        print(f"Wiktionary gộp request: {wiktionary_api.lookup_stats()}")
+        if bot.wiktionary_client:
+            print(f"Wiktionary client: {bot.wiktionary_client.stats()}")
         print(f"Từ điển local VN: {len(bot.local_dictionary_vn)} từ.")
         print(f"Từ điển local JP: {len(bot.local_dictionary_jp)} từ.")
         print("Bot đã tắt.")
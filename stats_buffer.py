@@ -0,0 +1,259 @@
+# Noitu/stats_buffer.py
+# Ghi dồn (write-behind) thống kê leaderboard: cộng delta trong RAM theo (user, guild, ngôn ngữ)
+# rồi ghi xuống DB theo lô (1 transaction cho cả lô). Thứ tự thắng/reset chuỗi thắng được gộp
+# chính xác trước khi ghi nên current_win_streak/max_win_streak ra đúng như khi ghi từng lệnh.
+import asyncio
+import itertools
+import time
+import traceback
+
+import asyncpg
+
+from . import config as bot_cfg
+from .database import RANK_COLUMNS, STAT_COLUMNS, STREAK_BREAKING_STATS, notify_stats_changed
+
+_ENSURE_ROWS_SQL = """
+    INSERT INTO leaderboard_stats (user_id, guild_id, game_language, name)
+    SELECT user_id, guild_id, game_language, COALESCE(name, 'Unknown User')
+    FROM unnest($1::bigint[], $2::bigint[], $3::varchar[], $4::varchar[]) AS d(user_id, guild_id, game_language, name)
+    ON CONFLICT (user_id, guild_id, game_language) DO NOTHING
+"""
+_APPLY_SQL = f"""
+    UPDATE leaderboard_stats AS s
+    SET name = COALESCE(d.name, s.name),
+        {", ".join(f"{column} = s.{column} + d.{column}" for column in STAT_COLUMNS)},
+        current_win_streak = CASE WHEN d.streak_reset THEN d.streak_add ELSE s.current_win_streak + d.streak_add END,
+        max_win_streak = GREATEST(s.max_win_streak, s.current_win_streak + d.streak_before_reset, d.streak_peak)
+    FROM unnest($1::bigint[], $2::bigint[], $3::varchar[], $4::varchar[],
+                {", ".join(f"${i}::int[]" for i in range(5, 5 + len(STAT_COLUMNS)))},
+                ${5 + len(STAT_COLUMNS)}::bool[], ${6 + len(STAT_COLUMNS)}::int[],
+                ${7 + len(STAT_COLUMNS)}::int[], ${8 + len(STAT_COLUMNS)}::int[])
+         AS d(user_id, guild_id, game_language, name, {", ".join(STAT_COLUMNS)},
+              streak_reset, streak_before_reset, streak_peak, streak_add)
+    WHERE s.user_id = d.user_id AND s.guild_id = d.guild_id AND s.game_language = d.game_language
+    RETURNING s.guild_id, s.game_language, {", ".join(f"s.{column}" for column in RANK_COLUMNS.split(", "))}
+"""
+
+
+class StatDelta:
+    """Thay đổi cộng dồn của 1 dòng leaderboard_stats.
+    Chuỗi thắng: `streak_before_reset` trận thắng trước lần reset đầu tiên, `streak_peak` là chuỗi dài nhất
+    sau lần reset đó, `streak_add` là số trận thắng sau lần reset cuối (bằng before_reset nếu ko reset)."""
+    __slots__ = ("name", "counts", "streak_reset", "streak_before_reset", "streak_peak", "streak_add")
+
+    def __init__(self):
+        self.name: str | None = None
+        self.counts = [0] * len(STAT_COLUMNS)
+        self.streak_reset = False
+        self.streak_before_reset = 0
+        self.streak_peak = 0
+        self.streak_add = 0
+
+    def add_stat(self, stat_key: str, increment: int) -> None:
+        self.counts[STAT_COLUMNS.index(stat_key)] += increment
+        if stat_key == "wins":
+            self.add_win()
+        elif stat_key in STREAK_BREAKING_STATS:
+            self.reset_streak()
+
+    def add_win(self) -> None:
+        self.streak_add += 1
+        if self.streak_reset:
+            self.streak_peak = max(self.streak_peak, self.streak_add)
+        else:
+            self.streak_before_reset = self.streak_add
+
+    def reset_streak(self) -> None:
+        self.streak_reset = True
+        self.streak_add = 0
+
+    def merge(self, later: "StatDelta") -> None:
+        """Gộp `later` (xảy ra sau) vào delta này."""
+        if later.name:
+            self.name = later.name
+        self.counts = [a + b for a, b in zip(self.counts, later.counts)]
+        if not later.streak_reset:
+            self.streak_add += later.streak_add
+            if self.streak_reset:
+                self.streak_peak = max(self.streak_peak, self.streak_add)
+            else:
+                self.streak_before_reset = self.streak_add
+            return
+        if self.streak_reset:
+            self.streak_peak = max(self.streak_peak, self.streak_add + later.streak_before_reset, later.streak_peak)
+        else:
+            self.streak_before_reset += later.streak_before_reset
+            self.streak_peak = later.streak_peak
+        self.streak_reset = True
+        self.streak_add = later.streak_add
+
+
+class StatsBuffer:
+    def __init__(self, db_pool: asyncpg.Pool | None, max_pending: int = bot_cfg.STATS_FLUSH_MAX_PENDING,
+                 max_backlog: int = bot_cfg.STATS_FLUSH_MAX_BACKLOG,
+                 max_retry_delay: float = bot_cfg.STATS_FLUSH_RETRY_MAX_SECONDS):
+        self.db_pool = db_pool
+        self.max_pending = max_pending # Đủ số dòng này thì ghi ngay, ko chờ chu kỳ
+        self.max_backlog = max_backlog # DB lỗi lâu: giữ tối đa chừng này dòng, phần dư bị bỏ
+        self.max_retry_delay = max_retry_delay
+        self._retry_delay = 0.0
+        self._retry_at = 0.0 # Sau lần ghi lỗi: chờ tới lúc này mới thử lại (backoff lũy thừa)
+        self._pending: dict[tuple[int, int, str], StatDelta] = {}
+        self._flush_lock = asyncio.Lock() # Các lô được ghi lần lượt -> giữ đúng thứ tự
+        self._threshold_flush: asyncio.Task | None = None
+        self.recorded = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _delta(self, user_id: int, guild_id: int, game_language: str) -> StatDelta:
+        key = (user_id, guild_id, game_language.upper())
+        delta = self._pending.get(key)
+        if delta is None:
+            delta = self._pending[key] = StatDelta()
+            if len(self._pending) >= self.max_pending and not self._threshold_flush and not self._backing_off():
+                self._threshold_flush = asyncio.create_task(self._flush_on_threshold())
+        return delta
+
+    def record(self, bot_user_id: int, user_id: int, guild_id: int, stat_key: str, username: str,
+               game_language: str, increment: int = 1) -> None:
+        """Như database.update_stat nhưng chỉ cộng vào bộ đệm (ko await, ko truy vấn)."""
+        if user_id == bot_user_id or not self.db_pool: return
+        delta = self._delta(user_id, guild_id, game_language)
+        if username and username != "Unknown User":
+            delta.name = username
+        delta.add_stat(stat_key, increment)
+        self.recorded += 1
+
+    def reset_win_streak(self, user_id: int, guild_id: int, game_language: str) -> None:
+        if not self.db_pool: return
+        self._delta(user_id, guild_id, game_language).reset_streak()
+        self.recorded += 1
+
+    def _backing_off(self) -> bool:
+        return time.monotonic() < self._retry_at
+
+    async def _flush_on_threshold(self) -> None:
+        try:
+            await self.flush()
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self._threshold_flush = None
+
+    async def flush(self, force: bool = False) -> int:
+        """Ghi mọi delta đang chờ. Gọi khi game kết thúc (trước khi đọc/ghi trực tiếp stats) và lúc tắt bot.
+        Sau lần ghi lỗi, các lần gọi trong thời gian backoff ko làm gì (trừ khi `force`)."""
+        async with self._flush_lock:
+            if not self._pending or not self.db_pool:
+                return 0
+            if self._backing_off() and not force:
+                return 0
+            batch, self._pending = self._pending, {}
+            try:
+                async with self.db_pool.acquire() as connection:
+                    async with connection.transaction():
+                        changed_rows = await self.write(connection, batch)
+            except Exception as e:
+                self.failed_flushes += 1
+                self._retry_delay = min(max(self._retry_delay * 2, 1.0), self.max_retry_delay)
+                self._retry_at = time.monotonic() + self._retry_delay
+                print(f"Lỗi ghi dồn stats ({len(batch)} dòng), thử lại sau {self._retry_delay:.0f}s: {e}")
+                self.restore(batch)
+                return 0
+            self._retry_delay = 0.0
+            self._retry_at = 0.0
+            _notify(changed_rows)
+            self.flushes += 1
+            self.flushed_rows += len(batch)
+            return len(batch)
+
+    @staticmethod
+    async def write(connection: asyncpg.Connection, batch: dict) -> list:
+        """Ghi 1 lô delta bằng `connection` (trong transaction của người gọi). Trả về các dòng đã đổi."""
+        keys = list(batch)
+        deltas = [batch[key] for key in keys]
+        columns = [
+            [key[0] for key in keys], [key[1] for key in keys], [key[2] for key in keys],
+            [delta.name for delta in deltas],
+        ]
+        columns += [[delta.counts[i] for delta in deltas] for i in range(len(STAT_COLUMNS))]
+        columns += [[delta.streak_reset for delta in deltas], [delta.streak_before_reset for delta in deltas],
+                    [delta.streak_peak for delta in deltas], [delta.streak_add for delta in deltas]]
+        await connection.execute(_ENSURE_ROWS_SQL, *columns[:4])
+        return await connection.fetch(_APPLY_SQL, *columns)
+
+    async def take(self, guild_id: int, game_language: str) -> dict:
+        """Lấy ra các delta còn chờ của 1 guild (đợi lô đang ghi xong trước) để ghi trong transaction chốt ván."""
+        game_language = game_language.upper()
+        async with self._flush_lock:
+            batch = {key: delta for key, delta in self._pending.items() if key[1] == guild_id and key[2] == game_language}
+            for key in batch:
+                del self._pending[key]
+        return batch
+
+    async def flush_user(self, user_id: int, guild_id: int, game_language: str) -> bool:
+        """Chỉ ghi dòng của 1 user (vd. trước khi tính hạng của người xem BXH). False nếu vẫn còn chờ."""
+        if not self.db_pool or self._backing_off(): return False
+        key = (user_id, guild_id, game_language.upper())
+        async with self._flush_lock:
+            delta = self._pending.pop(key, None)
+            if delta is None:
+                return True
+            try:
+                async with self.db_pool.acquire() as connection:
+                    async with connection.transaction():
+                        changed_rows = await self.write(connection, {key: delta})
+            except Exception as e:
+                print(f"Lỗi ghi stats của user {user_id}: {e}")
+                self.restore({key: delta})
+                return False
+        _notify(changed_rows)
+        return True
+
+    def restore(self, batch: dict) -> None:
+        """Trả lại lô chưa ghi được vào bộ đệm. Delta cũ đứng trước delta mới ghi trong lúc đó."""
+        for key, delta in batch.items():
+            newer = self._pending.get(key)
+            if newer is not None:
+                delta.merge(newer)
+            self._pending[key] = delta
+        excess = len(self._pending) - self.max_backlog
+        if excess > 0: # Ko để bộ đệm phình mãi khi DB lỗi lâu
+            for key in list(itertools.islice(self._pending, excess)):
+                del self._pending[key]
+            self.dropped += excess
+            print(f"Bộ đệm stats vượt {self.max_backlog} dòng, bỏ {excess} dòng (tổng đã bỏ: {self.dropped}).")
+
+    async def flush_before_settlement(self, guild_id: int, game_language: str) -> bool:
+        """Flush (bỏ qua backoff) trước khi chốt thắng/thua. False nếu stats của guild vẫn chưa xuống DB:
+        khi đó database.settle_game(stats_buffer=...) ghi phần còn lại trong cùng transaction, trước kết quả ván."""
+        await self.flush(force=True)
+        game_language = game_language.upper()
+        return not any(key[1] == guild_id and key[2] == game_language for key in self._pending)
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "recorded": self.recorded, "flushes": self.flushes,
+                "flushed_rows": self.flushed_rows, "failed_flushes": self.failed_flushes, "dropped": self.dropped}
+
+
+def _notify(changed_rows) -> None:
+    rows_by_board: dict[tuple[int, str], list] = {}
+    for row in changed_rows:
+        rows_by_board.setdefault((row["guild_id"], row["game_language"]), []).append(row)
+    for (guild_id, game_language), rows in rows_by_board.items():
+        notify_stats_changed(guild_id, game_language, rows)
+
+
+async def run_flush_loop(buffer: StatsBuffer, interval_seconds: float = bot_cfg.STATS_FLUSH_SECONDS):
+    """Task nền: định kỳ ghi dồn stats xuống DB."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await buffer.flush()
+        except Exception:
+            traceback.print_exc()
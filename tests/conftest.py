@@ -0,0 +1,12 @@
+# Noitu/tests/conftest.py
+# Repo là package "Noitu" (import tương đối) nhưng ko có __init__.py: đăng ký thư mục repo thành package đó.
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "Noitu" not in sys.modules:
+    package = types.ModuleType("Noitu")
+    package.__path__ = [ROOT]
+    sys.modules["Noitu"] = package
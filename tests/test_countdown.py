@@ -0,0 +1,95 @@
+# Noitu/tests/test_countdown.py
+import asyncio
+
+from Noitu.game.countdown import CountdownRenderer
+
+
+class _FakeMessage:
+    def __init__(self, channel, message_id, content):
+        self.channel = channel
+        self.id = message_id
+        self.content = content
+        self.deleted = False
+
+    async def edit(self, content):
+        self.content = content
+        self.channel.log.append(("edit", self.channel.id, content))
+
+    async def delete(self):
+        self.deleted = True
+
+
+class _FakeChannel:
+    def __init__(self, channel_id, log):
+        self.id = channel_id
+        self.log = log
+        self.messages = []
+
+    async def send(self, content):
+        self.log.append(("send", self.id, content))
+        message = _FakeMessage(self, 1000 + len(self.log), content)
+        self.messages.append(message)
+        return message
+
+
+async def _settle():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_shared_budget_serves_new_turns_first():
+    async def scenario():
+        log = []
+        renderer = CountdownRenderer(edits_per_second=2, min_interval=0)
+        channels = [_FakeChannel(i, log) for i in range(3)]
+        renderer.show(channels[0], "tick", urgent=False)
+        renderer.show(channels[1], "lượt mới", urgent=True)
+        renderer.show(channels[2], "lượt mới", urgent=True)
+        renderer.pump()
+        await _settle()
+        assert sorted(channel_id for _, channel_id, _ in log) == [1, 2] # Hết ngân sách trước kênh 0
+        assert renderer.stats()["pending"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_only_latest_content_is_rendered_and_message_is_reused():
+    async def scenario():
+        log, sent = [], []
+        renderer = CountdownRenderer(edits_per_second=10, min_interval=0)
+        renderer.on_sent = lambda channel_id, message_id: sent.append((channel_id, message_id))
+        channel = _FakeChannel(1, log)
+        renderer.show(channel, "30 giây", urgent=True)
+        renderer.show(channel, "29 giây")
+        renderer.pump()
+        await _settle()
+        renderer.show(channel, "28 giây")
+        renderer.pump()
+        await _settle()
+        assert log == [("send", 1, "29 giây"), ("edit", 1, "28 giây")]
+        assert renderer.skipped == 1 and sent == [(1, channel.messages[0].id)]
+
+        renderer.release(1)
+        await _settle()
+        assert channel.messages[0].deleted and len(renderer) == 0
+
+    asyncio.run(scenario())
+
+
+def test_non_urgent_updates_respect_per_channel_interval():
+    async def scenario():
+        log = []
+        renderer = CountdownRenderer(edits_per_second=10, min_interval=60)
+        channel = _FakeChannel(1, log)
+        renderer.show(channel, "30 giây", urgent=True)
+        renderer.pump()
+        await _settle()
+        renderer.show(channel, "29 giây") # Vừa sửa xong: chờ min_interval
+        renderer.pump()
+        await _settle()
+        renderer.show(channel, "Lượt mới", urgent=True) # Lượt mới ko phải chờ
+        renderer.pump()
+        await _settle()
+        assert [content for _, _, content in log] == ["30 giây", "Lượt mới"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,61 @@
+# Noitu/tests/test_database.py
+import asyncio
+import contextlib
+
+import pytest
+
+from Noitu import database
+
+
+class _RecordingConnection:
+    """Connection giả: ghi lại câu lệnh + tham số, đếm số transaction."""
+
+    def __init__(self):
+        self.statements = []
+        self.transactions = 0
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        self.transactions += 1
+        yield
+
+    async def fetch(self, sql, *args):
+        self.statements.append((sql, args))
+        return [{"user_id": user_id} for user_id in args[0]]
+
+    async def fetchrow(self, sql, *args):
+        self.statements.append((sql, args))
+        return {"user_id": args[0], "wins": 1, "current_win_streak": 1, "max_win_streak": 1}
+
+
+def test_settle_game_writes_loser_resets_and_winner_in_one_transaction():
+    async def scenario():
+        connection = _RecordingConnection()
+        notified = []
+        database._stats_listeners.append(lambda *event: notified.append(event))
+        try:
+            winner_stats = await database.settle_game(
+                connection, 1, "vn", winner_id=7, winner_name="u7", reset_user_ids=[7, 8, 9],
+                loser_id=8, loser_name="u8", loser_stat="lost_by_n_ending")
+        finally:
+            database._stats_listeners.pop()
+        return connection, winner_stats, notified
+
+    connection, winner_stats, notified = asyncio.run(scenario())
+    assert connection.transactions == 1
+    assert [sql for sql, _ in connection.statements] == [
+        database._UPDATE_STAT_SQL["lost_by_n_ending"], database._RESET_STREAKS_SQL, database._UPDATE_STAT_SQL["wins"]]
+    assert connection.statements[0][1][:3] == (8, 1, "VN")
+    assert connection.statements[1][1][0] == [8, 9] # Người thắng ko bị reset chuỗi thắng
+    assert connection.statements[2][1][0] == 7
+    assert winner_stats["user_id"] == 7
+    assert len(notified) == 1 and notified[0][:2] == (1, "VN") # BXH được báo 1 lần sau khi commit
+
+
+def test_settle_game_rejects_unknown_loser_stat():
+    with pytest.raises(ValueError):
+        asyncio.run(database.settle_game(_RecordingConnection(), 1, "VN", loser_id=8, loser_stat="wins_typo"))
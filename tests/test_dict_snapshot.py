@@ -0,0 +1,10 @@
+# Noitu/tests/test_dict_snapshot.py
+from Noitu.dict_snapshot import Snapshot, pack_u32, write_snapshot
+
+
+def test_write_snapshot_replaces_atomically_without_leftover_temp_files(tmp_path):
+    path = tmp_path / "directory-vn.snap"
+    write_snapshot(str(path), {"a": pack_u32([1, 2])})
+    write_snapshot(str(path), {"a": pack_u32([3])})
+    assert list(Snapshot.open(str(path)).u32("a")) == [3]
+    assert [p.name for p in tmp_path.iterdir()] == ["directory-vn.snap"]
@@ -0,0 +1,38 @@
+# Noitu/tests/test_journal.py
+import asyncio
+
+from Noitu.game.journal import GameJournal
+
+
+class _FailingPool:
+    """DB pool luôn lỗi khi ghi, đếm số lần thử."""
+
+    def __init__(self):
+        self.attempts = 0
+
+    def acquire(self):
+        self.attempts += 1
+        raise ConnectionError("db down")
+
+
+def test_failed_flush_backs_off_compacts_and_caps_backlog():
+    async def scenario():
+        pool = _FailingPool()
+        journal = GameJournal(pool, max_pending=1000, max_backlog=4)
+        journal.countdown(1, 100)
+        journal.countdown(1, 101)
+        journal.end(1) # Ván ở kênh 1 đã xong: chỉ cần giữ END
+        for message_id in range(4):
+            journal.countdown(2, message_id)
+        assert await journal.flush() == 0
+        # Còn END của kênh 1 + 4 sự kiện kênh 2, vượt giới hạn 1 -> bỏ sự kiện cũ nhất
+        assert [(channel_id, event) for channel_id, event, _ in journal._pending] == [(2, "countdown")] * 4
+        assert journal.dropped == 1
+
+        # Trong thời gian backoff: ko thử lại (trừ khi force)
+        assert await journal.flush() == 0
+        assert pool.attempts == 1
+        await journal.flush(force=True)
+        assert pool.attempts == 2
+
+    asyncio.run(scenario())
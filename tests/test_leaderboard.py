@@ -0,0 +1,72 @@
+# Noitu/tests/test_leaderboard.py
+import asyncio
+import contextlib
+
+from Noitu.leaderboard import Leaderboard
+
+
+def _row(user_id, wins, correct_moves=0):
+    return {"user_id": user_id, "name": f"u{user_id}", "wins": wins, "correct_moves": correct_moves,
+            "max_win_streak": 0, "current_win_streak": 0, "total_errors": 0}
+
+
+class _FakePool:
+    """DB pool trả top-N từ danh sách dòng trong bộ nhớ, đếm số truy vấn."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    async def fetch(self, sql, guild_id, game_language, limit):
+        self.queries += 1
+        return sorted(self.rows, key=lambda row: (-row["wins"], -row["correct_moves"]))[:limit]
+
+
+def test_top_cache_only_invalidated_by_changes_that_can_reach_top():
+    async def scenario():
+        pool = _FakePool([_row(1, 10), _row(2, 8), _row(3, 1)])
+        board = Leaderboard(pool, lambda rows, lang: ",".join(str(row["user_id"]) for row in rows), top_size=2)
+        assert await board.top(1, "vn") == "1,2"
+        assert await board.top(1, "vn") == "1,2" and pool.queries == 1
+
+        # Người ngoài top thêm nước đi đúng nhưng vẫn xếp dưới dòng cuối -> giữ cache
+        board.on_stats_changed(1, "VN", [_row(3, 1, correct_moves=5)])
+        assert await board.top(1, "VN") == "1,2" and pool.queries == 1
+        # Guild/ngôn ngữ khác -> giữ cache
+        board.on_stats_changed(2, "VN", [_row(3, 50)])
+        assert pool.queries == 1 and board.invalidations == 0
+
+        # Người ngoài top vượt dòng cuối -> đọc lại
+        pool.rows[2] = _row(3, 9)
+        board.on_stats_changed(1, "VN", [pool.rows[2]])
+        assert await board.top(1, "VN") == "1,3" and pool.queries == 2
+        # Người trong top đổi số liệu -> đọc lại
+        board.on_stats_changed(1, "VN", [_row(1, 11)])
+        await board.top(1, "VN")
+        assert pool.queries == 3 and board.invalidations == 2
+
+    asyncio.run(scenario())
+
+
+def test_top_not_cached_when_changed_during_load():
+    async def scenario():
+        pool = _FakePool([_row(1, 10)])
+        board = Leaderboard(pool, lambda rows, lang: str(len(rows)), top_size=2)
+        original_fetch = pool.fetch
+
+        async def fetch_with_concurrent_write(*args):
+            rows = await original_fetch(*args)
+            board.on_stats_changed(1, "VN", [_row(2, 1)]) # Ghi xen giữa lúc đang đọc
+            return rows
+
+        pool.fetch = fetch_with_concurrent_write
+        assert await board.top(1, "VN") == "1"
+        pool.fetch = original_fetch
+        await board.top(1, "VN")
+        assert pool.queries == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,69 @@
+# Noitu/tests/test_lexicon.py
+from Noitu.dict_snapshot import Snapshot, pack_snapshot
+from Noitu.lexicon import JapaneseLexicon, VietnameseLexicon, first_mora, last_mora
+
+
+def _jp_lexicon(rows):
+    return JapaneseLexicon(Snapshot(pack_snapshot(JapaneseLexicon.compile_rows(rows))))
+
+def _vn_lexicon(lines):
+    return VietnameseLexicon(Snapshot(pack_snapshot(VietnameseLexicon.compile_rows(lines))))
+
+
+def test_japanese_lookup_by_kanji_kana_and_romaji():
+    lexicon_obj = _jp_lexicon([["猫", "ねこ", "Neko"], ["犬", "いぬ", "inu"], ["コーヒー", "こーひー", "koohii"]])
+    assert lexicon_obj.lookup("猫")["hira"] == "ねこ"
+    assert lexicon_obj.lookup("ねこ")["kanji"] == "猫"
+    assert lexicon_obj.lookup("ネコ")["kanji"] == "猫" # Katakana -> Hiragana
+    assert lexicon_obj.lookup(" NEKO ")["kanji"] == "猫" # Romaji ko phân biệt hoa/thường
+    assert lexicon_obj.lookup("とり") is None
+    assert lexicon_obj.lookup("") is None
+
+
+def test_japanese_homophones_share_a_contiguous_id_range():
+    lexicon_obj = _jp_lexicon([["橋", "はし", "hashi"], ["箸", "はし", "hashi"], ["端", "はし", "hashi"],
+                               ["花", "はな", "hana"], ["橋", "はし", "hashi"]]) # Dòng trùng bị bỏ
+    word_ids = lexicon_obj.word_ids("はし")
+    assert len(word_ids) == 3
+    assert {lexicon_obj.entry(i)["kanji"] for i in word_ids} == {"橋", "箸", "端"}
+    assert lexicon_obj.word_ids("はね") == range(0)
+    assert len(lexicon_obj) == 4
+
+
+def test_continuation_index_counts_two_syllable_words_by_first_syllable():
+    lexicon_obj = _vn_lexicon(["con mèo", "con chó", "Mèo  Con", "mèo", "con mèo con"])
+    index = lexicon_obj.next_index
+    assert index.playable_count == 3 # "mèo" và "con mèo con" ko đúng 2 chữ
+    assert index.count_for("con") == 2
+    assert index.count_for("mèo") == 1
+    assert index.count_for("chó") == 0 # Chỉ là chữ cuối
+    assert index.count_for("gà") == 0
+    assert sorted(lexicon_obj.word(i) for i in index.ids_for("con")) == ["con chó", "con mèo"]
+    word_id = lexicon_obj.word_id("mèo con")
+    assert index.key(index.head(word_id)) == "mèo" and index.key(index.tail(word_id)) == "con"
+    assert index.head(lexicon_obj.word_id("mèo")) is None
+
+
+def test_continuation_index_move_count_excludes_losing_n_endings():
+    lexicon_obj = _jp_lexicon([["猫", "ねこ", "neko"], ["熱", "ねつ", "netsu"], ["年金", "ねんきん", "nenkin"]])
+    slot = lexicon_obj.next_index.slot("ね")
+    assert lexicon_obj.next_index.count(slot) == 3
+    assert lexicon_obj.next_index.move_count(slot) == 2 # 'ねんきん' kết thúc bằng 'ん': ra là thua
+
+
+def test_mora_normalization_of_small_kana_and_long_vowels():
+    assert first_mora("しゃしん") == "しゃ" # Kana nhỏ ghép với kana trước
+    assert last_mora("いしゃ") == "しゃ"
+    assert last_mora("コーヒー") == "ひ" # 'ー' cuối bị bỏ qua, Katakana -> Hiragana
+    assert first_mora("ーあい") == "あ"
+    assert last_mora("きっ") == "つ" # Kana nhỏ đứng riêng -> kana lớn
+    assert first_mora("ぁい") == "あ"
+    assert last_mora("ふぁ") == "ふぁ"
+    assert first_mora("ー") is None and last_mora("") is None
+
+
+def test_japanese_lexicon_stores_precomputed_morae():
+    lexicon_obj = _jp_lexicon([["医者", "いしゃ", "isha"], ["コーヒー", "こーひー", "koohii"]])
+    assert lexicon_obj.last_mora("いしゃ") == "しゃ"
+    assert lexicon_obj.last_mora("こーひー") == "ひ"
+    assert lexicon_obj.first_mora("しゃしん") == "しゃ" # Ko có trong từ điển: chuẩn hóa trực tiếp
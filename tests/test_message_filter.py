@@ -0,0 +1,39 @@
+# Noitu/tests/test_message_filter.py
+import types
+
+from Noitu.game.logic import is_possible_game_move
+from Noitu.game.state import GameState
+from Noitu.lexicon import JapaneseLexicon, VietnameseLexicon
+
+
+def _bot(active_games: dict):
+    return types.SimpleNamespace(active_games=active_games)
+
+def _message(channel_id: int, content: str):
+    return types.SimpleNamespace(channel=types.SimpleNamespace(id=channel_id), content=content)
+
+def _game(game_language: str) -> GameState:
+    dictionary = VietnameseLexicon.empty() if game_language == "VN" else JapaneseLexicon.empty()
+    return GameState(game_language, dictionary, guild_id=1, min_players_for_timeout=2, timeout_seconds=30)
+
+
+def test_messages_in_channels_without_an_active_game_are_dropped():
+    ended = _game("VN")
+    ended.active = False
+    bot = _bot({1: ended})
+    assert not is_possible_game_move(bot, _message(1, "con mèo"))
+    assert not is_possible_game_move(bot, _message(2, "con mèo"))
+
+def test_vn_move_must_be_exactly_two_words():
+    bot = _bot({1: _game("VN")})
+    assert is_possible_game_move(bot, _message(1, "con mèo"))
+    assert is_possible_game_move(bot, _message(1, "  Mèo   Con "))
+    assert not is_possible_game_move(bot, _message(1, "mèo"))
+    assert not is_possible_game_move(bot, _message(1, "hôm nay ai thắng vậy"))
+
+def test_jp_move_must_be_one_kana_kanji_or_romaji_token():
+    bot = _bot({1: _game("JP")})
+    for content in ("ねこ", "コーヒー", "猫", "neko", " 日々 "):
+        assert is_possible_game_move(bot, _message(1, content)), content
+    for content in ("ねこ いぬ", "neko!", "ねこ123", "", "あ" * 40):
+        assert not is_possible_game_move(bot, _message(1, content)), content
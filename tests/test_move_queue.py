@@ -0,0 +1,26 @@
+# Noitu/tests/test_move_queue.py
+import types
+
+from Noitu.game.logic import should_prevalidate
+from Noitu.game.state import GameState
+from Noitu.lexicon import VietnameseLexicon
+
+
+def _message(author_id: int, content: str):
+    return types.SimpleNamespace(author=types.SimpleNamespace(id=author_id), content=content)
+
+def _vn_game(last_player_id: int, word_to_match_next: str) -> GameState:
+    game = GameState("VN", VietnameseLexicon.empty(), guild_id=1, min_players_for_timeout=2, timeout_seconds=30)
+    game.last_player_id = last_player_id
+    game.word_to_match_next = word_to_match_next
+    return game
+
+
+def test_wrong_turn_is_not_prevalidated():
+    assert not should_prevalidate(_vn_game(7, "mèo"), _message(7, "mèo con"))
+
+def test_vn_wrong_link_is_not_prevalidated():
+    assert not should_prevalidate(_vn_game(7, "mèo"), _message(8, "con mèo"))
+
+def test_vn_linked_move_is_prevalidated():
+    assert should_prevalidate(_vn_game(7, "mèo"), _message(8, "Mèo con"))
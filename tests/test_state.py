@@ -0,0 +1,54 @@
+# Noitu/tests/test_state.py
+from Noitu.dict_snapshot import Snapshot, pack_snapshot
+from Noitu.game.state import GameState, UsedWords
+from Noitu.lexicon import JapaneseLexicon, VietnameseLexicon
+
+
+def _vn_lexicon(lines):
+    return VietnameseLexicon(Snapshot(pack_snapshot(VietnameseLexicon.compile_rows(lines))))
+
+def _game(lexicon):
+    return GameState("VN", lexicon, guild_id=1, min_players_for_timeout=2, timeout_seconds=30)
+
+
+def test_wiktionary_only_word_with_unindexed_tail_is_not_dead_end():
+    game = _game(_vn_lexicon(["con mèo", "mèo con"]))
+    game.mark_used("chim cắt") # Từ chỉ Wiktionary biết, chữ cuối ko có trong từ điển local
+    game.word_to_match_next = "cắt"
+    assert game.is_dead_end() is False
+
+def test_exhausted_key_is_dead_end_while_wiktionary_available():
+    # Index nối tiếp local quyết định, ko phụ thuộc Wiktionary có đang dùng được hay ko
+    game = _game(_vn_lexicon(["con mèo", "mèo con"]))
+    game.mark_used("mèo con")
+    game.word_to_match_next = "mèo"
+    assert game.is_dead_end() is True
+    assert game.is_dead_end("mèo") is True
+
+def test_key_with_unused_words_is_not_dead_end():
+    game = _game(_vn_lexicon(["con mèo", "mèo con"]))
+    assert game.is_dead_end("mèo") is False
+
+
+def test_used_words_tracks_dictionary_ids_and_extra_phrases():
+    lexicon_obj = _vn_lexicon(["con mèo", "mèo con", "con chó"])
+    used_words = UsedWords(lexicon_obj)
+    assert used_words.add("Mèo  Con") == range(lexicon_obj.word_id("mèo con"), lexicon_obj.word_id("mèo con") + 1)
+    assert used_words.add("con chó")
+    assert used_words.add("mèo con") is None # Đã dùng
+    assert "mèo con" in used_words and "con chó" in used_words and "con mèo" not in used_words
+    assert used_words.contains_id(lexicon_obj.word_id("con chó"))
+    assert not used_words.contains_id(lexicon_obj.word_id("con mèo"))
+
+    assert used_words.add("chim cắt") == range(0) # Từ chỉ Wiktionary biết: giữ dạng chuỗi
+    assert used_words.add("chim cắt") is None
+    assert "chim cắt" in used_words and len(used_words) == 3
+
+def test_japanese_homophones_are_all_used_together():
+    lexicon_obj = JapaneseLexicon(Snapshot(pack_snapshot(JapaneseLexicon.compile_rows(
+        [["橋", "はし", "hashi"], ["箸", "はし", "hashi"], ["花", "はな", "hana"]]))))
+    game = GameState("JP", lexicon_obj, guild_id=1, min_players_for_timeout=2, timeout_seconds=30)
+    game.mark_used("はし")
+    assert all(game.used_words.contains_id(i) for i in lexicon_obj.word_ids("はし"))
+    assert game.is_used("はし") and not game.is_used("はな")
+    assert game.remaining_moves[lexicon_obj.next_index.slot("は")] == 1 # Còn "はな"
@@ -0,0 +1,108 @@
+# Noitu/tests/test_stats_buffer.py
+import asyncio
+import contextlib
+
+from Noitu import database
+from Noitu.stats_buffer import _APPLY_SQL, StatsBuffer
+
+
+class _FailingPool:
+    """DB pool luôn lỗi khi ghi, đếm số lần thử."""
+
+    def __init__(self):
+        self.attempts = 0
+
+    def acquire(self):
+        self.attempts += 1
+        raise ConnectionError("db down")
+
+
+def test_failed_flush_backs_off_and_caps_backlog():
+    async def scenario():
+        pool = _FailingPool()
+        buffer = StatsBuffer(pool, max_pending=1000, max_backlog=3)
+        for user_id in range(5):
+            buffer.record(0, user_id + 1, 1, "correct_moves", "u", "VN")
+        assert await buffer.flush() == 0
+        assert len(buffer) == 3 and buffer.dropped == 2
+
+        # Trong thời gian backoff: ko thử lại (trừ khi force)
+        assert await buffer.flush() == 0
+        assert pool.attempts == 1
+        # Trước khi chốt ván thì vẫn thử lại ngay
+        assert await buffer.flush_before_settlement(1, "vn") is False
+        assert pool.attempts == 2
+
+    asyncio.run(scenario())
+
+
+class _RecordingConnection:
+    """Connection giả: ghi lại thứ tự câu lệnh; câu ghi stats dồn có thể bị làm lỗi."""
+
+    def __init__(self):
+        self.statements = []
+        self.fail_buffered_writes = True
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def execute(self, sql, *args):
+        if self.fail_buffered_writes and "unnest" in sql:
+            raise ConnectionError("db down")
+        self.statements.append(("execute", sql))
+
+    async def fetch(self, sql, *args):
+        self.statements.append(("fetch", sql))
+        return []
+
+    async def fetchrow(self, sql, *args):
+        self.statements.append(("fetchrow", sql))
+        return None
+
+
+def test_unflushed_deltas_are_written_before_the_settlement():
+    async def scenario():
+        connection = _RecordingConnection()
+        buffer = StatsBuffer(connection)
+        buffer.record(0, 7, 1, "wrong_turn", "u7", "VN") # Reset chuỗi thắng của người sắp thắng
+        assert await buffer.flush_before_settlement(1, "VN") is False
+
+        connection.fail_buffered_writes = False
+        await database.settle_game(connection, 1, "VN", winner_id=7, winner_name="u7", stats_buffer=buffer)
+        assert len(buffer) == 0
+        statements = [sql for _, sql in connection.statements]
+        assert statements.index(_APPLY_SQL) < statements.index(database._UPDATE_STAT_SQL["wins"])
+
+    asyncio.run(scenario())
+
+
+def test_failed_settlement_returns_deltas_to_buffer():
+    async def scenario():
+        connection = _RecordingConnection()
+        buffer = StatsBuffer(connection)
+        buffer.record(0, 7, 1, "wrong_turn", "u7", "VN")
+        try:
+            await database.settle_game(connection, 1, "VN", winner_id=7, stats_buffer=buffer)
+        except ConnectionError:
+            pass
+        assert len(buffer) == 1
+
+    asyncio.run(scenario())
+
+
+def test_flush_user_writes_only_that_users_row():
+    async def scenario():
+        connection = _RecordingConnection()
+        connection.fail_buffered_writes = False
+        buffer = StatsBuffer(connection)
+        buffer.record(0, 7, 1, "correct_moves", "u7", "VN")
+        buffer.record(0, 8, 1, "correct_moves", "u8", "VN")
+        assert await buffer.flush_user(7, 1, "vn") is True
+        assert list(buffer._pending) == [(8, 1, "VN")]
+
+    asyncio.run(scenario())
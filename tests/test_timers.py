@@ -0,0 +1,43 @@
+# Noitu/tests/test_timers.py
+import asyncio
+import math
+import types
+
+from Noitu.game.timers import TurnTimers
+
+
+class _SilentCountdown:
+    def show(self, channel, content, urgent=False): pass
+    def pump(self): pass
+    def release(self, channel_id): pass
+    def close(self): pass
+
+
+def _timers(expired: list) -> TurnTimers:
+    async def on_expire(bot, timer):
+        expired.append(timer.channel.id)
+    bot = types.SimpleNamespace(user=types.SimpleNamespace(id=0))
+    return TurnTimers(bot, on_expire, tick_seconds=1.0, countdown=_SilentCountdown())
+
+
+def test_turn_never_expires_before_its_deadline():
+    async def scenario():
+        expired = []
+        timers = _timers(expired)
+        game_state = types.SimpleNamespace(timeout_seconds=30, last_player_id=1, current_phrase_str="con mèo",
+                                           game_language="VN", turn_timer=None)
+        timer = timers.arm(types.SimpleNamespace(id=5), game_state, remaining_seconds=10.3)
+        try:
+            # Đầu tick chứa hạn: tick đó "đã tới" nếu làm tròn lên cả giờ hiện tại, nhưng hạn thì chưa
+            early = math.ceil(timer.deadline) - 1 + 0.001
+            assert early < timer.deadline
+            timers._on_tick(early)
+            await asyncio.sleep(0)
+            assert expired == [] and len(timers) == 1
+            timers._on_tick(timer.deadline + 1.0)
+            await asyncio.sleep(0)
+            assert expired == [5]
+        finally:
+            await timers.close()
+
+    asyncio.run(scenario())
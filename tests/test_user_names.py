@@ -0,0 +1,67 @@
+# Noitu/tests/test_user_names.py
+import asyncio
+import types
+
+from Noitu.user_names import UserNameCache
+
+
+class _FakeBot:
+    """Gateway cache rỗng; fetch_user đếm số lời gọi REST."""
+
+    def __init__(self):
+        self.fetches = 0
+
+    def get_user(self, user_id):
+        return None
+
+    async def fetch_user(self, user_id):
+        self.fetches += 1
+        await asyncio.sleep(0.01)
+        return types.SimpleNamespace(id=user_id, display_name=f"u{user_id}")
+
+
+def test_gateway_member_is_used_without_rest():
+    async def scenario():
+        bot = _FakeBot()
+        names = UserNameCache(bot)
+        member = types.SimpleNamespace(id=7, display_name="member")
+        guild = types.SimpleNamespace(get_member=lambda user_id: member if user_id == 7 else None)
+        assert await names.fetch(7, guild) is member
+        assert bot.fetches == 0 and names.gateway_hits == 1
+
+    asyncio.run(scenario())
+
+
+def test_remembered_author_is_served_from_cache():
+    async def scenario():
+        bot = _FakeBot()
+        names = UserNameCache(bot)
+        author = types.SimpleNamespace(id=8, display_name="author")
+        names.remember(author)
+        assert await names.fetch(8) is author
+        assert bot.fetches == 0
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_misses_share_one_rest_fetch_then_hit_cache():
+    async def scenario():
+        bot = _FakeBot()
+        names = UserNameCache(bot)
+        users = await asyncio.gather(*(names.fetch(9) for _ in range(5)))
+        assert bot.fetches == 1 and all(user is users[0] for user in users)
+        assert (await names.fetch(9)) is users[0] and bot.fetches == 1
+
+    asyncio.run(scenario())
+
+
+def test_expired_entry_is_fetched_again():
+    async def scenario():
+        bot = _FakeBot()
+        names = UserNameCache(bot, ttl_seconds=-1)
+        names.remember(types.SimpleNamespace(id=10, display_name="old"))
+        assert names.get(10) is None
+        await names.fetch(10)
+        assert bot.fetches == 1
+
+    asyncio.run(scenario())
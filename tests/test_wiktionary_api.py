@@ -0,0 +1,172 @@
+# Noitu/tests/test_wiktionary_api.py
+# WiktionaryClient chạy với server MediaWiki giả lập (aiohttp.web) trên localhost.
+import asyncio
+
+from aiohttp import web
+
+from Noitu.wiktionary_api import CircuitBreaker, WiktionaryClient
+
+EXISTING_TITLES = {"con mèo", "mèo con"}
+
+
+class StubWiktionary:
+    """action=query giả: `statuses` là các status trả về lần lượt trước khi trả 200; `delay` giây chờ trước khi trả lời."""
+
+    def __init__(self, statuses=(), delay: float = 0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.requests: list[list[str]] = []
+        self.runner: web.AppRunner | None = None
+        self.url = ""
+
+    async def handle(self, request: web.Request) -> web.Response:
+        titles = request.query["titles"].split("|")
+        self.requests.append(titles)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.statuses:
+            return web.Response(status=self.statuses.pop(0))
+        pages = [{"title": t} if t in EXISTING_TITLES else {"title": t, "missing": True} for t in titles]
+        return web.json_response({"query": {"pages": pages}})
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/w/api.php", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self.runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}/w/api.php"
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.runner.cleanup()
+
+
+def _client(stub: StubWiktionary, **kwargs) -> WiktionaryClient:
+    kwargs.setdefault("retry_base_delay", 0.001)
+    client = WiktionaryClient(api_urls={"VN": stub.url}, batch_windows={"VN": 0.02}, **kwargs)
+    client.start()
+    return client
+
+
+def test_titles_in_one_window_share_one_request():
+    async def scenario():
+        async with StubWiktionary() as stub:
+            client = _client(stub)
+            try:
+                results = await asyncio.gather(*(client.check_title("VN", t) for t in ("con mèo", "mèo con", "mèo mả")))
+            finally:
+                await client.close()
+            return results, stub.requests
+
+    results, requests = asyncio.run(scenario())
+    assert results == [True, True, False]
+    assert len(requests) == 1
+    assert sorted(requests[0]) == ["con mèo", "mèo con", "mèo mả"]
+
+
+def test_retries_429_and_5xx_then_succeeds():
+    async def scenario():
+        async with StubWiktionary(statuses=[429, 503]) as stub:
+            client = _client(stub, retries=2)
+            try:
+                result = await client.check_title("VN", "con mèo")
+            finally:
+                await client.close()
+            return result, len(stub.requests), client.retried
+
+    result, request_count, retried = asyncio.run(scenario())
+    assert result is True
+    assert request_count == 3
+    assert retried == 2
+
+
+def test_non_retryable_status_fails_without_retry():
+    async def scenario():
+        async with StubWiktionary(statuses=[404]) as stub:
+            client = _client(stub, retries=2)
+            try:
+                result = await client.check_title("VN", "con mèo")
+            finally:
+                await client.close()
+            return result, len(stub.requests)
+
+    assert asyncio.run(scenario()) == (None, 1)
+
+
+def test_breaker_opens_then_recovers_through_half_open():
+    async def scenario():
+        async with StubWiktionary(statuses=[500, 500]) as stub:
+            client = _client(stub, retries=0)
+            client.breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+            try:
+                assert await client.check_title("VN", "con mèo") is None
+                assert client.breaker.state == CircuitBreaker.CLOSED
+                assert await client.check_title("VN", "con mèo") is None
+                assert client.breaker.state == CircuitBreaker.OPEN
+                assert not client.available
+
+                # Mạch mở: ko gửi request nào
+                assert await client.check_title("VN", "con mèo") is None
+                assert len(stub.requests) == 2
+                assert client.breaker.rejected == 1
+
+                # Hết thời gian chờ: 1 request thử (half-open) thành công -> đóng mạch
+                await asyncio.sleep(0.06)
+                assert await client.check_title("VN", "con mèo") is True
+                assert client.breaker.state == CircuitBreaker.CLOSED
+                assert len(stub.requests) == 3
+            finally:
+                await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_half_open_probe_reopens_breaker():
+    async def scenario():
+        async with StubWiktionary(statuses=[500, 500, 500]) as stub:
+            client = _client(stub, retries=0)
+            client.breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+            try:
+                for _ in range(2):
+                    await client.check_title("VN", "con mèo")
+                await asyncio.sleep(0.06)
+                assert await client.check_title("VN", "con mèo") is None
+                assert client.breaker.state == CircuitBreaker.OPEN
+                assert client.breaker.times_opened == 2
+            finally:
+                await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_half_open_probe_does_not_leave_breaker_stuck():
+    async def scenario():
+        async with StubWiktionary(statuses=[500, 500]) as stub:
+            client = _client(stub, retries=0)
+            client.breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+            try:
+                for _ in range(2):
+                    await client.check_title("VN", "con mèo")
+                await asyncio.sleep(0.06)
+
+                # Request thử bị hủy giữa chừng (vd. lúc tắt bot) -> tính là lỗi, mạch mở lại
+                stub.delay = 1
+                probe = asyncio.create_task(client.query_titles("VN", ["con mèo"]))
+                await asyncio.sleep(0.02)
+                assert client.breaker.state == CircuitBreaker.HALF_OPEN
+                probe.cancel()
+                await asyncio.gather(probe, return_exceptions=True)
+                assert client.breaker.state == CircuitBreaker.OPEN
+
+                # Hết thời gian chờ: request thử tiếp theo vẫn được gửi và đóng mạch
+                stub.delay = 0
+                await asyncio.sleep(0.06)
+                assert await client.check_title("VN", "con mèo") is True
+                assert client.breaker.state == CircuitBreaker.CLOSED
+            finally:
+                await client.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,77 @@
+# Noitu/tests/test_wiktionary_cache.py
+import asyncio
+import contextlib
+import time
+
+from Noitu.wiktionary_cache import WiktionaryCache
+
+
+class _FakePool:
+    """Bảng wiktionary_cache giả trong bộ nhớ; đếm số truy vấn đọc."""
+
+    def __init__(self, rows=None):
+        self.rows = dict(rows or {}) # term -> (is_valid, expires_at)
+        self.reads = 0
+        self.hit_flushes = []
+        self.fail = False
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        if self.fail:
+            raise ConnectionError("db down")
+        yield self
+
+    async def fetchrow(self, sql, game_language, term):
+        self.reads += 1
+        if term not in self.rows:
+            return None
+        is_valid, expires_at = self.rows[term]
+        return {"is_valid": is_valid, "expires_at": expires_at}
+
+    async def fetchval(self, sql, game_language, term, is_valid, ttl_seconds):
+        self.rows[term] = (is_valid, time.time() + ttl_seconds)
+
+    async def execute(self, sql, game_language, terms, hits):
+        self.hit_flushes.append(dict(zip(terms, hits)))
+
+
+def test_database_hit_is_promoted_to_memory():
+    async def scenario():
+        pool = _FakePool({"con mèo": (True, time.time() + 60)})
+        cache = WiktionaryCache(pool, "vn")
+        assert await cache.get("con mèo") is True
+        assert await cache.get("con mèo") is True
+        assert pool.reads == 1 and cache.db_hits == 1
+        assert await cache.get("mèo mả") is None
+        assert cache.db_misses == 1
+
+    asyncio.run(scenario())
+
+
+def test_set_writes_through_with_verdict_specific_ttl():
+    async def scenario():
+        pool = _FakePool()
+        cache = WiktionaryCache(pool, "VN", positive_ttl_seconds=1000, negative_ttl_seconds=10)
+        await cache.set("con mèo", True)
+        await cache.set("mèo mả", False)
+        assert pool.rows["con mèo"][1] - time.time() > 900
+        assert pool.rows["mèo mả"][1] - time.time() < 20
+        assert await cache.get("mèo mả") is False and pool.reads == 0 # Đọc từ RAM
+
+    asyncio.run(scenario())
+
+
+def test_hit_counts_are_batched_and_kept_after_failed_flush():
+    async def scenario():
+        pool = _FakePool({"con mèo": (True, time.time() + 60)})
+        cache = WiktionaryCache(pool, "VN")
+        for _ in range(3):
+            await cache.get("con mèo")
+        pool.fail = True
+        await cache.flush_hits()
+        assert pool.hit_flushes == [] and cache.stats()["pending_hits"] == 1
+        pool.fail = False
+        await cache.flush_hits()
+        assert pool.hit_flushes == [{"con mèo": 3}]
+
+    asyncio.run(scenario())
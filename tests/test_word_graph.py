@@ -0,0 +1,56 @@
+# Noitu/tests/test_word_graph.py
+from Noitu import dict_snapshot, lexicon
+from Noitu.dict_snapshot import Snapshot, pack_snapshot
+from Noitu.game import word_graph
+from Noitu.game.state import UsedWords
+from Noitu.lexicon import VietnameseLexicon
+
+# gà: ko có từ nối -> thua; con: "con gà" đẩy đối thủ vào thế thua -> thắng; cá <-> mè: vòng lặp -> hòa
+WORDS = ["con gà", "con cá", "cá mè", "mè cá"]
+
+
+def _graph(lines=WORDS):
+    lexicon_obj = VietnameseLexicon(Snapshot(pack_snapshot(VietnameseLexicon.compile_rows(lines))))
+    return word_graph.WordGraph(Snapshot(pack_snapshot(word_graph.analyze(lexicon_obj))), lexicon_obj), lexicon_obj
+
+
+def _vn_lexicon_file(tmp_path, lines):
+    source_path = tmp_path / "directory-vn.txt"
+    source_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return lexicon.open_lexicon(VietnameseLexicon, str(source_path))
+
+
+def test_missing_or_stale_graph_is_not_rebuilt_at_load(tmp_path):
+    lexicon_obj = _vn_lexicon_file(tmp_path, ["con mèo", "mèo con"])
+    graph_path = word_graph.graph_path_for(lexicon_obj.snapshot.path)
+    assert word_graph.load_word_graph(lexicon_obj) is None
+    assert not (tmp_path / "directory-vn.graph").exists()
+
+    dict_snapshot.build_snapshot(lexicon_obj.snapshot.path, graph_path, word_graph._graph_kind(lexicon_obj),
+                                 lambda _path: word_graph.analyze(lexicon_obj))
+    graph = word_graph.load_word_graph(lexicon_obj)
+    assert graph is not None and len(graph) == len(lexicon_obj.next_index)
+
+    # Từ điển đổi -> snapshot từ điển được biên dịch lại -> bảng cũ ko được dùng
+    lexicon_obj = _vn_lexicon_file(tmp_path, ["con mèo", "mèo con", "con chó"])
+    assert word_graph.load_word_graph(lexicon_obj) is None
+
+
+def test_retrograde_analysis_classifies_win_loss_and_draw():
+    graph, lexicon_obj = _graph()
+    status = {key: graph.status(lexicon_obj.next_index.slot(key)) for key in ("gà", "con", "cá", "mè")}
+    assert status == {"gà": word_graph.LOSS, "con": word_graph.WIN, "cá": word_graph.DRAW, "mè": word_graph.DRAW}
+    assert graph.out_degree(lexicon_obj.next_index.slot("con")) == 2
+
+
+def test_choose_move_prefers_winning_moves_and_skips_used_ids():
+    graph, lexicon_obj = _graph()
+    used_words = UsedWords(lexicon_obj)
+    assert lexicon_obj.word(graph.choose_move("con", "hard", used_words)) == "con gà"
+    used_words.add("con gà")
+    for difficulty in word_graph.DIFFICULTIES:
+        assert lexicon_obj.word(graph.choose_move("con", difficulty, used_words)) == "con cá"
+    used_words.add("con cá")
+    assert graph.choose_move("con", "easy", used_words) is None
+    assert graph.choose_move("gà", "hard", used_words) is None # Ko có nước đi
+    assert graph.choose_move("xyz", "hard", used_words) is None # Khóa ko có trong từ điển
@@ -0,0 +1,50 @@
+# Noitu/user_names.py
+# Tra user (tên, mention, avatar) mà ko tốn REST: cache gateway của discord.py -> cache TTL của bot
+# (được nạp từ tác giả các nước đi hợp lệ) -> bot.fetch_user (gộp các lời gọi đồng thời) khi cùng đường.
+import time
+
+import discord
+from discord.ext import commands
+
+from . import config as bot_cfg
+from .caches import LRUCache, SingleFlight
+
+
+class UserNameCache:
+    def __init__(self, bot: commands.Bot, max_entries: int = bot_cfg.USER_NAME_CACHE_SIZE,
+                 ttl_seconds: float = bot_cfg.USER_NAME_CACHE_SECONDS):
+        self.bot = bot
+        self.ttl_seconds = ttl_seconds # Tên/avatar có thể đổi: hết hạn thì lấy lại
+        self._cache = LRUCache(max_entries)
+        self._inflight = SingleFlight()
+        self.gateway_hits = 0
+        self.rest_fetches = 0
+
+    def remember(self, user: discord.abc.User) -> None:
+        """Ghi nhớ user vừa thấy qua gateway (vd. tác giả message), ko tốn request nào."""
+        self._cache.put(user.id, user, time.time() + self.ttl_seconds)
+
+    def get(self, user_id: int, guild: discord.Guild | None = None) -> discord.abc.User | None:
+        """Chỉ tra cache, ko gọi API."""
+        user = (guild.get_member(user_id) if guild else None) or self.bot.get_user(user_id)
+        if user is not None:
+            self.gateway_hits += 1
+            return user
+        return self._cache.get(user_id)
+
+    async def fetch(self, user_id: int, guild: discord.Guild | None = None) -> discord.abc.User:
+        """Như bot.fetch_user (cùng lỗi discord.NotFound/HTTPException) nhưng tra cache trước."""
+        user = self.get(user_id, guild)
+        if user is None:
+            user = await self._inflight.run(user_id, lambda: self._fetch_rest(user_id))
+        return user
+
+    async def _fetch_rest(self, user_id: int) -> discord.User:
+        self.rest_fetches += 1
+        user = await self.bot.fetch_user(user_id)
+        self.remember(user)
+        return user
+
+    def stats(self) -> dict:
+        return {"gateway_hits": self.gateway_hits, "rest_fetches": self.rest_fetches,
+                "cache": self._cache.stats(), "inflight": self._inflight.stats()}
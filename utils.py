@@ -2,24 +2,49 @@
 import discord
 from discord.ext import commands
 from discord.ui import View 
+import asyncio
 import random
+import re
 
 from . import database
 from . import config as bot_cfg 
 from . import wiktionary_api 
+from . import lexicon
 
 def get_words_from_input(phrase_input: str) -> list[str]: # Dùng cho VN
     return [word.strip().lower() for word in phrase_input.strip().split() if word.strip()]
 
-def get_last_hiragana_char(hira_string: str) -> str | None:
+# Kiểm tra nhanh (đồng bộ, ko DB) để bỏ qua tin nhắn chắc chắn ko phải nước đi
+_JP_MOVE_PATTERN = re.compile(r"(?:[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff々〆ー]+|[A-Za-z']+)")
+
+def looks_like_vn_move(content: str) -> bool:
+    return len(content.split()) == 2
+
+def looks_like_jp_move(content: str) -> bool:
+    """1 từ viết bằng Kana/Kanji, hoặc Romaji."""
+    stripped = content.strip()
+    return 0 < len(stripped) <= bot_cfg.JP_MAX_WORD_LENGTH and _JP_MOVE_PATTERN.fullmatch(stripped) is not None
+
+def may_be_command(bot: commands.Bot, message: discord.Message) -> bool:
+    """Tin nhắn có thể là lệnh prefix ko (mention bot hoặc prefix của guild, đọc từ cache config)."""
+    content = message.content
+    if bot.user and (content.startswith(f"<@{bot.user.id}>") or content.startswith(f"<@!{bot.user.id}>")):
+        return True
+    guild_cfg_data = database.get_cached_guild_config(message.guild.id)
+    if guild_cfg_data is None: # Chưa có trong cache: để get_context quyết định
+        return True
+    return content.startswith(guild_cfg_data.get("command_prefix") or bot_cfg.DEFAULT_COMMAND_PREFIX)
+
+def get_last_hiragana_char(hira_string: str, dictionary: lexicon.JapaneseLexicon | None = None) -> str | None:
+    """Mora cuối (khóa nối) của từ JP. Có `dictionary` thì đọc giá trị tính sẵn lúc biên dịch."""
     if not hira_string:
         return None
-    return hira_string[-1]
+    return dictionary.last_mora(hira_string) if dictionary else lexicon.last_mora(hira_string)
 
-def get_first_hiragana_char(hira_string: str) -> str | None:
+def get_first_hiragana_char(hira_string: str, dictionary: lexicon.JapaneseLexicon | None = None) -> str | None:
     if not hira_string:
         return None
-    return hira_string[0]
+    return dictionary.first_mora(hira_string) if dictionary else lexicon.first_mora(hira_string)
 
 async def get_channel_game_settings(bot: commands.Bot, guild_id: int, channel_id: int): # Nhận bot instance và channel_id
     """Lấy cài đặt game của guild và xác định ngôn ngữ cho kênh cụ thể."""
@@ -43,6 +68,17 @@ async def get_channel_game_settings(bot: commands.Bot, guild_id: int, channel_id
 
     return timeout, min_players, game_lang_for_channel # Trả về game_lang_for_channel (có thể là None)
 
+async def wait_for_language_resources(bot: commands.Bot, timeout: float = 30.0) -> bool:
+    """Chờ từ điển + kakasi tải xong (tải nền lúc khởi động). Trả về False nếu quá thời gian chờ."""
+    ready_event: asyncio.Event = getattr(bot, "language_resources_ready", None)
+    if ready_event is None or ready_event.is_set():
+        return True
+    try:
+        await asyncio.wait_for(ready_event.wait(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
 
 async def _send_message_smart(target: discord.Interaction | commands.Context, content=None, embed=None, view=None, ephemeral=False, delete_after=None):
     """Gửi tin nhắn thông minh dựa trên context hoặc interaction."""
@@ -162,6 +198,9 @@ async def generate_help_embed(bot: commands.Bot, guild: discord.Guild, current_p
     embed.add_field(name=f"{bot_cfg.GAME_START_ICON} Bắt đầu game", 
                     value=f"{start_game_help_specific}\nNếu không nhập từ, bot sẽ tự chọn từ ngẫu nhiên.\nNút 'Bắt Đầu Nhanh' bên dưới cũng sẽ để bot chọn từ.", 
                     inline=False)
+    embed.add_field(name="🤖 Đấu với Bot", 
+                    value=f"`/vsbot [độ khó]` hoặc `{current_prefix}vsbot [easy|medium|hard]`: Bot ra từ ngay sau mỗi lượt của bạn.", 
+                    inline=False)
     embed.add_field(name=f"{bot_cfg.STOP_ICON} Dừng game", value=f"`/stop` hoặc `{current_prefix}stop`.", inline=False)
     embed.add_field(name=f"{bot_cfg.LEADERBOARD_ICON} Bảng xếp hạng", value=f"`/bxh` hoặc `{current_prefix}bxh` (hiển thị BXH cho ngôn ngữ của kênh này).", inline=False)
     
@@ -187,42 +226,11 @@ async def generate_help_embed(bot: commands.Bot, guild: discord.Guild, current_p
     return embed, None
 
 
-async def generate_leaderboard_embed(bot: commands.Bot, guild: discord.Guild, game_language: str):
-    """Tạo embed bảng xếp hạng. Trả về (embed, error_message_str)."""
-    if not bot.db_pool:
-        return None, "Lỗi: DB chưa sẵn sàng."
-    if not guild:
-        return None, "Lỗi: Không thể xác định server."
-    if game_language not in ["VN", "JP"]:
-        return None, "Lỗi: Ngôn ngữ không hợp lệ cho bảng xếp hạng."
-
-    game_lang_name = f"{bot_cfg.GAME_VN_ICON} Tiếng Việt" if game_language == "VN" else f"{bot_cfg.GAME_JP_ICON} Tiếng Nhật (しりとり)"
-    async with bot.db_pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT name, wins, correct_moves, wrong_word_link, invalid_wiktionary, used_word_error, wrong_turn, 
-                   lost_by_n_ending, current_win_streak, max_win_streak
-            FROM leaderboard_stats 
-            WHERE guild_id = $1 AND game_language = $2
-            ORDER BY wins DESC, correct_moves DESC, max_win_streak DESC, current_win_streak DESC,
-                     (wrong_word_link + invalid_wiktionary + used_word_error + wrong_turn + lost_by_n_ending) ASC, 
-                     name ASC
-            LIMIT 10;
-            """, guild.id, game_language
-        )
-
-    guild_name_escaped = discord.utils.escape_markdown(guild.name)
-    if not rows:
-        return None, f"Chưa có ai trên BXH Nối Từ ({game_lang_name}) của server **{guild_name_escaped}**!"
-
-    embed = discord.Embed(title=f"{bot_cfg.LEADERBOARD_ICON} BXH Nối Từ ({game_lang_name})", color=bot_cfg.EMBED_COLOR_LEADERBOARD)
-    if guild.icon:
-        embed.set_thumbnail(url=guild.icon.url)
-    
+def render_leaderboard_entries(rows: list[dict], game_language: str) -> str:
+    """Nội dung embed BXH từ các dòng top-N (đã sắp xếp). Kết quả được leaderboard.Leaderboard cache lại."""
     desc_parts = []
     emojis = ["🥇", "🥈", "🥉"] 
-    for i, s_dict in enumerate(rows):
-        s = dict(s_dict) 
+    for i, s in enumerate(rows):
         rank_display = emojis[i] if i < len(emojis) else f"**{i+1}.**"
         
         player_name_escaped = discord.utils.escape_markdown(s['name'])
@@ -241,8 +249,38 @@ async def generate_leaderboard_embed(bot: commands.Bot, guild: discord.Guild, ga
             f"   ⚠️ Lỗi (tổng): `{total_errors}` | ⏰ Sai lượt: `{s['wrong_turn']}`"
         )
         desc_parts.append(player_entry)
+    return "\n\n".join(desc_parts) # Thêm khoảng cách giữa các entry
+
+async def generate_leaderboard_embed(bot: commands.Bot, guild: discord.Guild, game_language: str, user_id: int | None = None):
+    """Tạo embed bảng xếp hạng (kèm hạng của `user_id` nếu có). Trả về (embed, error_message_str)."""
+    if not bot.db_pool:
+        return None, "Lỗi: DB chưa sẵn sàng."
+    if not guild:
+        return None, "Lỗi: Không thể xác định server."
+    if game_language not in ["VN", "JP"]:
+        return None, "Lỗi: Ngôn ngữ không hợp lệ cho bảng xếp hạng."
 
-    embed.description = "\n\n".join(desc_parts) # Thêm khoảng cách giữa các entry
+    game_lang_name = f"{bot_cfg.GAME_VN_ICON} Tiếng Việt" if game_language == "VN" else f"{bot_cfg.GAME_JP_ICON} Tiếng Nhật (しりとり)"
+    # Ko flush cả bộ đệm ở đây: top-N dựa vào chu kỳ ghi dồn + TTL của cache để ko cũ quá lâu
+    description = await bot.leaderboard.top(guild.id, game_language)
+
+    guild_name_escaped = discord.utils.escape_markdown(guild.name)
+    if not description:
+        return None, f"Chưa có ai trên BXH Nối Từ ({game_lang_name}) của server **{guild_name_escaped}**!"
+
+    embed = discord.Embed(title=f"{bot_cfg.LEADERBOARD_ICON} BXH Nối Từ ({game_lang_name})", color=bot_cfg.EMBED_COLOR_LEADERBOARD)
+    if guild.icon:
+        embed.set_thumbnail(url=guild.icon.url)
+    embed.description = description
+    if user_id is not None: # Hạng của người xem, kể cả khi ngoài top
+        await bot.stats_buffer.flush_user(user_id, guild.id, game_language) # Hạng tính cả nước đi chưa kịp ghi dồn
+        own = await bot.leaderboard.rank(user_id, guild.id, game_language)
+        if own:
+            embed.add_field(
+                name="📍 Hạng của bạn",
+                value=f"**#{own['rank']}** | 🏅 Thắng: `{own['wins']}` | ✅ Lượt đúng: `{own['correct_moves']}`",
+                inline=False
+            )
     embed.set_footer(text=f"Server: {guild.name} | Sắp xếp: Thắng > Lượt đúng > Chuỗi max > ...")
     return embed, None
 
@@ -1,7 +1,230 @@
 # Noitu/wiktionary_api.py
 import aiohttp
+import asyncio
+import itertools
+import random
+import time
 import traceback
 from . import config as bot_cfg
+from .lexicon import JapaneseLexicon, VietnameseLexicon
+from .wiktionary_cache import WiktionaryCache
+from .caches import SingleFlight
+
+# Các lượt tra đồng thời cùng 1 từ (đã chuẩn hóa) chỉ gửi 1 request, chờ chung 1 kết quả
+vn_lookups = SingleFlight()
+jp_lookups = SingleFlight()
+
+
+class CircuitBreaker:
+    """Mở mạch sau `failure_threshold` lỗi liên tiếp; sau `reset_seconds` cho 1 request thử (half-open)."""
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = bot_cfg.WIKTIONARY_BREAKER_FAILURES,
+                 reset_seconds: float = bot_cfg.WIKTIONARY_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow_request(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        # Request thử ko có kết quả sau reset_seconds (ko nên xảy ra) cũng được coi như lỗi: cho thử lại
+        if self.state != self.CLOSED and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = self.HALF_OPEN # Cho đúng 1 request thử
+            self.opened_at = time.monotonic()
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            print("Wiktionary hoạt động lại, tắt chế độ chỉ dùng từ điển local.")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                print(f"Wiktionary lỗi liên tục, chỉ dùng từ điển local trong {self.reset_seconds}s.")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class TitleBatcher:
+    """Gom các title cần tra trong 1 cửa sổ ngắn thành 1 request action=query&titles=a|b|c."""
+
+    def __init__(self, client: "WiktionaryClient", game_language: str, window_seconds: float,
+                 max_titles: int = bot_cfg.WIKTIONARY_BATCH_MAX_TITLES):
+        self.client = client
+        self.game_language = game_language
+        self.window_seconds = window_seconds
+        self.max_titles = max_titles # MediaWiki giới hạn 50 title/request với user thường
+        self._pending: dict[str, asyncio.Future] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._send_tasks: set[asyncio.Task] = set()
+        self.requests = 0
+        self.titles = 0
+
+    async def query(self, title: str) -> bool | None:
+        """True/False = trang có/ko tồn tại; None = lỗi tạm thời (HTTP/mạng/mạch đang mở)."""
+        if "|" in title: # Ký tự phân tách của titles, ko thể là title hợp lệ
+            return False
+        future = self._pending.get(title)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[title] = future
+            if len(self._pending) >= self.max_titles:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.window_seconds, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        while self._pending:
+            batch = dict(itertools.islice(self._pending.items(), self.max_titles))
+            for title in batch:
+                del self._pending[title]
+            task = asyncio.create_task(self._send(batch))
+            self._send_tasks.add(task)
+            task.add_done_callback(self._send_tasks.discard)
+
+    async def _send(self, batch: dict[str, asyncio.Future]) -> None:
+        self.requests += 1
+        self.titles += len(batch)
+        try:
+            query = await self.client.query_titles(self.game_language, list(batch))
+        except Exception as e:
+            print(f"Lỗi ko xđ khi tra Wiktionary {self.game_language}: {e}")
+            traceback.print_exc()
+            query = None
+        if query is None:
+            for future in batch.values():
+                if not future.done():
+                    future.set_result(None)
+            return
+
+        resolved_titles = {title: title for title in batch}
+        # API trả về title đã chuẩn hóa (vd. viết hoa chữ đầu) / đích redirect -> dò theo chuỗi from->to
+        for mapping_key in ("normalized", "redirects"):
+            renames = {item.get("from"): item.get("to") for item in query.get(mapping_key, [])}
+            for title, current in resolved_titles.items():
+                resolved_titles[title] = renames.get(current, current)
+        pages = {page.get("title"): page for page in query.get("pages", [])}
+        for title, future in batch.items():
+            page_info = pages.get(resolved_titles[title])
+            is_valid = page_info is not None and "missing" not in page_info and "invalid" not in page_info
+            if not future.done():
+                future.set_result(is_valid)
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "titles_sent": self.titles,
+                "titles_per_request": round(self.titles / self.requests, 2) if self.requests else 0.0}
+
+
+class WiktionaryClient:
+    """HTTP client riêng cho Wiktionary: pool kết nối giới hạn, timeout từng request, retry có jitter,
+    circuit breaker. `api_urls` thay được (vd. trỏ tới server giả lập MediaWiki khi test)."""
+    _RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, api_urls: dict[str, str] | None = None,
+                 max_concurrency: int = bot_cfg.WIKTIONARY_MAX_CONCURRENCY,
+                 request_timeout: float = bot_cfg.WIKTIONARY_REQUEST_TIMEOUT,
+                 retries: int = bot_cfg.WIKTIONARY_RETRIES,
+                 retry_base_delay: float = bot_cfg.WIKTIONARY_RETRY_BASE_DELAY,
+                 batch_windows: dict[str, float] | None = None):
+        self.api_urls = api_urls or {"VN": bot_cfg.VIETNAMESE_WIKTIONARY_API_URL, "JP": bot_cfg.JAPANESE_WIKTIONARY_API_URL}
+        self.max_concurrency = max_concurrency
+        self.request_timeout = request_timeout
+        self.retries = retries
+        self.retry_base_delay = retry_base_delay
+        self.breaker = CircuitBreaker()
+        self._session: aiohttp.ClientSession | None = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        batch_windows = batch_windows or {"VN": bot_cfg.WIKTIONARY_BATCH_WINDOW_VN, "JP": bot_cfg.WIKTIONARY_BATCH_WINDOW_JP}
+        self.batchers = {lang: TitleBatcher(self, lang, batch_windows.get(lang, 0.05)) for lang in self.api_urls}
+        self.retried = 0
+        self.failures = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._session is None or self._session.closed
+
+    @property
+    def available(self) -> bool:
+        """False khi mạch đang mở: chỉ từ trong từ điển local được chấp nhận."""
+        return self.breaker.state != CircuitBreaker.OPEN
+
+    def start(self) -> None:
+        """Tạo session (phải gọi trong event loop, vd. setup_hook)."""
+        if not self.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrency, limit_per_host=self.max_concurrency,
+            ttl_dns_cache=bot_cfg.WIKTIONARY_DNS_CACHE_SECONDS, keepalive_timeout=bot_cfg.WIKTIONARY_KEEPALIVE_SECONDS
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout, connect=min(self.request_timeout, 3)),
+            headers={"User-Agent": bot_cfg.WIKTIONARY_USER_AGENT},
+        )
+
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    async def check_title(self, game_language: str, title: str) -> bool | None:
+        return await self.batchers[game_language].query(title)
+
+    async def query_titles(self, game_language: str, titles: list[str]) -> dict | None:
+        """Gọi action=query cho nhiều title, trả về phần "query" của response; None nếu lỗi/mạch mở."""
+        if self.closed or not self.breaker.allow_request():
+            return None
+        # redirects=1: API trả về trang đích kèm mapping "redirects" (TitleBatcher dò theo mapping đó)
+        params = {"action": "query", "titles": "|".join(titles), "redirects": 1, "format": "json", "formatversion": 2}
+        api_url = self.api_urls[game_language]
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    self.retried += 1
+                    # Full jitter: tránh các shard cùng retry 1 lúc
+                    await asyncio.sleep(random.uniform(0, self.retry_base_delay * 2 ** (attempt - 1)))
+                try:
+                    async with self._semaphore:
+                        async with self._session.get(api_url, params=params) as response:
+                            if response.status == 200:
+                                data = await response.json()
+                                if not isinstance(data, dict):
+                                    raise ValueError(f"JSON ko phải object: {type(data).__name__}")
+                                self.breaker.record_success()
+                                return data.get("query", {})
+                            print(f"Lỗi API Wiktionary {game_language}: Status {response.status} cho {len(titles)} title")
+                            if response.status not in self._RETRYABLE_STATUSES:
+                                break
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    print(f"Lỗi gọi API Wiktionary {game_language} (lần {attempt + 1}): {e!r}")
+        except BaseException:
+            # Bị hủy (vd. lúc tắt bot) hoặc lỗi ko lường trước: vẫn phải ghi nhận, ko thì request thử
+            # của trạng thái half-open ko bao giờ có kết quả và mạch kẹt ở đó mãi
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        self.failures += 1
+        self.breaker.record_failure()
+        return None
+
+    def stats(self) -> dict:
+        return {"breaker": self.breaker.state, "breaker_opened": self.breaker.times_opened,
+                "breaker_rejected": self.breaker.rejected, "retried": self.retried, "failures": self.failures,
+                **{f"batch_{lang}": batcher.stats() for lang, batcher in self.batchers.items()}}
 
 # Hàm chuyển đổi input sang Hiragana, trả về None nếu kakasi không có hoặc lỗi
 def to_hiragana(text: str, kakasi_converter_instance) -> str | None: # Đổi tên tham số cho rõ ràng
@@ -18,11 +241,24 @@ def to_hiragana(text: str, kakasi_converter_instance) -> str | None: # Đổi t
         traceback.print_exc()
         return None
 
+async def _lookup_wiktionary(term: str, client: WiktionaryClient, cache: WiktionaryCache, game_language: str) -> bool:
+    # Check API cache (từ đã tra Wiktionary trước đó: RAM rồi tới DB)
+    cached_verdict = await cache.get(term)
+    if cached_verdict is not None:
+        return cached_verdict
+
+    # Gọi API Wiktionary nếu ko có trong cache và local (gom chung request với các từ khác)
+    is_valid = await client.check_title(game_language, term)
+    if is_valid is None: # Lỗi tạm thời / Wiktionary đang bị ngắt mạch: chỉ dựa vào từ điển local, ko cache
+        return False
+    await cache.set(term, is_valid)
+    return is_valid
+
 async def is_vietnamese_phrase_or_word_valid_api(
     text: str,
-    session: aiohttp.ClientSession,
-    cache: dict, # bot.wiktionary_cache_vn
-    local_dictionary_vn: set # bot.local_dictionary_vn
+    client: WiktionaryClient, # bot.wiktionary_client
+    cache: WiktionaryCache, # bot.wiktionary_cache_vn
+    local_dictionary_vn: VietnameseLexicon # bot.local_dictionary_vn
 ) -> bool:
     if not text: return False
     text_lower = text.lower().strip()
@@ -31,96 +267,46 @@ async def is_vietnamese_phrase_or_word_valid_api(
 
     # 1. Check local dictionary VN
     if text_lower in local_dictionary_vn:
-        # Không cần cache cho local dict vì nó đã là set O(1) lookup
+        # Không cần cache cho local dict vì nó đã là lookup trên snapshot
         return True
 
-    # 2. Check API cache (từ đã tra Wiktionary VN trước đó)
-    if text_lower in cache:
-        return cache[text_lower]
-
-    # 3. Gọi API Wiktionary VN nếu ko có trong cache và local
-    params = {"action": "query", "titles": text_lower, "format": "json", "formatversion": 2}
-    try:
-        async with session.get(bot_cfg.VIETNAMESE_WIKTIONARY_API_URL, params=params) as response:
-            if response.status == 200:
-                data = await response.json()
-                pages = data.get("query", {}).get("pages", [])
-                if not pages:
-                    cache[text_lower] = False
-                    return False
-                page_info = pages[0]
-                is_valid = "missing" not in page_info and "invalid" not in page_info
-                cache[text_lower] = is_valid
-                return is_valid
-            else:
-                print(f"Lỗi API Wiktionary VN: Status {response.status} cho '{text_lower}'")
-                cache[text_lower] = False
-                return False
-    except Exception as e:
-        print(f"Lỗi gọi API Wiktionary VN cho '{text_lower}': {e}")
-        traceback.print_exc()
-        cache[text_lower] = False
-        return False
+    # 2. Cache rồi tới API Wiktionary VN (gộp các lượt tra trùng đang chạy)
+    return await vn_lookups.run(text_lower, lambda: _lookup_wiktionary(text_lower, client, cache, "VN"))
 
 async def is_japanese_word_valid_api(
     original_input: str, # Kanji, Hira, Kata, Roma
-    session: aiohttp.ClientSession,
-    cache: dict, # bot.wiktionary_cache_jp
-    local_dictionary_jp: list, # list of dicts
-    kakasi_converter # bot.kakasi
+    client: WiktionaryClient, # bot.wiktionary_client
+    cache: WiktionaryCache, # bot.wiktionary_cache_jp
+    local_dictionary_jp: JapaneseLexicon, # bot.local_dictionary_jp
+    kakasi_service # bot.kakasi_service (KakasiService hoặc None)
 ) -> tuple[bool, str | None]: # Trả về (is_valid, hiragana_form)
     if not original_input: return False, None
     
     input_stripped = original_input.strip()
-    if not input_stripped: return False, None
+    if not input_stripped or len(input_stripped) > bot_cfg.JP_MAX_WORD_LENGTH: return False, None
+
+    # 1. Check local dictionary JP trước (Kanji/Hira/Kata/Roma, O(1)), ko cần gọi kakasi
+    entry = local_dictionary_jp.lookup(input_stripped)
+    if entry:
+        return True, entry['hira'] # Trả về hiragana chuẩn từ dict
 
-    # 1. Cố gắng chuyển mọi input sang Hiragana để chuẩn hóa và tìm kiếm
-    hiragana_form = to_hiragana(input_stripped, kakasi_converter)
+    # 2. Chuyển input sang Hiragana để chuẩn hóa và tìm kiếm (thread pool + cache, ko chặn event loop)
+    hiragana_form = await kakasi_service.to_hiragana(input_stripped) if kakasi_service else None
     
     # Nếu không chuyển được sang hiragana (ví dụ kakasi lỗi hoặc input không phải JP),
     # và input có vẻ là Kanji/Kana, dùng input_stripped làm key.
     # Nếu input có vẻ là romaji và không chuyển được, có thể nó không hợp lệ.
     # Ưu tiên hiragana_form nếu có.
     search_key_hira = hiragana_form if hiragana_form else input_stripped 
-    
-    # 2. Check local dictionary JP
-    # So sánh input_stripped (Kanji/Kana/Roma) và search_key_hira (Hiragana) với các dạng trong local_dictionary_jp
-    for entry in local_dictionary_jp:
-        if (input_stripped == entry['kanji'] or
-            input_stripped == entry['hira'] or
-            (entry['roma'] and input_stripped.lower() == entry['roma'].lower()) or
-            (search_key_hira and search_key_hira == entry['hira'])):
-            return True, entry['hira'] # Trả về hiragana chuẩn từ dict
-
-    # 3. Check API cache (dùng search_key_hira vì Wiktionary JP thường dùng Hira/Kanji)
-    if search_key_hira in cache:
-        return cache[search_key_hira], hiragana_form if cache[search_key_hira] else None
-
-    # 4. Gọi API Wiktionary JP (dùng search_key_hira, hoặc original_input nếu hira form ko có)
-    # Wiktionary tiếng Nhật thường tìm tốt nhất bằng Kanji hoặc Hiragana.
-    # Nếu input ban đầu là Romaji và không có trong local dict, việc tra Wiktionary có thể khó.
-    # Ưu tiên tra bằng search_key_hira (đã cố gắng chuyển sang Hiragana)
-    wiktionary_query_term = search_key_hira if search_key_hira else input_stripped
-
-    params = {"action": "query", "titles": wiktionary_query_term, "format": "json", "formatversion": 2}
-    try:
-        async with session.get(bot_cfg.JAPANESE_WIKTIONARY_API_URL, params=params) as response:
-            if response.status == 200:
-                data = await response.json()
-                pages = data.get("query", {}).get("pages", [])
-                if not pages:
-                    cache[search_key_hira] = False # Cache với key đã chuẩn hóa
-                    return False, None
-                page_info = pages[0]
-                is_valid = "missing" not in page_info and "invalid" not in page_info
-                cache[search_key_hira] = is_valid
-                return is_valid, hiragana_form if is_valid else None
-            else:
-                print(f"Lỗi API Wiktionary JP: Status {response.status} cho '{wiktionary_query_term}'")
-                cache[search_key_hira] = False
-                return False, None
-    except Exception as e:
-        print(f"Lỗi gọi API Wiktionary JP cho '{wiktionary_query_term}': {e}")
-        traceback.print_exc()
-        cache[search_key_hira] = False
-        return False, None
\ No newline at end of file
+
+    entry = local_dictionary_jp.lookup_hiragana(search_key_hira)
+    if entry:
+        return True, entry['hira']
+
+    # 3. Cache rồi tới API Wiktionary JP (gộp các lượt tra trùng đang chạy).
+    # Wiktionary tiếng Nhật thường tìm tốt nhất bằng Kanji hoặc Hiragana -> tra bằng search_key_hira.
+    is_valid = await jp_lookups.run(search_key_hira, lambda: _lookup_wiktionary(search_key_hira, client, cache, "JP"))
+    return is_valid, hiragana_form if is_valid else None
+
+def lookup_stats() -> dict:
+    return {"VN": vn_lookups.stats(), "JP": jp_lookups.stats()}
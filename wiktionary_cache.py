@@ -0,0 +1,150 @@
+# Noitu/wiktionary_cache.py
+# Cache kết quả tra Wiktionary: tầng RAM (LRU) phía trước bảng wiktionary_cache trong Postgres.
+# Mọi process/shard dùng chung bảng -> restart/deploy ko phải tra lại Wiktionary từ đầu.
+import asyncio
+import time
+import traceback
+
+import asyncpg
+
+from . import config as bot_cfg
+from .caches import LRUCache
+
+_SELECT_SQL = """
+    SELECT is_valid, EXTRACT(EPOCH FROM checked_at) + ttl_seconds AS expires_at
+    FROM wiktionary_cache
+    WHERE game_language = $1 AND term = $2 AND checked_at + ttl_seconds * INTERVAL '1 second' > now()
+"""
+_UPSERT_SQL = """
+    INSERT INTO wiktionary_cache (game_language, term, is_valid, checked_at, ttl_seconds)
+    VALUES ($1, $2, $3, now(), $4)
+    ON CONFLICT (game_language, term) DO UPDATE
+    SET is_valid = EXCLUDED.is_valid, checked_at = EXCLUDED.checked_at, ttl_seconds = EXCLUDED.ttl_seconds
+    RETURNING EXTRACT(EPOCH FROM checked_at) + ttl_seconds AS expires_at
+"""
+_WARM_UP_SQL = """
+    SELECT term, is_valid, EXTRACT(EPOCH FROM checked_at) + ttl_seconds AS expires_at
+    FROM wiktionary_cache
+    WHERE game_language = $1 AND checked_at + ttl_seconds * INTERVAL '1 second' > now()
+    ORDER BY hit_count DESC
+    LIMIT $2
+"""
+_FLUSH_HITS_SQL = """
+    UPDATE wiktionary_cache AS c
+    SET hit_count = c.hit_count + h.hits
+    FROM unnest($2::text[], $3::int[]) AS h(term, hits)
+    WHERE c.game_language = $1 AND c.term = h.term
+"""
+_PURGE_SQL = "DELETE FROM wiktionary_cache WHERE checked_at + ttl_seconds * INTERVAL '1 second' <= now()"
+
+
+class WiktionaryCache:
+    """Kết quả tra Wiktionary (True/False) của 1 ngôn ngữ. db_pool=None thì chỉ dùng RAM."""
+
+    def __init__(self, db_pool: asyncpg.Pool | None, game_language: str,
+                 max_entries: int = bot_cfg.WIKTIONARY_CACHE_MEMORY_SIZE,
+                 max_bytes: int | None = bot_cfg.WIKTIONARY_CACHE_MEMORY_BYTES,
+                 positive_ttl_seconds: int = bot_cfg.WIKTIONARY_CACHE_POSITIVE_TTL_SECONDS,
+                 negative_ttl_seconds: int = bot_cfg.WIKTIONARY_CACHE_NEGATIVE_TTL_SECONDS):
+        self.db_pool = db_pool
+        self.game_language = game_language.upper()
+        self.positive_ttl_seconds = positive_ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds # Ngắn hơn: trang có thể được tạo sau
+        self._memory = LRUCache(max_entries, max_bytes) # term -> is_valid, hết hạn theo epoch
+        self._pending_hits: dict[str, int] = {} # Ghi dồn hit_count xuống DB theo lô
+        self.db_hits = 0
+        self.db_misses = 0
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _remember(self, term: str, is_valid: bool, expires_at: float) -> None:
+        self._memory.put(term, is_valid, expires_at)
+
+    def _count_hit(self, term: str) -> None:
+        if self.db_pool:
+            self._pending_hits[term] = self._pending_hits.get(term, 0) + 1
+
+    async def get(self, term: str) -> bool | None:
+        """Kết quả đã cache của `term`, hoặc None nếu chưa tra / đã hết hạn."""
+        cached = self._memory.get(term)
+        if cached is not None:
+            self._count_hit(term)
+            return cached
+
+        if not self.db_pool:
+            return None
+        try:
+            async with self.db_pool.acquire() as connection:
+                row = await connection.fetchrow(_SELECT_SQL, self.game_language, term)
+        except Exception as e:
+            print(f"Lỗi đọc Wiktionary cache ({self.game_language}) cho '{term}': {e}")
+            return None
+        if not row:
+            self.db_misses += 1
+            return None
+        self.db_hits += 1
+        self._remember(term, row["is_valid"], float(row["expires_at"]))
+        self._count_hit(term)
+        return row["is_valid"]
+
+    async def set(self, term: str, is_valid: bool) -> None:
+        """Chỉ gọi với kết quả chắc chắn từ Wiktionary; lỗi mạng/HTTP ko bao giờ được cache."""
+        ttl_seconds = self.positive_ttl_seconds if is_valid else self.negative_ttl_seconds
+        self._remember(term, is_valid, time.time() + ttl_seconds)
+        if not self.db_pool:
+            return
+        try:
+            async with self.db_pool.acquire() as connection:
+                await connection.fetchval(_UPSERT_SQL, self.game_language, term, is_valid, ttl_seconds)
+        except Exception as e:
+            print(f"Lỗi ghi Wiktionary cache ({self.game_language}) cho '{term}': {e}")
+
+    async def warm_up(self, limit: int = bot_cfg.WIKTIONARY_CACHE_WARMUP_LIMIT) -> int:
+        """Nạp trước các mục được tra nhiều nhất vào RAM. Trả về số mục đã nạp."""
+        if not self.db_pool:
+            return 0
+        try:
+            async with self.db_pool.acquire() as connection:
+                rows = await connection.fetch(_WARM_UP_SQL, self.game_language, min(limit, self._memory.max_entries))
+        except Exception as e:
+            print(f"Lỗi nạp trước Wiktionary cache ({self.game_language}): {e}")
+            return 0
+        for row in reversed(rows): # Mục nóng nhất nạp sau cùng -> nằm cuối LRU, bị đẩy ra sau cùng
+            self._remember(row["term"], row["is_valid"], float(row["expires_at"]))
+        return len(rows)
+
+    async def flush_hits(self) -> None:
+        if not self.db_pool or not self._pending_hits:
+            return
+        pending, self._pending_hits = self._pending_hits, {}
+        try:
+            async with self.db_pool.acquire() as connection:
+                await connection.execute(_FLUSH_HITS_SQL, self.game_language, list(pending), list(pending.values()))
+        except Exception as e:
+            print(f"Lỗi ghi hit_count Wiktionary cache ({self.game_language}): {e}")
+            for term, hits in pending.items(): # Giữ lại để lần flush sau thử tiếp
+                self._pending_hits[term] = self._pending_hits.get(term, 0) + hits
+
+    def stats(self) -> dict:
+        return {**self._memory.stats(), "db_hits": self.db_hits, "db_misses": self.db_misses,
+                "pending_hits": len(self._pending_hits)}
+
+
+async def purge_expired(db_pool: asyncpg.Pool) -> None:
+    if not db_pool: return
+    try:
+        async with db_pool.acquire() as connection:
+            await connection.execute(_PURGE_SQL)
+    except Exception as e:
+        print(f"Lỗi dọn Wiktionary cache hết hạn: {e}")
+
+async def run_flush_loop(caches: list[WiktionaryCache], interval_seconds: float = bot_cfg.WIKTIONARY_CACHE_FLUSH_SECONDS):
+    """Task nền: định kỳ ghi dồn hit_count của các cache xuống DB."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        for cache in caches:
+            try:
+                await cache.flush_hits()
+            except Exception:
+                traceback.print_exc()